@@ -0,0 +1,370 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+age-dependent (Weibull and bathtub) component failure rates
+
+    The Model characterizes every component by a constant FIT rate,
+    which makes each of its failures a Poisson process.  Real fleets
+    see infant mortality in new hardware and wear-out in old hardware
+    (and NVRAM wears out faster the more it is written).  Here each
+    component's hazard rate h(t) is a function of its age t (hours):
+        constant fits ... h(t) = fits
+        weibull shape life ... h(t) = shape/life * (t/life)^(shape-1)
+        piecewise [ages] [fits] ... linear between the (age, fits)
+            points, flat before the first and after the last
+        bathtub shape life fits shape life ... the sum of an infant
+            mortality Weibull (shape < 1), a constant rate, and a
+            wear-out Weibull (shape > 1)
+    all of which have a closed-form cumulative hazard H(t).
+
+    A failed component is replaced with a new one, so the expected
+    number of failures in a slot by age t is not H(t) (which grows as
+    (t/life)^shape, and would have a worn-out part fail many times a
+    year) but the renewal function M(t) of its lifetime distribution.
+    For a Weibull this is computed numerically (once per shape) and
+    grows as t / (mean life) once t is well past the life (which, with
+    infant mortality, takes many lives, and a longer grid).  Constant
+    and piecewise rates are taken to be the rate seen by a slot (with
+    replacements), and a bathtub renews each of its parts separately.
+
+    A slot that is 'age' hours old will see, over the next 'period'
+    hours, M(age + period) - M(age) failures, which is what a constant
+    rate of
+        fits = (M(age + period) - M(age)) / period * BILLION
+    would give.  We average that over the age mix of the fleet, and
+    substitute it for the model's constant rate, so Rates, Results,
+    Batch and everything built on them are unchanged.  The hazard
+    parameters may be arrays, so a whole ModelTable is integrated
+    in a few array operations (and sweeps cost what they always did).
+
+    An NVRAM rated for 'dwpd' drive writes per day over a 'life' is
+    assumed to wear out (as a Weibull with the given shape) after
+        life * dwpd / DWPD
+    at the DWPD (DAY / cache_life) Sizes computes for its primary or
+    secondary cache.  Its failures become f_nvm_1 and f_nvm_2.
+
+    This is described by a JSON file like:
+        {
+          "fleet": {"ages": [0, "YEAR", "2*YEAR"], "weights": [3, 2, 1]},
+          "components": {
+            "f_ctlr": ["bathtub", 0.5, "1000*YEAR", "f_ctlr",
+                       4, "8*YEAR"],
+            "f_fan": ["weibull", 3, "12*YEAR"],
+            "f_power": ["piecewise", [0, "YEAR/4", "3*YEAR", "6*YEAR"],
+                        [5000, "f_power", "f_power", 4000]]
+          },
+          "nvram": {"dwpd": 100, "life": "5*YEAR", "shape": 4,
+                    "fits": 100}
+        }
+    where every value may be an expression (as in a Sweep) that can use
+    the (nominal) value of any Model attribute.
+
+    An aged rate that is not a finite, non-negative number is an error.
+    One that has a part failing more than once per period (e.g. NVRAM
+    written far beyond its rated DWPD) is probably a mistake in the
+    specification, and is reported on stderr.
+
+    NOTE:
+        The average rate gives the right expected number of failures
+        over the period, but the recovery windows see that average
+        rather than the rate at the moment of the failure.
+"""
+
+import sys
+import json
+import math
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+
+import Batch
+import Sweep
+from Memo import memoize
+from RelyFuncts import FitRate, DAY, SECOND, YEAR, BILLION
+from sizes import PiB
+
+# the component FIT rates that may be given a hazard model
+COMPONENTS = ("f_ctlr", "f_dram", "f_nic", "f_fan", "f_power",
+              "f_feed", "f_tor")
+
+# the (normalized) ages at which the Weibull renewal function is computed
+RENEWAL_SPAN = 20.0         # characteristic lives
+RENEWAL_STEPS = 4000        # steps per RENEWAL_SPAN
+RENEWAL_MAX = 100.0         # longest span (for shapes < 1)
+
+
+class Constant:
+    """ a constant hazard rate """
+
+    def __init__(self, fits):
+        self.fits = fits
+
+    def cumulative(self, t):
+        """ expected failures by age t (hours) """
+        return self.fits * t / BILLION
+
+    def renewals(self, t):
+        """ expected failures by age t (hours), with replacement """
+        return self.cumulative(t)
+
+
+@memoize(16, "renewal")
+def _renewal(shape):
+    """ the renewal function of a Weibull(shape, 1) lifetime
+            returns (ages, M(age) - F(age), mean life)
+
+        M(t) = F(t) + integral(0, t) M(t - x) dF(x), solved on a grid
+        of RENEWAL_STEPS steps (trapezoidal in M) per RENEWAL_SPAN
+
+        a decreasing hazard (shape < 1) settles to one failure per mean
+        life much more slowly, so its grid is longer (up to RENEWAL_MAX)
+    """
+    span = min(RENEWAL_SPAN / min(shape, 1.0) ** 2, RENEWAL_MAX)
+    steps = int(round(RENEWAL_STEPS * span / RENEWAL_SPAN))
+    u = np.linspace(0, span, steps + 1)
+    F = -np.expm1(-u ** shape)
+    dF = np.diff(F)
+    M = np.zeros(len(u))
+    for k in range(1, len(u)):
+        known = F[k] + 0.5 * (np.dot(M[k - 1::-1], dF[:k]) +
+                              np.dot(M[k - 1:0:-1], dF[1:k]))
+        M[k] = known / (1 - 0.5 * dF[0])
+    return (u, M - F, math.gamma(1 + 1.0 / shape))
+
+
+class Weibull:
+    """ a Weibull hazard: infant mortality (shape < 1) or wear-out (> 1) """
+
+    def __init__(self, shape, life):
+        """ shape -- Weibull shape parameter
+            life -- characteristic life (hours, 63% have failed)
+        """
+        self.shape = shape
+        self.life = life
+
+    def cumulative(self, t):
+        """ expected failures by age t (hours) """
+        return (t / self.life) ** self.shape
+
+    def renewals(self, t):
+        """ expected failures by age t (hours), with replacement """
+        (u, k) = np.broadcast_arrays(np.asarray(t / self.life, dtype=float),
+                                     np.asarray(self.shape, dtype=float))
+        m = np.zeros(u.shape)
+        for shape in np.unique(k):
+            (ages, excess, mean) = _renewal(float(shape))
+            x = u[k == shape]
+            m[k == shape] = -np.expm1(-x ** shape) + \
+                np.interp(x, ages, excess) + \
+                np.maximum(x - ages[-1], 0) / mean
+        return m if m.ndim > 0 else float(m)
+
+
+class Piecewise:
+    """ a hazard rate that is linear between (age, FIT rate) points """
+
+    def __init__(self, ages, fits):
+        """ ages -- increasing list of ages (hours)
+            fits -- FIT rate at each of those ages
+        """
+        if len(ages) != len(fits) or len(ages) == 0:
+            raise ValueError("piecewise hazard needs an FIT rate per age")
+        self.ages = ages
+        self.fits = fits
+
+    def cumulative(self, t):
+        """ expected failures by age t (hours) """
+        a = self.ages
+        f = self.fits
+        total = f[0] * np.minimum(t, a[0])
+        for i in range(len(a) - 1):
+            width = a[i + 1] - a[i]
+            s = np.clip(t - a[i], 0, width)
+            total = total + f[i] * s + \
+                (f[i + 1] - f[i]) * s * s / (2.0 * width)
+        total = total + f[-1] * np.maximum(t - a[-1], 0)
+        return total / BILLION
+
+    def renewals(self, t):
+        """ expected failures by age t (hours), with replacement """
+        return self.cumulative(t)
+
+
+class Bathtub:
+    """ infant mortality, plus a constant rate, plus wear-out """
+
+    def __init__(self, infant_shape, infant_life, fits,
+                 wear_shape, wear_life):
+        """ infant_shape, infant_life -- infant mortality Weibull
+            fits -- constant (useful life) FIT rate
+            wear_shape, wear_life -- wear-out Weibull
+        """
+        self.parts = (Weibull(infant_shape, infant_life), Constant(fits),
+                      Weibull(wear_shape, wear_life))
+
+    def cumulative(self, t):
+        """ expected failures by age t (hours) """
+        return sum([p.cumulative(t) for p in self.parts])
+
+    def renewals(self, t):
+        """ expected failures by age t (hours), with replacement """
+        return sum([p.renewals(t) for p in self.parts])
+
+
+HAZARDS = {"constant": Constant, "weibull": Weibull,
+           "piecewise": Piecewise, "bathtub": Bathtub}
+
+
+def meanFits(hazard, period=1*YEAR, ages=(0,), weights=None):
+    """ constant FIT rate with the same expected failures over a period
+            hazard -- Constant, Weibull, Piecewise or Bathtub
+            period -- modeled time period (hours)
+            ages -- ages (hours) of the components at its start
+            weights -- relative number of components of each age
+    """
+    weights = [1.0] * len(ages) if weights is None else weights
+    total = 0.0
+    for (age, w) in zip(ages, weights):
+        failures = hazard.renewals(age + float(period)) - \
+            hazard.renewals(age)
+        total = total + w * failures
+    return total / float(sum(weights)) / period * BILLION
+
+
+class Aging:
+    """ hazard models for components of a fleet of a given age mix """
+
+    def __init__(self, spec):
+        """ digest a (parsed) JSON specification """
+        for k in spec:
+            if k not in ("fleet", "components", "nvram"):
+                raise ValueError("unknown aging field: %s" % (k))
+
+        fleet = spec.get("fleet", {})
+        self.ages = [self._compile(a, "fleet age")
+                     for a in fleet.get("ages", [0])]
+        self.weights = fleet.get("weights", [1] * len(self.ages))
+        if len(self.weights) != len(self.ages):
+            raise ValueError("fleet needs a weight for each age")
+
+        self.components = OrderedDict()
+        for (k, v) in spec.get("components", {}).items():
+            if k not in COMPONENTS:
+                raise ValueError("not a component FIT rate: %s" % (k))
+            if v[0] not in HAZARDS:
+                raise ValueError("unknown hazard for %s: %s" % (k, v[0]))
+            self.components[k] = (HAZARDS[v[0]],
+                                  [self._compile(p, k) for p in v[1:]])
+
+        self.nvram = None
+        if "nvram" in spec:
+            nv = spec["nvram"]
+            self.nvram = dict()
+            for (k, default) in (("dwpd", None), ("life", None),
+                                 ("shape", 3), ("fits", 0)):
+                if k not in nv and default is None:
+                    raise ValueError("nvram wear-out needs a %s" % (k))
+                self.nvram[k] = self._compile(nv.get(k, default), "nvram")
+
+    def _compile(self, v, what):
+        """ (lists of) numbers stay as they are, strings are expressions """
+        if isinstance(v, list):
+            return [self._compile(x, what) for x in v]
+        if isinstance(v, basestring):
+            return Sweep._compile(v, what)
+        return v
+
+    def _value(self, v, symbols):
+        """ evaluate a compiled (list of) expression(s) """
+        if isinstance(v, list):
+            return [self._value(x, symbols) for x in v]
+        if isinstance(v, (int, long, float)):
+            return v
+        return np.asarray(eval(v, symbols), dtype=float)
+
+    def table(self, t, capacity=1*PiB, period=1*YEAR):
+        """ a copy of a ModelTable with age-adjusted FIT rates
+                t -- ModelTable of (nominal) simulation parameters
+                capacity -- total system capacity (bytes)
+                period -- modeled time period (hours)
+        """
+        symbols = dict(Sweep.CONSTANTS)
+        columns = dict()
+        for k in Batch.attributes():
+            columns[k] = symbols[k] = getattr(t, k)
+        symbols["FitRate"] = FitRate
+        symbols["__builtins__"] = Sweep.BUILTINS
+        ages = self._value(self.ages, symbols)
+
+        for (k, (hazard, params)) in self.components.items():
+            h = hazard(*self._value(params, symbols))
+            columns[k] = meanFits(h, period, ages, self.weights)
+
+        # NVRAM wears out in proportion to how much it is written
+        if self.nvram is not None:
+            nv = dict([(k, self._value(v, symbols))
+                       for (k, v) in self.nvram.items()])
+            sizes = Batch.BatchSizes(t, capacity)
+            for (k, life) in (("f_nvm_1", sizes.cache_life_1),
+                              ("f_nvm_2", sizes.cache_life_2)):
+                # life * dwpd / (DAY / cache_life), forever if unused
+                wear = Weibull(nv["shape"], np.where(
+                    life > 0, nv["life"] * nv["dwpd"] * life * SECOND / DAY,
+                    np.inf))
+                columns[k] = nv["fits"] + \
+                    meanFits(wear, period, ages, self.weights)
+
+        for k in list(self.components) + \
+                (["f_nvm_1", "f_nvm_2"] if self.nvram is not None else []):
+            self.check(k, columns[k], period)
+        return Batch.ModelTable(columns, n=t.n, descr=t.descr)
+
+    def check(self, k, fits, period):
+        """ make sure an aged FIT rate is in range
+                k -- name of the rate
+                fits -- aged FIT rate (or array of them)
+                period -- modeled time period (hours)
+        """
+        fits = np.asarray(fits, dtype=float)
+        if not np.isfinite(fits).all() or (fits < 0).any():
+            raise ValueError("aged %s is not a finite, non-negative rate" %
+                             (k))
+        worst = fits.max() * period / BILLION if fits.size > 0 else 0
+        if worst > 1:
+            sys.stderr.write("warning: aged %s (%.0f FITs) fails %.1f times"
+                             " per period\n" % (k, fits.max(), worst))
+
+    def models(self, models, capacity=1*PiB, period=1*YEAR, chunk=4096):
+        """ age-adjusted copies of a list (or other iterable) of models
+                models -- the (nominal) models
+                capacity -- total system capacity (bytes)
+                period -- modeled time period (hours)
+                chunk -- number of models to adjust at a time
+        """
+        models = iter(models)
+        while True:
+            mlist = list(islice(models, chunk))
+            if len(mlist) == 0:
+                break
+            t = self.table(Batch.ModelTable.fromModels(mlist),
+                           capacity, period)
+            for i in range(len(mlist)):
+                yield t.model(i)
+
+
+def load(filename):
+    """ read an aging specification from a JSON file """
+    f = open(filename)
+    try:
+        return Aging(json.load(f, object_pairs_hook=OrderedDict))
+    finally:
+        f.close()
@@ -0,0 +1,544 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+column-oriented evaluation of many models at once
+
+    The classes in this module mirror Sizes, Rates and Results in
+    Model.py, but rather than working on a single Model, they work
+    on a ModelTable, in which each Model attribute is a NumPy array
+    (with one element per configuration).  Every computation is done
+    on whole columns, so a sweep of millions of configurations costs
+    a few dozen array operations rather than millions of objects.
+
+    The results should be the same (within float tolerance) as those
+    of the scalar classes, which remain the reference implementation.
+"""
+
+import math
+from itertools import product
+
+import numpy as np
+
+from Model import Model
+from RelyFuncts import Ptail, SECOND, YEAR, BILLION
+from sizes import MB, PiB
+
+
+def attributes():
+    """ the (sorted) names of the numeric/boolean Model parameters """
+    m = Model("")
+    return [k for k in sorted(vars(m)) if k != "descr"]
+
+
+class ModelTable:
+    """ a column-oriented table of simulation parameters """
+
+    def __init__(self, columns=None, n=None, descr=None):
+        """ build a table from a dictionary of columns
+            columns -- {attribute: array or scalar} (missing = defaults)
+            n -- number of configurations (default: longest column)
+            descr -- optional list of configuration descriptions
+        """
+        columns = {} if columns is None else columns
+        names = attributes()
+        for k in columns:
+            if k not in names:
+                raise ValueError("unknown Model attribute: %s" % (k))
+
+        # figure out how many configurations we are describing
+        if n is None:
+            n = 1
+            for v in columns.values():
+                n = max(n, np.size(v))
+        self.n = n
+        self.descr = descr
+
+        # every attribute becomes an array, defaults filling the gaps
+        defaults = Model("")
+        for k in names:
+            v = columns[k] if k in columns else getattr(defaults, k)
+            a = np.asarray(v)
+            if isinstance(getattr(defaults, k), bool):
+                a = a.astype(bool)
+            setattr(self, k, np.broadcast_to(a, (n,)).copy())
+
+    def __len__(self):
+        return self.n
+
+    def model(self, i):
+        """ reconstitute the i'th configuration as a scalar Model """
+        m = Model("" if self.descr is None else self.descr[i])
+        for k in attributes():
+            v = getattr(self, k)[i]
+            setattr(m, k, v.item() if hasattr(v, "item") else v)
+        return m
+
+    @classmethod
+    def fromModels(cls, models):
+        """ build a table from a list of Model objects """
+        columns = dict()
+        for k in attributes():
+            columns[k] = np.array([getattr(m, k) for m in models])
+        return cls(columns, n=len(models),
+                   descr=[m.descr for m in models])
+
+
+#
+# array versions of the Poisson functions in RelyFuncts
+#
+#   the number of events (n) may differ from one configuration to
+#   the next, so factorials come from a (small) lookup table.
+#
+def Pn(expected, n):
+    """ probability of n events occurring when exp are expected
+            expected -- array of expected events
+            n -- array of (integer) event counts
+    """
+    n = np.maximum(np.asarray(n, dtype=int), 0)
+    fact = np.array([float(math.factorial(i))
+                     for i in range(int(np.max(n)) + 1)])
+    return np.exp(-expected) * (expected ** n) / fact[n]
+
+
+def Pfail_gt(fitRate, hours, n):
+    """ probability of more than n failures during an interval
+            fitRate -- array of nominal FIT rates
+            hours -- array of intervals
+            n -- array of event counts (negative means certainty)
+    """
+    expected = np.asarray(fitRate, dtype=float) * hours / BILLION
+    return Ptail(expected, np.asarray(n, dtype=int))
+
+
+def mttdl(terms):
+    """ mean time (hours) to the first of several independent losses
+            terms -- list of (rate, n, scale) arrays (or scalars)
+
+        (see RelyFuncts.mttdl, n may differ from one configuration to
+         the next, so we expand the product for the largest n of each
+         term, and ignore powers beyond each configuration's own n)
+    """
+    live = list()
+    for (rate, n, scale) in terms:
+        rate = np.asarray(rate, dtype=float)
+        n = np.maximum(np.asarray(n, dtype=int), 0)
+        ok = (rate > 0) & (scale > 0)
+        r = np.where(ok, rate * np.where(ok, scale, 1.0) **
+                     (1.0 / (n + 1)), 0.0)
+        live.append((r, n))
+    total = sum([r for (r, n) in live])
+    big = max([int(np.max(n)) for (r, n) in live])
+    lgam = np.array([math.lgamma(i + 1) for i in range(len(live) * big + 2)])
+    with np.errstate(divide="ignore"):
+        logs = [np.log(r / np.where(total > 0, total, 1.0))
+                for (r, n) in live]
+        mean = np.zeros(np.shape(total))
+        for js in product(*[range(int(np.max(n)) + 1) for (r, n) in live]):
+            l = lgam[sum(js)] - np.log(np.where(total > 0, total, 1.0))
+            ok = np.ones(np.shape(total), dtype=bool)
+            for ((r, n), lg, j) in zip(live, logs, js):
+                if j > 0:
+                    l = l + j * lg - lgam[j]
+                    ok &= (j <= n) & (r > 0)
+            mean += np.where(ok, np.exp(np.where(ok, l, 0.0)), 0.0)
+    return np.where(total > 0, mean, np.inf)
+
+
+def multiFit(fitRate, total, required, repair):
+    """ effective FIT rate required/total redundant components
+            (see RelyFuncts.multiFit, all failures in one repair period)
+    """
+    fits = total * fitRate
+    rest = total - 1
+    expected = rest * fitRate * np.asarray(repair, dtype=float) / BILLION
+    return fits * Pn(expected, rest + 1 - required)
+
+
+class BatchSizes:
+    """ The key capacities that drive the result (for a whole table) """
+    def __init__(self, t, capacity=1 * PiB):
+        """ compute the sizes of the cache and number of nodes
+            t -- ModelTable of simulation parameters
+            capacity -- capacity of the backing store
+        """
+
+        # figure out how many LUNs and VMs we can support
+        self.total = capacity
+        used = capacity * t.cap_used * t.dedup
+        luns = used / t.lun_size
+        active = luns * t.lun_active
+        vms = active / t.lun_per_vm
+
+        # figure out how many primaries and secondaries that means
+        self.n_primary = vms / t.prim_vms
+        sym = t.symmetric
+        pcache = np.where(sym, t.cache_1 / t.copies, t.cache_1)
+        n2_asym = self.n_primary * t.cache_1 * (t.copies - 1) / \
+            np.where(sym, 1.0, t.cache_2)
+        n2_sym = np.where(t.copies > 1, self.n_primary, 0.0)
+        self.n_secondary = np.where(sym, n2_sym, n2_asym)
+
+        # compute what fraction of each active LUN we can cache
+        lsize = t.lun_per_vm * t.lun_size
+        self.cache_tot = pcache / lsize
+        self.cache_dirty = t.max_dirty / lsize
+
+        # compute the implied primary/secondary fan-out/fan-in
+        mirrored = t.copies >= 2
+        fan_out = np.maximum(t.decluster, t.copies - 1)
+        n2 = np.where(mirrored, self.n_secondary, 1.0)
+        self.fan_out = np.where(mirrored, fan_out, 0)
+        self.fan_in = np.where(mirrored, fan_out * self.n_primary / n2, 0.0)
+
+        # compute a few other interesting cache rate/use parameters
+        scache = np.where(sym, t.cache_1 * (t.copies - 1) / t.copies,
+                          t.cache_2)
+        self.fract_dirty = t.max_dirty.astype(float) / pcache
+        self.writes_in = t.bsize * t.iops * t.write_fract * t.prim_vms
+        self.new_writes_in = self.writes_in / t.write_aggr
+        self.interval_flush = t.max_dirty.astype(float) / self.new_writes_in
+
+        self.cache_life_1 = pcache.astype(float) / self.new_writes_in
+        w2 = self.writes_in * (t.copies - 1) * self.n_primary
+        self.cache_life_2 = np.where(mirrored, self.n_secondary *
+                                     scache.astype(float) /
+                                     np.where(mirrored, w2, 1.0), 0.0)
+
+        # how many failure domains are all of those nodes spread across
+        nodes = self.n_primary + np.where(sym, 0.0, self.n_secondary)
+        self.n_domains = np.where(t.domain_size > 0, nodes /
+                                  np.maximum(t.domain_size, 1), 0.0)
+
+
+class BatchRates:
+    """ The key rates that drive the result (for a whole table) """
+    def __init__(self, t):
+        """ compute the node loss FIT rates
+            t -- ModelTable of simulation parameters
+        """
+
+        # attempt a bottom-up h/w node FITs computation
+        power_fits = multiFit(t.f_power, t.n_power, t.m_power, t.time_repair)
+        fan_fits = multiFit(t.f_fan, t.n_fan, t.m_fan, t.time_repair)
+        nic_fits = multiFit(t.f_nic, t.n_nic, t.m_nic, t.time_repair)
+        base = t.f_ctlr + power_fits + fan_fits + nic_fits
+
+        # any hard h/w or s/w failure takes out any copy
+        base = base + t.f_sw * t.sw_hard
+
+        # volatile copies can be taken out by reboots and double bit errors
+        #   (and non-volatile ones by failures of the NVRAM itself)
+        self.fits_1_loss = base + np.where(
+            t.nv_1, t.f_nvm_1,
+            t.f_sw + t.cache_1 * t.f_dram * t.dram_2bit / MB)
+        self.fits_2_loss = base + np.where(
+            t.nv_2, t.f_nvm_2,
+            t.f_sw + t.cache_2 * t.f_dram * t.dram_2bit / MB)
+
+        # a failure domain goes down if it loses power or its switches
+        self.fits_domain = \
+            multiFit(t.f_feed, t.n_feed, t.m_feed, t.time_repair) + \
+            multiFit(t.f_tor, t.n_tor, t.m_tor, t.time_repair)
+
+        # (for availability) failures that need a repair vs a reboot
+        self.fits_hard = base + np.where(t.nv_1, t.f_nvm_1, 0.0)
+        self.fits_reboot = t.f_sw * (1 - t.sw_hard)
+
+
+def share(rate, streams, capacity, load, priority):
+    """ bandwidth each recovery stream actually gets
+            (see Model.share, all arguments are arrays)
+
+        returns (contended, rate), where rate is the requested rate
+            wherever contended is false
+    """
+    demand = rate * streams
+    contended = (capacity > 0) & (streams > 0) & (load + demand > capacity)
+    granted = np.where(priority, np.minimum(demand, capacity),
+                       np.minimum(demand, np.maximum(capacity / 2.0,
+                                                     capacity - load)))
+    return (contended, np.where(contended,
+                                granted / np.where(contended, streams, 1.0),
+                                rate))
+
+
+class BatchRecovery:
+    """ The bandwidths available for recovery (for a whole table) """
+    def __init__(self, t, sizes):
+        """ compute normal traffic and effective recovery rates
+            t -- ModelTable of simulation parameters
+            sizes -- BatchSizes for that table
+
+            (see Model.Recovery, rates are floats where contended, and
+             otherwise exactly the requested (integer) rates)
+        """
+        n1 = sizes.n_primary
+        fi = np.minimum(n1, sizes.fan_in)
+        fo = np.minimum(sizes.n_secondary, sizes.fan_out)
+        scp = t.copies - 1
+        prio = t.recovery_first
+        none = np.zeros(len(t))
+
+        # estimate the network traffic associated with normal I/O
+        bps = t.bsize * t.iops * t.prim_vms * n1
+        self.bw_write = t.write_fract * bps
+        self.bw_read = (1 - t.read_hit) * (1 - t.write_fract) * bps
+        self.bw_mirror = self.bw_write * scp
+        self.bw_flush = self.bw_write / t.write_aggr
+        nic = (self.bw_mirror + self.bw_flush) / n1
+
+        def limit(rate, streams, capacity, load, priority, previous=None):
+            # a further limit on a (possibly already limited) rate
+            (c, r) = share(rate if previous is None else
+                           np.where(previous[0], previous[1], rate),
+                           streams, capacity, load, priority)
+            if previous is None:
+                return (c, r)
+            return (c | previous[0], np.where(c, r, previous[1]))
+
+        # a failed primary's secondaries all flush its data at once
+        flush = t.rate_flush.astype(float)
+        pf = limit(flush, fo, t.bw_backing, self.bw_flush, prio)
+        self.pfail = limit(flush, 1, t.bw_network, none, False, pf)
+
+        # a failed secondary's primaries all remirror (or flush) at once
+        self.remirror = t.remirror & (t.rate_mirror > t.rate_flush)
+        rate = np.where(self.remirror, t.rate_mirror, t.rate_flush)
+        rate = rate.astype(float)
+        sf = limit(rate, fi, np.where(self.remirror, 0, t.bw_backing),
+                   self.bw_flush, prio)
+        self.sfail = limit(rate, 1, t.bw_network, nic, prio, sf)
+
+        # after a domain outage, everyone sharing data with it flushes
+        nd = t.domain_size
+        others = sizes.n_domains * nd - nd
+        self.domain_held = np.where(
+            nd > 0, np.maximum(0, np.minimum(others,
+                                             nd * np.maximum(fo, fi))), 0)
+        df = limit(flush, self.domain_held, t.bw_backing, self.bw_flush,
+                   prio)
+        self.domain = limit(flush, 1, t.bw_network, none, False, df)
+
+        # how much longer recovery takes than it would on an idle system
+        self.stretch = np.maximum(np.maximum(
+            np.where(self.pfail[0], flush / self.pfail[1], 1.0),
+            np.where(self.sfail[0], rate / self.sfail[1], 1.0)),
+            np.where(self.domain[0], flush / self.domain[1], 1.0))
+
+
+class BatchAvailability:
+    """ Expected downtime, degraded time, and recovery I/O (for a table) """
+    def __init__(self, t, sizes, rates, results, period=1*YEAR):
+        """ compute the expected time that data is unavailable
+                t -- ModelTable of simulation parameters
+                sizes -- BatchSizes for that table
+                rates -- BatchRates for that table
+                results -- BatchResults (recovery windows and bandwidths)
+                period -- period (hours) to be analyzed, or an array
+
+            (see Model.Availability for a description of the computation)
+        """
+        fo = np.minimum(sizes.n_secondary, sizes.fan_out)
+        scp = t.copies - 1
+        Tt = t.time_timeout * SECOND
+        Td = t.time_detect * SECOND
+        Tr = t.time_reboot
+        Ts = results.Tflush
+        Tp = results.Trp - Tt
+        hard = rates.fits_hard
+        soft = rates.fits_reboot
+
+        # primary reboots and hard failures, and stalled writes
+        restart = np.where(t.nv_1, Tr, np.maximum(Tr, Ts))
+        down = np.where(scp > 0,
+                        hard * (Td + Ts + Tr) + soft * (Td + restart) +
+                        fo * (hard + soft) * Tt,
+                        hard * t.time_repair + soft * (Td + Tr))
+        degraded = np.where(scp > 0,
+                            rates.fits_1_loss * (Td + Ts) +
+                            fo * rates.fits_2_loss * (Tt + Tp), 0.0)
+
+        # domain outages
+        nd = t.domain_size
+        cd = np.minimum(np.minimum(t.domain_copies, t.copies), nd)
+        whole = cd >= t.copies
+        outage = np.where(whole, t.time_repair,
+                          np.minimum(t.time_repair, results.Tdomain + Tr))
+        touched = 1 + np.minimum(fo, np.maximum(0, sizes.n_domains - 1))
+        down = down + np.where(nd > 0, rates.fits_domain * outage, 0.0)
+        degraded = degraded + np.where(
+            (nd > 0) & ~whole,
+            rates.fits_domain * touched * results.Tdomain, 0.0)
+
+        #   (a column per period, if there is an array of them)
+        self.t_down = np.multiply.outer(down, period) / BILLION
+        self.t_degraded = np.multiply.outer(degraded, period) / BILLION
+        self.availability = 1 - self.t_down / period
+
+        # bytes moved by recovery, in hours of normal I/O
+        moved = sizes.n_primary * rates.fits_1_loss * results.bw_pfail * Ts + \
+            sizes.n_secondary * rates.fits_2_loss * results.bw_sfail * Tp
+        normal = results.bw_write + results.bw_read
+        slow = np.where(normal > 0, moved / np.where(normal > 0, normal, 1),
+                        0.0)
+        self.t_slow = np.multiply.outer(slow, period) / BILLION
+
+
+class BatchResults:
+    """ The results of a simulation (for a whole table) """
+    def __init__(self, t, sizes, rates, period=1*YEAR):
+        """ compute the probability of data loss
+                t -- ModelTable of simulation parameters
+                sizes -- BatchSizes for that table
+                rates -- BatchRates for that table
+                period -- period (hours) to be analyzed, or an array of
+                          periods (giving a column per period)
+
+            (see Model.Results for a description of the computation)
+        """
+
+        # move stuff with long names into locals
+        n1 = sizes.n_primary
+        n2 = sizes.n_secondary
+        fi = np.minimum(n1, sizes.fan_in)
+        fo = np.minimum(n2, sizes.fan_out)
+        l1 = rates.fits_1_loss
+        l2 = rates.fits_2_loss
+        scp = t.copies - 1
+
+        # recovery speeds, given everything else that is going on
+        recovery = BatchRecovery(t, sizes)
+        BWs = np.where(recovery.pfail[0], recovery.pfail[1], t.rate_flush)
+        BWp = np.where(recovery.remirror, t.rate_mirror, t.rate_flush)
+        BWp = np.where(recovery.sfail[0], recovery.sfail[1], BWp)
+
+        # compute the equivalent FIT rates for UREs
+        u1 = np.where(t.nv_1, sizes.writes_in * (t.ber_nvm_w + t.ber_nvm_r),
+                      0.0)
+        u2r = np.where(t.nv_2, BWs * t.ber_nvm_r, 0.0)
+        u1 = u1 * (8 * BILLION / SECOND)
+        u2r = u2r * (8 * BILLION / SECOND)
+
+        # compute the detection and recovery times
+        Tt = t.time_timeout * SECOND
+        Td = t.time_detect * SECOND
+        #   (integer rates divide as they do in Model.Results)
+        b2f = t.max_dirty / t.decluster
+        Ts = np.where(recovery.pfail[0], b2f / BWs,
+                      b2f / t.rate_flush) * SECOND
+        Tp = np.where(recovery.sfail[0], b2f / BWp,
+                      b2f / np.where(recovery.remirror, t.rate_mirror,
+                                     t.rate_flush)) * SECOND
+        Tsd = np.where(recovery.domain[0], b2f / recovery.domain[1],
+                       b2f / t.rate_flush) * SECOND
+        self.Trecov = np.where(scp > 0,
+                               np.maximum(Tt + Tp, Td + Ts) / SECOND, 0.0)
+        self.Trp = Tt + Tp
+        self.Trs = Td + Ts
+        self.Tflush = Ts
+
+        # the network traffic associated with normal I/O
+        self.bw_write = recovery.bw_write
+        self.bw_read = recovery.bw_read
+        self.bw_mirror = recovery.bw_mirror
+        self.bw_flush = recovery.bw_flush
+        self.stretch = recovery.stretch
+
+        # the terms (rate/hour, n, scale) of Ploss (see Model.Results)
+        R1 = (l1 + u1) * n1 / BILLION
+        R2f = l2 * n2 / BILLION
+
+        # primary failure: no copies, or C-1 fan-out secondaries fail
+        ue2 = u2r * Ts / (Td + Ts)
+        P1 = (np.where(fo == 0, R1,
+                       R1 * fo * (l2 + ue2) * (Td + Ts) / BILLION),
+              np.where(fo == 0, 0, np.maximum(scp - 1, 0)), 1.0)
+        self.bw_pfail = np.where(fo == 0, 0.0, BWs * fo)
+
+        # secondary failure: any primaries fail within recovery window
+        #   and all surviving secondaries fail within Tt + Tp + Td + Ts
+        self.bw_sfail = BWp * fi
+        Tall = Tt + Tp + Td + Ts
+        ue2 = u2r * Ts / Tall
+        P2f2 = Pfail_gt(np.maximum(fo - 1, 0) * (l2 + ue2), Tall,
+                        np.maximum(scp - 2, 0))
+        P2 = (R2f * fi * l1 * (Tt + Tp) / BILLION, 0,
+              np.where(scp > 1, P2f2, 1.0))
+
+        # failure domain outages
+        nd = t.domain_size
+        cd = np.minimum(np.minimum(t.domain_copies, t.copies), nd)
+        Rdom = np.where(nd > 0, rates.fits_domain * sizes.n_domains, 0.0) / \
+            BILLION
+        held = recovery.domain_held
+        whole = (cd >= t.copies) | (held <= 0)
+        self.Tdomain = np.where(nd > 0, np.maximum(Tt + Tp, Td + Tsd), 0.0)
+        Pdom = (np.where(whole, Rdom, Rdom * held * np.maximum(l1, l2) *
+                         self.Tdomain / BILLION),
+                np.where(whole, 0, np.maximum(t.copies - cd - 1, 0)), 1.0)
+        self.terms = [P1, P2, Pdom]
+
+        # tally up the loss probabilities
+        self.p_domain = self.loss(period, [Pdom])
+        self.p_loss = self.loss(period)
+        self.mttdl = mttdl(self.terms)
+
+        # compute the associated durability (see Model.Results)
+        self.durability = 1 - self.p_loss
+        p = self.p_loss
+        self.nines = np.zeros(p.shape, dtype=int)
+        live = (p < .1) & (p > 0)
+        while live.any():
+            self.nines += live
+            p = np.where(live, p * 10, p)
+            live = (p < .1) & (p > 0)
+
+        # and the availability of the same configurations
+        avail = BatchAvailability(t, sizes, rates, self, period)
+        self.t_down = avail.t_down
+        self.t_degraded = avail.t_degraded
+        self.t_slow = avail.t_slow
+        self.availability = avail.availability
+
+    def loss(self, period, terms=None):
+        """ probability of loss within a period
+                period -- period (hours), or array of periods
+                terms -- the terms to be included (default: all)
+
+            returns an array with a row per configuration (and, for an
+                array of periods, a column per period)
+        """
+        period = np.asarray(period, dtype=float)
+        shape = (len(self.Trecov),) + (1,) * period.ndim
+        p = 0.0
+        for (rate, n, scale) in (self.terms if terms is None else terms):
+            q = np.reshape(scale, shape[:1] + (1,) * period.ndim) \
+                if np.ndim(scale) > 0 else scale
+            q = q * Ptail(np.multiply.outer(rate, period),
+                          np.reshape(n, shape) if np.ndim(n) > 0 else n)
+            p = p + (q - p * q)                 # as in Punion
+        return p
+
+
+def evaluate(t, capacity=1 * PiB, period=1 * YEAR):
+    """ evaluate every configuration in a table
+            t -- ModelTable (or list of Models) to be evaluated
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+
+        returns (BatchSizes, BatchRates, BatchResults)
+    """
+    if not isinstance(t, ModelTable):
+        t = ModelTable.fromModels(t)
+    sizes = BatchSizes(t, capacity)
+    rates = BatchRates(t)
+    results = BatchResults(t, sizes, rates, period)
+    return (sizes, rates, results)
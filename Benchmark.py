@@ -0,0 +1,369 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+benchmarks of the model engines, and a performance regression check
+
+    Each workload is a canonical use of one of the engines:
+        default ... the standard test matrix (main.defaultTests)
+        nvramber ... the NVRAM bit error rate sweep (nvramber.tests)
+        batch ... a million point synthetic sweep, evaluated by Batch
+        compiled ... the same sweep, evaluated by Compiled
+        montecarlo ... simulation of a large (100PiB) cluster
+    and is run in a process of its own, which reports the best time
+    of several passes (each of which repeats the workload for at least
+    SPAN seconds, so that quick workloads are not lost in the noise of
+    the clock and the scheduler), the resulting throughput
+    (configurations, or trials, per second), how much slower than the
+    best its median pass was (the noise), and its peak memory use.  We
+    also report the startup time (of an interpreter that imports the
+    engines).
+
+    Each workload also returns a few golden values (e.g. Ploss for
+    each configuration, or sums over the synthetic sweep), so that
+    changes made for the sake of speed can't silently change answers.
+
+    python Benchmark.py -o <baseline>.json ... saves the results
+    python Benchmark.py -c <baseline>.json ... compares the results
+        with a baseline, and fails (exit status 1) if the throughput of
+        any workload has dropped by more than the threshold (-t, 20%,
+        plus the noise measured in both runs) or if any golden value
+        has changed
+    python Benchmark.py -q ... a quicker run (smaller sweep and fewer
+        trials, which can only be compared with another quick run)
+
+    NOTE:
+        Every memoization cache is cleared (untimed) before each call, so
+        repeated calls measure the engines (and not the caches).
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import Memo
+
+THRESHOLD = 0.20        # allowed drop in throughput
+TOLERANCE = 1E-9        # allowed relative change in a golden value
+CHUNK = 65536           # rows of the synthetic sweep per table
+SPAN = 1.0              # minimum time (seconds) of each timing
+
+
+def _times(f, repeat, span=SPAN):
+    """ time (seconds) per call of f, each of several times, and its result
+            f -- function to be timed
+            repeat -- number of times to time it
+            span -- each time, call f until this much time (seconds)
+                    has been spent in it, and take the average
+    """
+    times = list()
+    for i in range(repeat):
+        elapsed = 0.0
+        calls = 0
+        while calls == 0 or elapsed < span:
+            for c in Memo.caches:
+                c.clear()       # (not part of the time)
+            start = time.time()
+            result = f()
+            elapsed += time.time() - start
+            calls += 1
+        times.append(elapsed / calls)
+    return (times, result)
+
+
+def _quietly(f):
+    """ f, with its standard output discarded """
+    def quiet():
+        saved = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            return f()
+        finally:
+            sys.stdout.close()
+            sys.stdout = saved
+    return quiet
+
+
+def _golden(models):
+    """ Ploss for each of a list of models (from the scalar engine) """
+    from run import evaluate
+    return [evaluate(m)[2].p_loss for m in models]
+
+
+def default(quick, repeat):
+    """ the standard test matrix """
+    import main
+    (times, _) = _times(_quietly(main.defaultTests), repeat)
+    models = main.defaultModels()
+    return (len(models), times, _golden(models))
+
+
+def nvramber(quick, repeat):
+    """ the NVRAM bit error rate sweep """
+    import nvramber
+    (times, _) = _times(_quietly(nvramber.tests), repeat)
+    models = nvramber.models()
+    return (len(models), times, _golden(models))
+
+
+def synthetic(n, seed=1):
+    """ ModelTables (a chunk at a time) of a reproducible random sweep
+            n -- number of configurations
+            seed -- random number generator seed
+    """
+    import Batch
+    from sizes import MiB, GiB
+    rng = np.random.RandomState(seed)
+    for start in range(0, n, CHUNK):
+        k = min(CHUNK, n - start)
+        c = dict()
+        c["copies"] = rng.randint(1, 5, k)
+        c["symmetric"] = rng.rand(k) < 0.5
+        c["nv_1"] = rng.rand(k) < 0.5
+        c["nv_2"] = rng.rand(k) < 0.5
+        c["decluster"] = rng.randint(1, 33, k)
+        c["max_dirty"] = rng.choice([64 * MiB, 250 * MiB, 1 * GiB], k)
+        c["rate_flush"] = rng.choice([100 * MiB, 200 * MiB, 400 * MiB], k)
+        c["rate_mirror"] = rng.choice([200 * MiB, 1000 * MiB], k)
+        c["time_detect"] = rng.randint(5, 61, k)
+        c["ber_nvm_r"] = 10.0 ** rng.uniform(-18, -12, k)
+        c["f_sw"] = 10.0 ** rng.uniform(4, 6, k)
+        yield Batch.ModelTable(c, n=k)
+
+
+def _sweep(quick, repeat, engine):
+    """ the synthetic sweep, evaluated by a function of a ModelTable """
+    n = 100000 if quick else 1000000
+    tables = list(synthetic(n))
+
+    def sweep():
+        return np.concatenate([engine(t) for t in tables])
+    (times, p) = _times(sweep, repeat)
+    with np.errstate(divide="ignore"):
+        logs = np.log10(np.maximum(p, 1E-300))
+    return (n, times, [float(p.sum()), float(logs.sum()),
+                         float(np.median(p))])
+
+
+def batch(quick, repeat):
+    """ the synthetic sweep, evaluated by Batch """
+    import Batch
+    return _sweep(quick, repeat, lambda t: Batch.evaluate(t)[2].p_loss)
+
+
+def compiled(quick, repeat):
+    """ the synthetic sweep, evaluated by Compiled """
+    import Compiled
+    return _sweep(quick, repeat, Compiled.pLoss)
+
+
+def montecarlo(quick, repeat):
+    """ simulation of a 100PiB cluster """
+    from Model import Model
+    from MonteCarlo import Simulation
+    from run import evaluate
+    from sizes import PiB
+    m = Model("100PiB")
+    m.copies = 2
+    (sizes, rates, results) = evaluate(m, 100 * PiB)
+    trials = 10000 if quick else 100000
+
+    def simulate():
+        return Simulation(m, sizes, rates, seed=1).run(trials)
+    (times, sim) = _times(simulate, repeat)
+    return (trials, times, [sim.losses, results.p_loss])
+
+
+WORKLOADS = OrderedDict([
+    ("default", (default, "configurations")),
+    ("nvramber", (nvramber, "configurations")),
+    ("batch", (batch, "configurations")),
+    ("compiled", (compiled, "configurations")),
+    ("montecarlo", (montecarlo, "trials"))])
+
+
+def measure(name, quick=False, repeat=3):
+    """ run one workload (in this process)
+            name -- name of the workload
+            quick -- smaller sweeps and simulations
+            repeat -- number of times to time it
+
+        returns a dictionary of its items, unit, (best) seconds, rate,
+            noise (how much slower the median time was), peak memory
+            (MiB) and golden values
+    """
+    (f, unit) = WORKLOADS[name]
+    (items, times, golden) = f(quick, repeat)
+    seconds = min(times)
+    noise = float(np.median(times)) / seconds - 1
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return {"items": items, "unit": unit, "seconds": seconds,
+            "rate": items / seconds, "noise": noise, "peak_mb": peak,
+            "golden": golden}
+
+
+def startup(repeat=3):
+    """ time (seconds) to start an interpreter and import the engines """
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        subprocess.check_call([sys.executable, "-c",
+                               "import main, Batch, Compiled, MonteCarlo"],
+                              cwd=here)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(names=None, quick=False, repeat=3):
+    """ run each workload in a process of its own
+            names -- workloads to run (default: all of them)
+            quick -- smaller sweeps and simulations
+            repeat -- number of times to time each one
+
+        returns a dictionary of results (as saved in a baseline)
+    """
+    names = list(WORKLOADS) if names is None else names
+    here = os.path.abspath(__file__)
+    result = {"python": platform.python_version(),
+              "numpy": np.__version__, "host": platform.node(),
+              "quick": quick, "startup": startup(),
+              "workloads": OrderedDict()}
+    for name in names:
+        if name not in WORKLOADS:
+            raise ValueError("unknown workload: %s (try %s)" %
+                             (name, ", ".join(WORKLOADS)))
+        args = [sys.executable, here, "--measure", name, "-r", str(repeat)]
+        if quick:
+            args.append("-q")
+        out = subprocess.check_output(args, cwd=os.path.dirname(here))
+        result["workloads"][name] = json.loads(out.splitlines()[-1])
+    return result
+
+
+def _changed(new, old):
+    """ indices of the golden values that differ (beyond TOLERANCE) """
+    if len(new) != len(old):
+        return range(max(len(new), len(old)))
+    return [i for (i, (a, b)) in enumerate(zip(new, old))
+            if abs(a - b) > TOLERANCE * max(abs(a), abs(b))]
+
+
+def compare(result, baseline, threshold=THRESHOLD):
+    """ print a comparison of a run with a baseline
+            result -- dictionary returned by benchmark
+            baseline -- the same, from a previous run
+            threshold -- allowed drop in throughput (to which the noise
+                         of both runs is added)
+
+        returns a list of failures (empty if there were none)
+    """
+    failures = list()
+    for k in ("python", "numpy", "host"):
+        if result[k] != baseline.get(k):
+            print("NOTE: baseline %s was %s (now %s)" %
+                  (k, baseline.get(k), result[k]))
+    print("startup: %.3fs (baseline %.3fs)" %
+          (result["startup"], baseline["startup"]))
+    print("%-12s %12s %12s %8s %10s %8s  %s" %
+          ("workload", "rate", "baseline", "change", "peak", "change",
+           "answers"))
+    for (name, r) in result["workloads"].items():
+        if name not in baseline["workloads"]:
+            print("%-12s %12.1f %12s" % (name, r["rate"], "-"))
+            continue
+        b = baseline["workloads"][name]
+        if r["items"] != b["items"]:
+            print("%-12s %12.1f %12s (%d vs %d %s, not comparable)" %
+                  (name, r["rate"], "-", r["items"], b["items"],
+                   r["unit"]))
+            continue
+        speed = r["rate"] / b["rate"] - 1
+        memory = r["peak_mb"] / b["peak_mb"] - 1
+        changed = _changed(r["golden"], b["golden"])
+        print("%-12s %12.1f %12.1f %+7.1f%% %8.1fMB %+7.1f%%  %s" %
+              (name, r["rate"], b["rate"], 100 * speed, r["peak_mb"],
+               100 * memory, "CHANGED" if changed else "same"))
+        allowed = threshold + r.get("noise", 0) + b.get("noise", 0)
+        if speed < -allowed:
+            failures.append("%s: %.1f%% slower (allowed %.1f%%)" %
+                            (name, -100 * speed, 100 * allowed))
+        for i in changed[:5]:
+            failures.append("%s: golden value %d was %r, now %r" %
+                            (name, i, b["golden"][i] if i < len(b["golden"])
+                             else None, r["golden"][i]
+                             if i < len(r["golden"]) else None))
+    return failures
+
+
+def report(result):
+    """ print the results of a run """
+    print("startup: %.3fs" % (result["startup"]))
+    print("%-12s %12s %10s %14s %8s %10s" %
+          ("workload", "items", "seconds", "rate", "noise", "peak"))
+    for (name, r) in result["workloads"].items():
+        print("%-12s %12d %10.4f %14s %7.1f%% %8.1fMB" %
+              (name, r["items"], r["seconds"], "%.1f/s" % (r["rate"]),
+               100 * r.get("noise", 0), r["peak_mb"]))
+
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    parser = OptionParser(usage="usage: %prog [options] [workloads]")
+    parser.add_option("-o", "--output", dest="output", metavar="FILE",
+                      help="save the results as a baseline", default=None)
+    parser.add_option("-c", "--compare", dest="compare", metavar="FILE",
+                      help="compare the results with a baseline",
+                      default=None)
+    parser.add_option("-t", "--threshold", dest="threshold", type="float",
+                      metavar="PERCENT", help="allowed drop in throughput",
+                      default=100 * THRESHOLD)
+    parser.add_option("-r", "--repeat", dest="repeat", type="int",
+                      metavar="N", help="time each workload N times",
+                      default=3)
+    parser.add_option("-q", "--quick", dest="quick", action="store_true",
+                      default=False, help="smaller sweeps and simulations")
+    parser.add_option("--measure", dest="measure", metavar="WORKLOAD",
+                      help="(run one workload in this process)",
+                      default=None)
+    (opts, args) = parser.parse_args()
+
+    if opts.measure is not None:
+        print(json.dumps(measure(opts.measure, opts.quick, opts.repeat)))
+        sys.exit(0)
+
+    result = benchmark(args if len(args) > 0 else None, opts.quick,
+                       opts.repeat)
+    report(result)
+    if opts.output is not None:
+        f = open(opts.output, "w")
+        try:
+            json.dump(result, f, indent=2)
+        finally:
+            f.close()
+    if opts.compare is not None:
+        f = open(opts.compare)
+        try:
+            baseline = json.load(f, object_pairs_hook=OrderedDict)
+        finally:
+            f.close()
+        print("")
+        failures = compare(result, baseline, opts.threshold / 100.0)
+        for f in failures:
+            print("FAILED: %s" % (f))
+        sys.exit(1 if failures else 0)
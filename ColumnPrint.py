@@ -120,10 +120,19 @@ def printTime(t):
         return "%5.1f years" % (t / YEAR)
 
 
-def printDurability(d):
-    """ print out a durability in a reasonable format """
+def printDurability(d, loss=None):
+    """ print out a durability in a reasonable format
+        d -- durability
+        loss -- probability of loss (1 - d, but with more nines)
+    """
     if d < .99999:
         return "%6.3f%%" % (d * 100)
+    elif loss is not None:
+        nines = 0
+        while loss < .1 and loss > 0:
+            nines += 1
+            loss *= 10
+        return "%d-nines" % (nines)
     else:
         nines = 0
         while d > .9:
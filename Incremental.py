@@ -0,0 +1,146 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+incremental re-evaluation of a model as its parameters are changed
+
+    A model is evaluated in three stages (Sizes, Rates and Results),
+    each of which reads only some of the Model attributes (e.g. Sizes
+    never reads f_ctlr, and Rates never reads lun_size).  Rather than
+    trying to keep hand-written dependency lists up to date, we record
+    which attributes each stage actually reads (by handing it a proxy
+    for the model), and snapshot their values.  After a parameter is
+    changed, only the stages whose snapshots no longer match (and the
+    stages that consume their output) are recomputed.
+
+    Because the reads are recorded each time a stage runs, dependencies
+    that only exist in some configurations (e.g. cache_2 is only read
+    for asymmetric models) are tracked correctly.
+"""
+
+from Model import Sizes, Rates, Results
+from RelyFuncts import YEAR
+from sizes import PiB
+
+STAGES = ("sizes", "rates", "results")
+
+# the evaluation settings (not Model attributes) each stage depends on
+SETTINGS = {"sizes": ("capacity",), "rates": (), "results": ("period",)}
+
+
+class _Recorder:
+    """ a read-only view of a Model that remembers what was read """
+
+    def __init__(self, model):
+        self.__dict__["_model"] = model
+        self.__dict__["_reads"] = dict()
+
+    def __getattr__(self, name):
+        value = getattr(self._model, name)
+        self._reads[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("evaluation stages may not modify the model")
+
+
+class LiveModel:
+    """ a Model whose Sizes, Rates and Results are kept up to date """
+
+    def __init__(self, model, capacity=1*PiB, period=1*YEAR, debug=False):
+        """ wrap a model for incremental evaluation
+            model -- the base simulation parameters
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            debug -- enable diagnostic output
+        """
+        self.model = model
+        self.capacity = capacity
+        self.period = period
+        self.debug = debug
+
+        self.values = dict()        # stage -> computed object
+        self.inputs = dict()        # stage -> {attribute: value read}
+        self.settings = dict()      # stage -> settings it was computed for
+        self.computed = dict()      # stage -> number of times computed
+        for s in STAGES:
+            self.computed[s] = 0
+
+    def set(self, **changes):
+        """ change one or more model parameters
+                e.g. live.set(rate_mirror=500*MiB, time_detect=10)
+
+            (the model, capacity and period may also be changed directly,
+             since staleness is determined by comparing input values)
+        """
+        for (name, value) in changes.items():
+            if not hasattr(self.model, name):
+                raise AttributeError("unknown Model attribute: %s" % (name))
+            setattr(self.model, name, value)
+
+    def depends(self, stage):
+        """ the (sorted) model attributes read by the last computation
+            of a stage (sizes, rates or results)
+        """
+        return sorted(self.inputs.get(stage, dict()).keys())
+
+    def _current(self, stage):
+        """ are the inputs to this stage unchanged since it was computed """
+        if stage not in self.values:
+            return False
+        if self.settings[stage] != self._settings(stage):
+            return False
+        for (name, value) in self.inputs[stage].items():
+            # (4 and 4.0 are equal, but do not divide alike)
+            now = getattr(self.model, name)
+            if type(now) is not type(value) or now != value:
+                return False
+        return True
+
+    def stale(self):
+        """ list of stages that would be recomputed by evaluate """
+        stale = [s for s in STAGES[:2] if not self._current(s)]
+        if stale or not self._current("results"):
+            stale.append("results")
+        return stale
+
+    def _settings(self, stage):
+        """ current values of the evaluation settings a stage uses """
+        return tuple([getattr(self, s) for s in SETTINGS[stage]])
+
+    def _compute(self, stage, compute):
+        """ (re)compute a stage, recording what it reads """
+        view = _Recorder(self.model)
+        self.values[stage] = compute(view)
+        self.inputs[stage] = view._reads
+        self.settings[stage] = self._settings(stage)
+        self.computed[stage] += 1
+        if self.debug:
+            print("    recomputed %s from: %s" %
+                  (stage, " ".join(self.depends(stage))))
+
+    def evaluate(self):
+        """ bring every stage up to date
+                returns (sizes, rates, results)
+        """
+        stale = self.stale()
+        if "sizes" in stale:
+            self._compute("sizes",
+                          lambda m: Sizes(m, self.capacity, self.debug))
+        if "rates" in stale:
+            self._compute("rates", lambda m: Rates(m, self.debug))
+        if "results" in stale:
+            sizes = self.values["sizes"]
+            rates = self.values["rates"]
+            self._compute("results",
+                          lambda m: Results(m, sizes, rates, self.period,
+                                            self.debug))
+        return (self.values["sizes"], self.values["rates"],
+                self.values["results"])
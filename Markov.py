@@ -0,0 +1,457 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+continuous-time Markov chain evaluation of graphviz state models
+
+    The state models (e.g. Sym3C, Asy3C) are graphviz directed graphs
+    whose nodes carry a state attribute:
+        nominal ... fully operational (where we start, and return to)
+        compromised/critical ... in service with reduced redundancy
+        failed ... data loss (absorbing)
+    and whose edges are labelled "<window>, <multiplier>":
+        window ... 1Y (any time), Trp (primaries recovering from a
+                   secondary failure), or Trs (secondaries recovering
+                   from a primary failure)
+        multiplier ... an expression in N, Np, Ns, D, C, Fo, Fi
+                   (see the legends in the model files)
+
+    Generated models (see StateSpace.py) track the recovery phases
+    explicitly, and so also use two other kinds of window:
+        FL ... secondaries failing (or suffering a URE) while flushing
+        1/T ... completion of a phase of duration T (Tt timeout,
+                Td detect, Ts flush, Tp remirror), at multiplier/T
+
+    Each edge becomes a transition whose rate is the multiplier times
+    the loss rate of the nodes it counts (primaries for N, Np and Fi,
+    secondaries for Ns, D and Fo).  The graphs do not draw the repairs,
+    so every degraded state gets an implicit return to the nominal
+    state at 1/(the longest window on its edges).  An edge with a
+    shorter window has its rate scaled by (its window / that window),
+    so that it has the same chance of happening before the repair as
+    it would within its own window.
+
+    The generator is a scipy.sparse matrix, so the solution never
+    builds an NxN dense matrix:
+        mean time to failure ... renewal cycles, with sparse state
+            reduction and a sparse linear solve
+        P(failure within t) ... uniformization, switching to a
+            closed form once the surviving probability mass has
+            settled into its quasi-stationary distribution
+"""
+
+import math
+import re
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import spsolve
+from scipy.special import gammaln
+
+from RelyFuncts import SECOND, YEAR, BILLION
+from sizes import PiB
+from run import evaluate
+from ColumnPrint import ColumnPrint, printProbability, printExp
+
+# probability mass too small to matter (in deciding convergence)
+TINY = 1E-280
+
+PRIMARY_SYMBOLS = ("N", "Np", "Fi")     # multipliers that count primaries
+ANY_TIME = "1Y"                         # window for spontaneous failures
+FLUSHING = "FL"                         # window for flushing secondaries
+COMPLETION = "1/"                       # prefix for phase completions
+
+_EDGE = re.compile(r'^"([^"]*)"\s*->\s*"([^"]*)"\s*(\[.*\])?$')
+_NODE = re.compile(r'^"([^"]*)"\s*(\[.*\])?$')
+_ATTR = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([\w.]+))')
+_EXPR = re.compile(r'^[\w\s.+\-*/()]+$')
+
+
+def _attrs(s):
+    """ parse a graphviz [ key = value ... ] attribute list """
+    attrs = dict()
+    if s is not None:
+        for (k, quoted, bare) in _ATTR.findall(s):
+            attrs[k] = quoted or bare
+    return attrs
+
+
+class StateGraph:
+    """ the states and (labelled) transitions of a graphviz state model """
+
+    def __init__(self, text):
+        """ parse the text of a graphviz state model
+                text -- contents of the .dot file
+        """
+        self.states = list()    # state names, in order of appearance
+        self.attrs = dict()     # state name -> attribute dictionary
+        self.edges = list()     # (from, to, window, multiplier)
+
+        # strip out the comments, and break it into statements
+        lines = list()
+        for line in text.split("\n"):
+            if line.strip().startswith("#"):
+                continue
+            lines.append(line.split("//")[0])
+        for stmt in re.split(r"[;\n]", "\n".join(lines)):
+            stmt = stmt.strip()
+            e = _EDGE.match(stmt)
+            if e is not None:
+                label = _attrs(e.group(3)).get("label", "")
+                if "," not in label:
+                    raise ValueError("edge %s->%s: bad label '%s'" %
+                                     (e.group(1), e.group(2), label))
+                (window, mult) = label.split(",", 1)
+                self._state(e.group(1), None)
+                self._state(e.group(2), None)
+                self.edges.append((e.group(1), e.group(2),
+                                   window.strip(), mult.strip()))
+                continue
+            n = _NODE.match(stmt)
+            if n is not None:
+                self._state(n.group(1), _attrs(n.group(2)))
+
+    def _state(self, name, attrs):
+        """ note a state (and any attributes we have for it) """
+        if name not in self.attrs:
+            self.states.append(name)
+            self.attrs[name] = dict()
+        if attrs:
+            self.attrs[name].update(attrs)
+
+    def kind(self, name):
+        """ nominal, compromised, critical or failed """
+        return self.attrs[name].get("state", "")
+
+    @classmethod
+    def load(cls, filename):
+        """ parse a graphviz state model file """
+        f = open(filename)
+        try:
+            return cls(f.read())
+        finally:
+            f.close()
+
+
+def bind(model, sizes, results):
+    """ values for the symbols used in the state models
+            model -- base simulation parameters
+            sizes -- key capacities and counts
+            results -- the (analytic) results for this model
+    """
+    return {
+        "N": sizes.n_primary,
+        "Np": sizes.n_primary,
+        "Ns": sizes.n_secondary,
+        "D": model.decluster,
+        "C": model.copies,
+        "Fo": min(sizes.n_secondary, sizes.fan_out),
+        "Fi": min(sizes.n_primary, sizes.fan_in),
+        ANY_TIME: None,
+        "Trp": results.Trp,
+        "Trs": results.Trs,
+        FLUSHING: None,
+        "Tt": model.time_timeout * SECOND,
+        "Td": model.time_detect * SECOND,
+        "Ts": results.Tflush,
+        "Tp": results.Trp - model.time_timeout * SECOND,
+    }
+
+
+def multiplier(expr, symbols):
+    """ evaluate a rate multiplier expression (e.g. Fo-1)
+            expr -- the expression
+            symbols -- values for the symbols it may use
+    """
+    if _EXPR.match(expr) is None:
+        raise ValueError("bad rate multiplier: '%s'" % (expr))
+    for name in re.findall(r"[A-Za-z_]\w*", expr):
+        if name not in symbols:
+            raise ValueError("unknown symbol '%s' in '%s'" % (name, expr))
+    return float(eval(expr, {"__builtins__": {}}, symbols))
+
+
+class Chain:
+    """ a continuous-time Markov chain for a state model """
+
+    def __init__(self, graph, model, sizes, rates, results):
+        """ bind the state model to a configuration
+                graph -- StateGraph to be evaluated
+                model -- base simulation parameters
+                sizes -- key capacities and counts
+                rates -- key fit rates
+                results -- the (analytic) results for this model
+        """
+        self.graph = graph
+        self.states = graph.states
+        index = dict((s, i) for (i, s) in enumerate(self.states))
+        symbols = bind(model, sizes, results)
+
+        # find the starting and the absorbing states
+        nominal = [s for s in self.states if graph.kind(s) == "nominal"]
+        if len(nominal) != 1:
+            raise ValueError("state model needs exactly one nominal state")
+        self.start = index[nominal[0]]
+        self.failed = np.array([graph.kind(s) == "failed"
+                                for s in self.states])
+
+        # per-hour loss rates (primary UREs can initiate a failure,
+        #   secondary UREs only matter while they are being flushed)
+        l1 = float(rates.fits_1_loss) / BILLION
+        u1 = float(results.fits_1_ure) / BILLION
+        l2 = float(rates.fits_2_loss) / BILLION
+        u2 = float(results.fits_2_ure) / BILLION
+
+        # each degraded state is repaired at the end of its longest window
+        #   (unless it has explicit phase completion transitions)
+        longest = dict()
+        phased = set()
+        for (src, dst, window, mult) in graph.edges:
+            if window.startswith(COMPLETION):
+                phased.add(src)
+            elif symbols[window] is not None:
+                longest[src] = max(symbols[window], longest.get(src, 0))
+
+        timed = list()          # (from, to, rate)
+        instant = dict()        # from -> [(to, weight)] for 0-length phases
+        for (src, dst, window, mult) in graph.edges:
+            i = index[src]
+            if self.failed[i]:
+                continue
+            m = multiplier(mult, symbols)
+            names = re.findall(r"[A-Za-z_]\w*", mult)
+            primary = len([n for n in names if n in PRIMARY_SYMBOLS]) > 0
+            if window.startswith(COMPLETION):   # end of a phase
+                T = symbols[window[len(COMPLETION):]]
+                if T <= 0:
+                    instant.setdefault(i, []).append((index[dst], m))
+                    continue
+                rate = m / T
+            elif window == FLUSHING:            # flushing secondaries
+                rate = m * (l2 + u2)
+            elif window == ANY_TIME:            # spontaneous failures
+                rate = m * (l1 + u1 if primary else l2)
+            else:                               # within a recovery window
+                T = symbols[window]
+                rate = m * (l1 if primary else l2 + u2 * results.Tflush / T)
+                rate *= T / longest[src]
+            if rate > 0:
+                timed.append((i, index[dst], rate))
+        for (src, T) in longest.items():
+            i = index[src]
+            if src in phased:
+                continue
+            if T > 0 and not self.failed[i] and i != self.start:
+                timed.append((i, self.start, 1.0 / T))
+
+        # a phase of zero length is left as soon as it is entered, so
+        #   anything entering it goes straight on to where it leads
+        def settle(j, depth=0):
+            if j not in instant:
+                return [(j, 1.0)]
+            if depth > len(self.states):
+                raise ValueError("cycle of zero-length phases")
+            total = float(sum([w for (_, w) in instant[j]]))
+            dests = list()
+            for (k, w) in instant[j]:
+                for (d, p) in settle(k, depth + 1):
+                    dests.append((d, p * w / total))
+            return dests
+
+        rows = list()
+        cols = list()
+        vals = list()
+        for (i, j, rate) in timed:
+            if i in instant:
+                continue
+            for (d, p) in settle(j):
+                if d != i:
+                    rows.append(i)
+                    cols.append(d)
+                    vals.append(rate * p)
+
+        # assemble the generator (rows sum to zero)
+        n = len(self.states)
+        Q = sparse.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+        out = np.asarray(Q.sum(axis=1)).ravel()
+        self.Q = (Q - sparse.diags(out, 0)).tocsr()
+
+    def _reach(self):
+        """ which states can be reached from the nominal state """
+        seen = np.zeros(len(self.states), dtype=bool)
+        seen[self.start] = True
+        frontier = [self.start]
+        while frontier:
+            i = frontier.pop()
+            row = self.Q.getrow(i)
+            for j in row.indices[row.data > 0]:
+                if not seen[j]:
+                    seen[j] = True
+                    frontier.append(j)
+        return seen
+
+    def reachable(self):
+        """ can the nominal state reach any of the failed states """
+        return bool((self._reach() & self.failed).any())
+
+    def _excursion(self, D):
+        """ P(failure before returning to the nominal state)
+                D -- the (reachable) degraded states
+
+            This is computed by state reduction (eliminating degraded
+            states one at a time, and adding their rates to those of
+            their neighbors), which, unlike a linear solve, involves no
+            subtractions, and so is accurate even at 1e-25.
+        """
+        start = self.start
+        sink = -1
+        keep = set(D)
+        keep.add(start)
+        rates = dict()          # i -> {j: rate from i to j}
+        preds = dict()          # j -> set of i with a rate to j
+        for i in keep:
+            row = self.Q.getrow(i)
+            rates[i] = dict()
+            for (j, v) in zip(row.indices, row.data):
+                if j == i or v <= 0:
+                    continue
+                j = sink if self.failed[j] else j
+                rates[i][j] = rates[i].get(j, 0.0) + v
+                preds.setdefault(j, set()).add(i)
+        out = sum(rates[start].values())
+
+        for k in D:
+            total = sum(rates[k].values())
+            for i in preds.pop(k, set()):
+                a = rates[i].pop(k)
+                for (j, v) in rates[k].items():
+                    if j == i and i != start:
+                        continue        # back where it started
+                    rates[i][j] = rates[i].get(j, 0.0) + a * v / total
+                    preds.setdefault(j, set()).add(i)
+            for j in rates[k]:
+                preds[j].discard(k)
+            del rates[k]
+        return rates[start].get(sink, 0.0) / out
+
+    def mttf(self):
+        """ mean time (hours) from the nominal state to failure
+
+            Solving Q t = -1 directly is hopeless when failure is 1e-20
+            as likely as repair, so we treat each excursion from the
+            nominal state as a renewal cycle:
+                q = P(failure before returning to nominal)
+                d = expected time in degraded states per excursion
+                MTTF = (1/exit rate + d) / q
+        """
+        seen = self._reach()
+        if not (seen & self.failed).any():
+            return float("inf")
+        deg = seen & ~self.failed
+        deg[self.start] = False
+        D = np.nonzero(deg)[0]
+        out = -self.Q[self.start, self.start]
+        t = 1.0 / out
+        if len(D) > 0:
+            p = self.Q[self.start, :][:, D].toarray().ravel() / out
+            M = (-self.Q[D, :][:, D]).tocsc()
+            t += np.dot(p, np.atleast_1d(spsolve(M, np.ones(len(D)))))
+        return float(t / self._excursion(list(D)))
+
+    def p_fail(self, t, tol=1.0E-10):
+        """ probability of having failed within t hours (uniformization)
+                t -- length of the period (hours)
+                tol -- convergence tolerance for the closed form tail
+        """
+        rate = max(-self.Q.diagonal())
+        if rate <= 0 or not self.reachable():
+            return 0.0
+
+        # P = I + Q/rate, pi(t) = sum(Poisson(k; rate*t) * pi0 * P^k)
+        n = len(self.states)
+        P = (sparse.identity(n, format="csr") + self.Q / rate).T.tocsr()
+        lt = rate * t
+        kmax = int(lt + 10 * math.sqrt(lt) + 20)
+        live = ~self.failed
+        #   (the probability of being absorbed in one step, from each
+        #    surviving state, so that it never has to be recovered by
+        #    subtracting nearly equal failed masses)
+        into = np.asarray(P[np.nonzero(self.failed)[0], :][:, live]
+                          .sum(axis=0)).ravel()
+        P = P[np.nonzero(live)[0], :][:, live]
+
+        def logw(k):
+            return -lt + k * math.log(lt) - math.lgamma(k + 1)
+
+        v = np.zeros(live.sum())        # surviving mass, by state
+        v[np.nonzero(live)[0].searchsorted(self.start)] = 1.0
+        a = 0.0                         # failed mass
+        acc = 0.0
+        hold = None
+        k = 0
+        while k <= kmax:
+            w = math.exp(logw(k))
+            acc += w * a
+            if a >= 1.0:        # everything has failed
+                h = 1.0
+                break
+            # past the mean, the rest of the Poisson tail is at most
+            #   w * (k+1)/(k+1-lt), and when that no longer matters...
+            if k > lt and w * (k + 1) / (k + 1 - lt) <= tol * acc:
+                return acc
+
+            # once the surviving mass has a fixed shape, it (and the
+            #   fraction of it absorbed each step) no longer changes
+            mass = v.sum()
+            s = v / mass
+            h = into.dot(s)
+            if hold is not None and abs(h - hold[1]) <= tol * h and \
+                    np.all(np.abs(s - hold[0]) <= tol * s + TINY):
+                break
+            hold = (s, h)
+            a += (1 - a) * h
+            v = P.dot(s) * (1 - a)
+            k += 1
+        else:
+            return acc
+
+        # the remaining terms: a(k+j) = 1 - (1-a(k)) * (1-h)**j
+        #   (only those within 10 sigma of the mean have any weight)
+        first = max(k + 1, int(lt - 10 * math.sqrt(lt) - 20))
+        kj = np.arange(first, kmax + 1)
+        j = kj - k
+        lw = -lt + kj * math.log(lt) - gammaln(kj + 1)
+        with np.errstate(divide="ignore"):     # a or h may be 1
+            loss = -np.expm1(np.log1p(-a) + j * np.log1p(-h))
+        return acc + float(np.sum(np.exp(lw) * loss))
+
+
+def solve(models, filename="auto", capacity=1*PiB, period=1*YEAR):
+    """ evaluate a state model for a list of models
+        models -- list of models to be evaluated
+        filename -- graphviz state model (auto = generate one per model)
+        capacity -- total system capacity (bytes)
+        period -- modeled time period (hours)
+    """
+    from StateSpace import stateGraph
+    graph = None if filename == "auto" else StateGraph.load(filename)
+    heads = ["configuration", "Ploss", "P(FAIL)", "MTTDL(y)"]
+    maxlen = len(heads[0])
+    for m in models:
+        maxlen = max(maxlen, len(m.descr))
+    format = ColumnPrint(heads, maxdesc=maxlen)
+    format.printHeadings()
+
+    for m in models:
+        (sizes, rates, results) = evaluate(m, capacity, period)
+        g = stateGraph(m) if graph is None else graph
+        chain = Chain(g, m, sizes, rates, results)
+        format.printLine([m.descr, printProbability(results.p_loss),
+                          printProbability(chain.p_fail(period)),
+                          printExp(chain.mttf() / YEAR)])
@@ -0,0 +1,119 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+bounded (least recently used) caches for repeated computations
+
+    Parameter sweeps typically vary only a few parameters (copies, NV
+    flags, BERs) while leaving most of the others (e.g. the component
+    FIT rates) alone, so many of the intermediate computations are
+    repeated over and over with exactly the same inputs.
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ a bounded map of keys to previously computed values """
+
+    def __init__(self, size=1024, name=""):
+        """ create an empty cache
+            size -- maximum number of entries to keep
+            name -- name to use in statistics
+        """
+        self.size = size
+        self.name = name
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key, compute):
+        """ return the cached value for key, computing it if need be
+            key -- hashable description of all of the inputs
+            compute -- function (of no arguments) to compute the value
+        """
+        try:
+            value = self.entries.pop(key)
+            self.hits += 1
+        except KeyError:
+            value = compute()
+            self.misses += 1
+            if len(self.entries) >= self.size:
+                self.entries.popitem(last=False)
+        self.entries[key] = value       # now the most recently used
+        return value
+
+    def clear(self):
+        """ forget all cached values (and statistics) """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """ (hits, misses, entries) """
+        return (self.hits, self.misses, len(self.entries))
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        return "%s: %d lookups, %d hits (%.1f%%), %d/%d entries" % \
+            (self.name, lookups, self.hits,
+             100.0 * self.hits / lookups if lookups > 0 else 0,
+             len(self.entries), self.size)
+
+
+# every cache that has been created with memoize
+caches = list()
+
+
+def typedKey(values):
+    """ a hashable key for a sequence of values that tells 1, 1.0 and
+        True apart (which matters, because integer division gives them
+        different results)
+    """
+    return tuple([(type(v), v) for v in values])
+
+
+def memoize(size=1024, name=None):
+    """ decorator to cache the results of a function of hashable args
+            size -- maximum number of results to keep
+            name -- name to use in statistics (default function name)
+
+        NOTE: f(1, 2) and f(1, b=2) are cached separately
+    """
+    def decorate(f):
+        cache = LRUCache(size, f.__name__ if name is None else name)
+        caches.append(cache)
+
+        def cached(*args, **kwargs):
+            key = typedKey(args)
+            if kwargs:
+                key = (key, tuple([(k, type(v), v)
+                                   for (k, v) in sorted(kwargs.items())]))
+            return cache.lookup(key, lambda: f(*args, **kwargs))
+        cached.__name__ = f.__name__
+        cached.__doc__ = f.__doc__
+        cached.cache = cache
+        return cached
+    return decorate
+
+
+def register(cache):
+    """ include a cache (not created by memoize) in statistics """
+    caches.append(cache)
+    return cache
+
+
+def report():
+    """ print out the statistics for every cache """
+    for c in caches:
+        print("\t%s" % (c))
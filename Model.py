@@ -1,9 +1,11 @@
 """
 Input values to the simulation, and output values from the simulation
 """
-from RelyFuncts import FitRate, Pfail, Pfail_gt, Pn, Punion, multiFit
+from RelyFuncts import FitRate, Pfail, Pfail_gt, Pn, Ptail, Punion, multiFit
+from RelyFuncts import mttdl
 from RelyFuncts import SECOND, MINUTE, HOUR, DAY, YEAR, BILLION
 from sizes import MiB, GiB, PiB, MB, GB
+from Memo import LRUCache, register, typedKey
 
 
 class Model:
@@ -27,6 +29,14 @@ class Model:
         self.n_nic = 2          # total NICs/node
         self.m_nic = 1          # minimum NICs/node
 
+        # failure domain (e.g. rack) parameters
+        self.domain_size = 0    # nodes per domain (0: no shared domains)
+        self.domain_copies = 1  # max copies of any data within a domain
+        self.n_feed = 2         # total power feeds/domain
+        self.m_feed = 1         # minimum power feeds/domain
+        self.n_tor = 1          # total top-of-rack switches/domain
+        self.m_tor = 1          # minimum top-of-rack switches/domain
+
         # architectural parameters
         self.copies = 3         # primary + secondary
         self.decluster = 1      # primary->secondary declustering
@@ -40,6 +50,10 @@ class Model:
         self.time_detect = 30   # detect failure/initiate recovery
         self.time_timeout = 5   # TCP retransmit timeout
         self.time_repair = 24 * HOUR  # component repair time
+        self.time_reboot = 5 * MINUTE   # node reboot/VM restart time
+        self.bw_backing = 0     # backing store bandwidth (0: unlimited)
+        self.bw_network = 0     # per node network bandwidth (0: unlimited)
+        self.recovery_first = False     # recovery I/O pre-empts normal I/O
 
         # utilization parameters
         self.cap_used = 0.75    # how full is the backing store
@@ -64,7 +78,11 @@ class Model:
         self.f_power = 1642     # per supply
         self.ber_nvm_r = 1.0E-17  # read Bit Error Rate
         self.ber_nvm_w = 0.0    # write Bit Error Rate
+        self.f_nvm_1 = 0        # per primary NVRAM (wear-out, see Aging.py)
+        self.f_nvm_2 = 0        # per secondary NVRAM
         self.f_sw = FitRate(1, YEAR)    # node panics
+        self.f_feed = FitRate(0.1, YEAR)    # per power feed/PDU
+        self.f_tor = 5000       # per top-of-rack switch
 
         # magic numbers we can only guess at
         self.dram_2bit = 0.01   # fraction of multi-bit DRAM errors
@@ -138,6 +156,11 @@ class Sizes:
         self.cache_life_2 = 0 if m.copies < 2 else \
             self.n_secondary * float(scache) / w2
 
+        # how many failure domains are all of those nodes spread across
+        nodes = self.n_primary + (0 if m.symmetric else self.n_secondary)
+        self.n_domains = 0 if m.domain_size <= 0 else \
+            float(nodes) / m.domain_size
+
 
 class Rates:
     """ The key rates that drive the result """
@@ -169,10 +192,215 @@ class Rates:
             self.fits_1_loss += m.f_sw
             self.fits_1_loss += m.cache_1 * m.f_dram * m.dram_2bit / MB
             # TODO: is this a valid modeling of fatal DRAM errors?
+        else:
+            self.fits_1_loss += m.f_nvm_1     # the NVRAM itself fails
         if not m.nv_2:
             self.fits_2_loss += m.f_sw
             self.fits_2_loss += m.cache_2 * m.f_dram * m.dram_2bit / MB
             # TODO: is this a valid modeling of fatal DRAM errors?
+        else:
+            self.fits_2_loss += m.f_nvm_2
+
+        # a failure domain goes down if it loses power or its switches
+        feed_fits = multiFit(m.f_feed, m.n_feed, m.m_feed, m.time_repair)
+        tor_fits = multiFit(m.f_tor, m.n_tor, m.m_tor, m.time_repair)
+        self.fits_domain = feed_fits + tor_fits
+
+        # (for availability) failures that need a repair vs a reboot
+        self.fits_hard = m.f_ctlr + power_fits + fan_fits + nic_fits + \
+            m.f_sw * m.sw_hard + (m.f_nvm_1 if m.nv_1 else 0)
+        self.fits_reboot = m.f_sw * (1 - m.sw_hard)
+
+
+# the Model parameters that Rates actually reads
+RATE_PARAMS = ("f_ctlr", "f_sw", "sw_hard", "f_dram", "dram_2bit",
+               "cache_1", "cache_2", "nv_1", "nv_2", "f_nvm_1", "f_nvm_2",
+               "time_repair",
+               "f_power", "n_power", "m_power", "f_fan", "n_fan", "m_fan",
+               "f_nic", "n_nic", "m_nic", "f_feed", "n_feed", "m_feed",
+               "f_tor", "n_tor", "m_tor")
+
+rateCache = register(LRUCache(256, "Rates"))
+
+
+def getRates(m, debug=False):
+    """ Rates for a model, shared with any model having the same rates
+            m -- the base simulation parameters
+            debug -- enable diagnostic output
+    """
+    key = typedKey([getattr(m, k) for k in RATE_PARAMS])
+    return rateCache.lookup(key, lambda: Rates(m, debug))
+
+
+def share(rate, streams, capacity, load, priority=False):
+    """ bandwidth each recovery stream actually gets
+            rate -- bandwidth each stream would like
+            streams -- number of concurrent recovery streams
+            capacity -- bandwidth of the shared resource (0: unlimited)
+            load -- bandwidth used by normal I/O
+            priority -- recovery is scheduled ahead of normal I/O
+
+        (without priority, recovery and normal I/O get max-min fair
+         shares: either can use whatever the other does not need)
+    """
+    demand = rate * streams
+    if capacity <= 0 or streams <= 0 or load + demand <= capacity:
+        return rate
+    if priority:
+        granted = min(demand, capacity)
+    else:
+        granted = min(demand, max(capacity / 2.0, capacity - load))
+    return float(granted) / streams
+
+
+class Recovery:
+    """ The bandwidths available for recovery (under contention) """
+    def __init__(self, m, sizes, debug=False):
+        """ compute normal traffic and effective recovery rates
+            m -- the base simulation parameters
+            sizes -- key capacities and counts
+            debug -- enable diagnostic output
+        """
+        n1 = sizes.n_primary
+        n2 = sizes.n_secondary
+        fi = min(n1, sizes.fan_in)      # primaries per secondary
+        fo = min(n2, sizes.fan_out)     # secondaries per primary
+        scp = m.copies - 1
+
+        # estimate the network traffic associated with normal I/O
+        bps = m.bsize * m.iops * m.prim_vms * n1
+        self.bw_write = m.write_fract * bps
+        self.bw_read = (1 - m.read_hit) * (1 - m.write_fract) * bps
+        self.bw_mirror = self.bw_write * scp
+        self.bw_flush = self.bw_write / m.write_aggr
+        nic = (self.bw_mirror + self.bw_flush) / n1     # per primary
+
+        # a failed primary's secondaries all flush its data at once
+        self.rate_pfail = share(m.rate_flush, fo, m.bw_backing,
+                                self.bw_flush, m.recovery_first)
+        self.rate_pfail = share(self.rate_pfail, 1, m.bw_network, 0)
+
+        # a failed secondary's primaries all remirror (or flush) at once
+        self.remirror = m.remirror and m.rate_mirror > m.rate_flush
+        if self.remirror:
+            self.rate_sfail = share(m.rate_mirror, 1, m.bw_network, nic,
+                                    m.recovery_first)
+        else:
+            self.rate_sfail = share(m.rate_flush, fi, m.bw_backing,
+                                    self.bw_flush, m.recovery_first)
+            self.rate_sfail = share(self.rate_sfail, 1, m.bw_network, nic,
+                                    m.recovery_first)
+
+        # after a domain outage, everyone sharing data with it flushes
+        self.domain_held = 0
+        self.rate_domain = m.rate_flush
+        if m.domain_size > 0:
+            nd = m.domain_size
+            others = sizes.n_domains * nd - nd
+            self.domain_held = max(0, min(others, nd * max(fo, fi)))
+            self.rate_domain = share(m.rate_flush, self.domain_held,
+                                     m.bw_backing, self.bw_flush,
+                                     m.recovery_first)
+            self.rate_domain = share(self.rate_domain, 1, m.bw_network, 0)
+
+        # how much longer recovery takes than it would on an idle system
+        self.stretch = max(float(m.rate_flush) / self.rate_pfail,
+                           float(m.rate_mirror if self.remirror
+                                 else m.rate_flush) / self.rate_sfail,
+                           float(m.rate_flush) / self.rate_domain)
+        if debug and self.stretch > 1:
+            print("recovery: %d/%d/%d B/s (x%.2f slower than idle)" %
+                  (self.rate_pfail, self.rate_sfail, self.rate_domain,
+                   self.stretch))
+
+
+class Availability:
+    """ Expected downtime, degraded time, and recovery I/O """
+    def __init__(self, m, sizes, rates, results, period=1*YEAR,
+                 debug=False):
+        """ compute the expected time that data is unavailable
+                m -- the base simulation parameters
+                sizes -- key capacities and counts
+                rates -- key fit rates
+                results -- recovery windows and bandwidths (from Results)
+                period -- period (hours) to be analyzed
+                debug -- enable diagnostic output
+
+            NOTE:
+                These are expected hours (per period) as seen by the VMs
+                on any one primary:
+                    t_down ... the VMs are not running, or their
+                        writes are stalled
+                    t_degraded ... some of their dirty data has fewer
+                        than the configured number of copies
+                and t_slow is the hours of (system-wide) normal I/O that
+                would move as many bytes as recovery does.
+        """
+        n1 = sizes.n_primary
+        n2 = sizes.n_secondary
+        fo = min(n2, sizes.fan_out)     # secondaries per primary
+        scp = m.copies - 1
+        Tt = m.time_timeout * SECOND
+        Td = m.time_detect * SECOND
+        Tr = m.time_reboot
+        Ts = results.Tflush
+        Tp = results.Trp - Tt
+        hard = rates.fits_hard
+        soft = rates.fits_reboot
+
+        # a primary's VMs are down while it reboots, or (after a hard
+        #   failure) until its dirty data has been flushed and they have
+        #   been restarted elsewhere ... or, without copies, repaired
+        if scp > 0:
+            restart = Tr if m.nv_1 else max(Tr, Ts)
+            down = hard * (Td + Ts + Tr) + soft * (Td + restart)
+            # and their writes stall when a secondary stops responding
+            down += fo * (hard + soft) * Tt
+            degraded = rates.fits_1_loss * (Td + Ts) + \
+                fo * rates.fits_2_loss * (Tt + Tp)
+        else:
+            down = hard * m.time_repair + soft * (Td + Tr)
+            degraded = 0
+
+        # a domain outage stops them until they can be restarted elsewhere
+        #   (or repaired, if every copy was in it), and outages of their
+        #   own or their secondaries' domains leave them degraded
+        if m.domain_size > 0:
+            cd = min(m.domain_copies, m.copies, m.domain_size)
+            if cd >= m.copies:
+                down += rates.fits_domain * m.time_repair
+            else:
+                down += rates.fits_domain * \
+                    min(m.time_repair, results.Tdomain + Tr)
+                touched = 1 + min(fo, max(0, sizes.n_domains - 1))
+                degraded += rates.fits_domain * touched * results.Tdomain
+
+        self.t_down = down * period / BILLION
+        self.t_degraded = degraded * period / BILLION
+        self.availability = 1 - self.t_down / period
+
+        # bytes moved by recovery, in hours of normal I/O
+        moved = n1 * rates.fits_1_loss * results.bw_pfail * Ts + \
+            n2 * rates.fits_2_loss * results.bw_sfail * Tp
+        normal = results.bw_write + results.bw_read
+        self.t_slow = 0 if normal <= 0 else \
+            moved * period / BILLION / normal
+        if debug and isinstance(period, (float, int)):
+            print("availability: down=%.3fm, degraded=%.3fm, slow=%.3fm" %
+                  (self.t_down / MINUTE, self.t_degraded / MINUTE,
+                   self.t_slow / MINUTE))
+
+
+def countNines(p):
+    """ the number of nines in a probability of loss (or an array) """
+    if not isinstance(p, (float, int)):
+        import numpy as np
+        return np.array([countNines(float(x)) for x in p], dtype=int)
+    nines = 0
+    while p < .1 and p > 0:
+        nines += 1
+        p *= 10
+    return nines
 
 
 class Results:
@@ -182,7 +410,8 @@ class Results:
                 model -- base simulation parameters
                 sizes -- key capacities and counts
                 rates -- key fit rates
-                period -- period (hours) to be analyzed
+                period -- period (hours) to be analyzed, or an array
+                          of periods (for a whole durability curve)
                 debug -- enable diagnostic output
 
             NOTE:
@@ -194,6 +423,11 @@ class Results:
                 that was affected by the initial failure.
                 """
 
+        # a whole durability curve is computed at once
+        if not isinstance(period, (float, int)):
+            import numpy as np
+            period = np.asarray(period, dtype=float)
+
         # move stuff with long names into locals
         n1 = sizes.n_primary        # number of primaries in system
         n2 = sizes.n_secondary      # number of secondaries in system
@@ -204,8 +438,11 @@ class Results:
         dirty = model.max_dirty     # maximum dirty data / primary
         scp = model.copies - 1      # number of secondary copies
         dc = model.decluster        # primary->secondary dispersion
-        BWp = model.rate_flush      # primary recovery speed
-        BWs = model.rate_flush      # secondary recovery speed
+
+        # recovery speeds, given everything else that is going on
+        recovery = Recovery(model, sizes, debug)
+        BWp = recovery.rate_sfail   # primary recovery speed
+        BWs = recovery.rate_pfail   # secondary recovery speed
 
         # compute the equivalent FIT rates for UREs
         if model.nv_1:
@@ -226,6 +463,8 @@ class Results:
         u1 *= 8 * BILLION / SECOND      # primary UER FITs
         u2w *= 8 * BILLION / SECOND     # 2ndary write UER FITs
         u2r *= 8 * BILLION / SECOND     # 2ndary read UER FITs
+        self.fits_1_ure = u1
+        self.fits_2_ure = u2r
         if debug:
             print("")
             print("FIT(BER,1) = %e, FIT(UER,2R) = %e, FIT(BER,2W) = %e" %
@@ -236,48 +475,51 @@ class Results:
         Td = model.time_detect * SECOND     # detect (hours)
         b2f = dirty / dc                    # bytes to flush
         Ts = b2f / BWs * SECOND             # secondary flush (hours)
-        if model.remirror and model.rate_mirror > model.rate_flush:
-            BWp = model.rate_mirror
         Tp = b2f / BWp * SECOND             # primary flush (hours)
         self.Trecov = max(Tt+Tp, Td+Ts) / SECOND if scp > 0 else 0
-
-        # estimate the network traffic associated with normal I/O
-        bps = model.bsize * model.iops * model.prim_vms * n1
-        self.bw_write = model.write_fract * bps
-        self.bw_read = (1 - model.read_hit) * (1 - model.write_fract) * bps
-        self.bw_mirror = self.bw_write * scp
-        self.bw_flush = self.bw_write / model.write_aggr
-
-        # Expected number of initial failure events per year
-        E1f = l1 * n1 * period / BILLION        # 1f: primary node failures
-        E1e = u1 * n1 * period / BILLION        # 1e: primary UREs
-        E2f = l2 * n2 * period / BILLION        # 2e: secondary node failures
+        self.Trp = Tt + Tp      # primaries recover from 2ndary fail (hours)
+        self.Trs = Td + Ts      # 2ndaries recover from primary fail (hours)
+        self.Tflush = Ts        # secondary flush time (hours)
+
+        # the network traffic associated with normal I/O
+        self.bw_write = recovery.bw_write
+        self.bw_read = recovery.bw_read
+        self.bw_mirror = recovery.bw_mirror
+        self.bw_flush = recovery.bw_flush
+        self.stretch = recovery.stretch
+
+        # Each way of losing data is a term (rate, n, scale), which
+        #   has happened by time t with probability
+        #       scale * Ptail(rate * t, n)
+        #   where the rates (per hour) do not depend on the period, so
+        #   the same terms give Ploss for any number of periods.
+        R1f = l1 * n1 / BILLION         # 1f: primary node failures/hour
+        R1e = u1 * n1 / BILLION         # 1e: primary UREs/hour
+        R2f = l2 * n2 / BILLION         # 2e: secondary node failures/hour
         if debug:
-            print("1a: E1fail(%d * %d, T=%e)=%f" % (n1, l1, period, E1f))
-            print("1b: E1nre(%d * %d, T=%e)=%f" % (n1, u1, period, E1e))
-            print("2:  E2fail(%d * %d, T=%e)=%f" % (n2, l2, period, E2f))
+            print("1a: R1fail(%d * %d)=%e/h" % (n1, l1, R1f))
+            print("1b: R1nre(%d * %d)=%e/h" % (n1, u1, R1e))
+            print("2:  R2fail(%d * %d)=%e/h" % (n2, l2, R2f))
 
         # if there are no copies, primary failure = data loss
         if fo == 0:
-            P1 = 1 - Pn(E1f + E1e, 0)
+            P1 = (R1f + R1e, 0, 1.0)
             self.bw_pfail = 0       # but we don't use much bw :-)
-            if debug:
-                print("    P1(E1F+E1E)=%e" % (P1))
         else:   # C-1/fan-out secondaries fail within Td+Ts
             ue2 = u2r * Ts / (Td + Ts)       # scale UER FIT rate
-            P1 = Pfail_gt((E1f + E1e) * fo * (l2 + ue2), Td + Ts, scp - 1)
+            P1 = ((R1f + R1e) * fo * (l2 + ue2) * (Td + Ts) / BILLION,
+                  scp - 1, 1.0)
             if debug:
-                print("    P1((%d+%d) * %d * (%d+%d), T=%e+%e)=%e" %
-                      (E1f, E1E, fo, l2, ue2, Td, Ts, P1f))
+                print("    P1((%e+%e) * %d * (%d+%d), T=%e+%e)" %
+                      (R1f, R1e, fo, l2, ue2, Td, Ts))
             self.bw_pfail = BWs * fo        # expected recovery bandwidth
 
         # if a secondary fails, do any primaries fail within recovery window
-        P2f1 = 1 - Pfail(E2f * fi * l1, Tt + Tp, 0)
+        R2f1 = R2f * fi * l1 * (Tt + Tp) / BILLION
             # NOTE: primary UREs during flushing are included in 1b
         self.bw_sfail = BWp * fi    # expected recovery bandwidth
         if debug:
-            print("    P2fail1(E2F * %d * %d, T=%e+%e)=%e" %
-                  (fi, l1, Tt, Tp, P2f1))
+            print("    P2fail1(R2F * %d * %d, T=%e+%e)" % (fi, l1, Tt, Tp))
 
         # all surviving secondaries fail within Tt + Tp + Td + Ts
         if scp > 1:
@@ -286,18 +528,61 @@ class Results:
             if debug:
                 print("    P2fail2(%d * (%d+%d), T=%e+%e+%e+%e)=%e" %
                       (fo - 1, l2, ue2, Tt, Tp, Td, Ts, P2f2))
-            P2 = P2f1 * P2f2
+            P2 = (R2f1, 0, P2f2)
+        else:
+            P2 = (R2f1, 0, 1.0)
+        self.terms = [P1, P2]
+
+        # a failure domain outage takes out every node in the domain
+        #   which is fatal if every copy of some data was in it, and
+        #   otherwise the surviving copies (on the nodes that share data
+        #   with the failed ones) must all fail before they are recovered
+        #   (and all of those surviving copies are recovered at once)
+        if model.domain_size > 0:
+            nd = model.domain_size
+            cd = min(model.domain_copies, model.copies, nd)
+            Rdom = rates.fits_domain * sizes.n_domains / BILLION
+            held = recovery.domain_held
+            Tdom = max(Tt + Tp, Td + b2f / recovery.rate_domain * SECOND)
+            if cd >= model.copies or held <= 0:
+                Pdom = (Rdom, 0, 1.0)
+            else:
+                Pdom = (Rdom * held * max(l1, l2) * Tdom / BILLION,
+                        model.copies - cd - 1, 1.0)
+            if debug:
+                print("    Pdomain(R=%e/h, %d nodes, %d copies, T=%e)" %
+                      (Rdom, nd, cd, Tdom))
+            self.terms.append(Pdom)
+            self.p_domain = self.loss(period, [Pdom])
         else:
-            P2 = P2f1
+            Tdom = 0
+            self.p_domain = 0
+        self.Tdomain = Tdom     # recovery after a domain outage (hours)
 
         # tally up the loss probabilities and expentancies
-        self.p_loss = Punion(P1, P2)
+        self.p_loss = self.loss(period)
+        self.mttdl = mttdl(self.terms)  # mean time to data loss (hours)
+        if debug:
+            print("    Ploss=%s, MTTDL=%e" % (self.p_loss, self.mttdl))
 
         # compute the associated durability
-        d = 1 - self.p_loss
-        self.durability = d
-        self.nines = 0
-        while d > .9:
-            self.nines += 1
-            d -= .9
-            d *= 10
+        #   (counting nines in p_loss, since 1 - p_loss runs out of them)
+        self.durability = 1 - self.p_loss
+        self.nines = countNines(self.p_loss)
+
+        # and the availability of the same configuration
+        avail = Availability(model, sizes, rates, self, period, debug)
+        self.t_down = avail.t_down
+        self.t_degraded = avail.t_degraded
+        self.t_slow = avail.t_slow
+        self.availability = avail.availability
+
+    def loss(self, period, terms=None):
+        """ probability of loss within a period
+                period -- period (hours), or array of periods
+                terms -- the terms to be included (default: all)
+        """
+        probs = list()
+        for (rate, n, scale) in (self.terms if terms is None else terms):
+            probs.append(scale * Ptail(rate * period, n))
+        return Punion(*probs)
@@ -0,0 +1,346 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+Monte Carlo simulation of data loss, to cross-check Model.Results
+
+    Each trial is one period (e.g. a year) in the life of a whole
+    cluster (sized by Sizes).  Within a trial we simulate:
+        primary node failures and primary NVRAM UREs
+            after which the surviving secondaries must detect the
+            failure (time_detect) and flush their copies (Ts)
+        secondary node failures
+            after which the affected primaries must time out
+            (time_timeout) and flush/remirror their data (Tp)
+    and record whether any of them turned into a data loss.
+
+    Rather than stepping through time, each batch of trials is simulated
+    with a few NumPy operations: the number of initiating events in each
+    trial is Poisson, the number of nodes that fail within a recovery
+    window is Binomial, and when the timing matters (a primary failing
+    part-way through a secondary recovery) the failure time is drawn
+    from the corresponding (truncated) exponential distribution.
+
+    Unlike Results, the simulation does not assume that failures within
+    a window are independent Poisson events (a node can only fail once)
+    or that the secondary window begins at the start of the primary
+    recovery, which is what makes it a useful cross-check.
+"""
+
+import math
+import numpy as np
+
+from Model import Recovery
+from RelyFuncts import SECOND, YEAR, BILLION
+from sizes import PiB
+from run import evaluate
+from ColumnPrint import ColumnPrint, printProbability, printExp
+
+
+def wilson(losses, trials, z=1.96):
+    """ Wilson score confidence interval for a binomial proportion
+            losses -- number of trials that lost data
+            trials -- number of trials
+            z -- standard normal quantile (1.96 = 95%)
+    """
+    if trials == 0:
+        return (0.0, 1.0)
+    p = float(losses) / trials
+    z2 = z * z
+    denom = 1 + z2 / trials
+    center = (p + z2 / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials +
+                         z2 / (4.0 * trials * trials)) / denom
+    return (max(0.0, center - half), min(1.0, center + half))
+
+
+def _count(x, size, rng):
+    """ stochastically round a (possibly fractional) node count
+            (so that the expected number of nodes is preserved)
+    """
+    whole = int(math.floor(x))
+    if x == whole:
+        return np.full(size, whole, dtype=int)
+    return whole + (rng.random_sample(size) < (x - whole)).astype(int)
+
+
+class Simulation:
+    """ a Monte Carlo estimate of the probability of data loss """
+
+    def __init__(self, model, sizes, rates, period=1*YEAR, seed=None):
+        """ set up the event rates and recovery windows
+                model -- base simulation parameters
+                sizes -- key capacities and counts
+                rates -- key fit rates
+                period -- period (hours) in each trial
+                seed -- random number generator seed
+        """
+        self.period = period
+        self.rng = np.random.RandomState(seed)
+        self.trials = 0
+        self.losses = 0
+
+        # the same cluster shape that Results sees
+        self.n1 = sizes.n_primary
+        self.n2 = sizes.n_secondary
+        self.fi = min(self.n1, sizes.fan_in)
+        self.fo = min(self.n2, sizes.fan_out)
+        self.scp = model.copies - 1
+
+        # node loss rates (per hour) and URE rates, as in Results
+        self.l1 = float(rates.fits_1_loss) / BILLION
+        self.l2 = float(rates.fits_2_loss) / BILLION
+        recovery = Recovery(model, sizes)
+        BWs = recovery.rate_pfail
+        u1 = sizes.writes_in * (model.ber_nvm_w + model.ber_nvm_r) \
+            if model.nv_1 else 0
+        u2r = BWs * model.ber_nvm_r if model.nv_2 else 0
+        self.u1 = u1 * 8 / SECOND       # primary UREs per hour
+        self.u2r = u2r * 8 / SECOND     # 2ndary flush UREs per hour
+
+        # detection and recovery windows (hours)
+        self.Tt = model.time_timeout * SECOND
+        self.Td = model.time_detect * SECOND
+        b2f = model.max_dirty / model.decluster
+        self.Ts = b2f / BWs * SECOND
+        BWp = recovery.rate_sfail
+        self.Tp = b2f / BWp * SECOND
+
+    def _fail(self, n, p, needed):
+        """ how many of n nodes fail, if each does with probability p
+                n -- array of node counts
+                p -- probability (scalar or array) of a node failing
+                needed -- number of failures that would be interesting
+
+            returns (failures, likelihood ratio of that outcome)
+        """
+        return (self.rng.binomial(n, p), 1.0)
+
+    def _survive(self, hours, flushing):
+        """ probability that a secondary survives a window
+                hours -- length of the window (hours)
+                flushing -- portion of it spent reading (flushing)
+        """
+        return np.exp(-self.l2 * hours - self.u2r * flushing)
+
+    def _primary(self, events):
+        """ simulate primary failures/UREs
+                events -- number of initiating events
+
+            returns (per-event loss flags, per-event likelihood ratios)
+        """
+        if self.fo == 0:        # no copies: every event is a loss
+            return (np.ones(events, dtype=bool), 1.0)
+
+        # each secondary holding a copy must survive detect + flush
+        fo = _count(self.fo, events, self.rng)
+        p = 1 - self._survive(self.Td + self.Ts, self.Ts)
+        (failed, lr) = self._fail(fo, p, self.scp)
+        return (failed >= self.scp, lr)
+
+    def _secondary(self, events):
+        """ simulate secondary failures
+                events -- number of initiating events
+
+            returns (per-event loss flags, per-event likelihood ratios)
+        """
+        # some primary using this secondary must fail before it has
+        #   timed out and flushed/remirrored the affected data
+        window = self.Tt + self.Tp
+        fi = _count(self.fi, events, self.rng)
+        (hits, lr) = self._fail(fi, 1 - math.exp(-self.l1 * window), 1)
+        hit = hits > 0
+        if self.scp < 2:
+            return (hit, lr)
+
+        # when did (the first of) those primaries fail
+        k = np.nonzero(hit)[0]
+        lost = np.zeros(events, dtype=bool)
+        if len(k) == 0:
+            return (lost, lr)
+        n = fi[k] * 1.0
+        u = self.rng.random_sample(len(k))
+        rate = self.l1 * n
+        t1 = -np.log1p(u * np.expm1(-rate * window)) / rate
+
+        # the other secondaries must survive until that primary's
+        #   copies have been detected and flushed
+        fo = _count(self.fo - 1, len(k), self.rng)
+        p = 1 - self._survive(t1 + self.Td + self.Ts, self.Ts)
+        (failed, lr2) = self._fail(fo, p, self.scp - 1)
+        lost[k] = failed >= self.scp - 1
+        lr = lr * np.ones(events)
+        lr[k] *= lr2
+        return (lost, lr)
+
+    def _batch(self, trials):
+        """ simulate a batch of trials, return the number with a loss """
+        lossy = np.zeros(trials, dtype=bool)
+        E1 = (self.l1 + self.u1) * self.n1 * self.period
+        E2 = self.l2 * self.n2 * self.period
+        for (expected, sim) in ((E1, self._primary), (E2, self._secondary)):
+            if expected <= 0:
+                continue
+            counts = self.rng.poisson(expected, trials)
+            lost = np.nonzero(sim(int(counts.sum()))[0])[0]
+            if len(lost) > 0:
+                # map the lost events back to the trials they came from
+                ends = np.cumsum(counts)
+                lossy[np.searchsorted(ends, lost, side='right')] = True
+        return int(lossy.sum())
+
+    def run(self, trials, batch=1000000):
+        """ simulate (more) trials
+                trials -- number of periods to be simulated
+                batch -- number of trials per NumPy step
+        """
+        while trials > 0:
+            n = min(trials, batch)
+            self.losses += self._batch(n)
+            self.trials += n
+            trials -= n
+        return self
+
+    def p_loss(self):
+        """ estimated probability of loss (per period) """
+        return float(self.losses) / self.trials if self.trials else 0.0
+
+    def interval(self, z=1.96):
+        """ confidence interval for p_loss (default 95%) """
+        return wilson(self.losses, self.trials, z)
+
+
+class ImportanceSimulation(Simulation):
+    """ a failure-biased (importance sampling) estimate of p_loss
+
+        At 8-12 nines a straight simulation will never see a loss, so
+        rather than simulating whole periods, we simulate initiating
+        events (primary and secondary failures) and, for each one,
+        bias the secondary/primary failures within the recovery window
+        so that the number of failures needed for a loss is typical.
+        Each outcome is weighted by its likelihood ratio, which gives
+        an unbiased estimate of the (tiny) per-event loss probability
+        whose relative error stays bounded as that probability shrinks.
+
+        Since initiating events are Poisson, so are the losses, and
+            p_loss = 1 - exp(-(E1 * P(loss|1) + E2 * P(loss|2)))
+    """
+
+    def __init__(self, model, sizes, rates, period=1*YEAR, seed=None):
+        """ (see Simulation) """
+        Simulation.__init__(self, model, sizes, rates, period, seed)
+        self.E1 = (self.l1 + self.u1) * self.n1 * period
+        self.E2 = self.l2 * self.n2 * period
+        self.events = 0
+        self.sum = [0.0, 0.0]       # sum of weighted losses (1, 2)
+        self.sum2 = [0.0, 0.0]      # sum of squared weighted losses
+
+    def _fail(self, n, p, needed):
+        """ biased version of Simulation._fail """
+        # make the needed number of failures the expected number
+        n = np.asarray(n)
+        q = np.clip(float(needed) / np.maximum(n, 1), p, 1.0)
+        k = self.rng.binomial(n, q)
+
+        # likelihood ratio P(k|p) / P(k|q), in log space
+        #   (where q == 1, every node failed and there is no rest term)
+        rest = n - k
+        qr = np.where(rest > 0, q, 0.0)
+        lr = k * (np.log(p) - np.log(q)) + rest * (np.log1p(-p) -
+                                                   np.log1p(-qr))
+        return (k, np.exp(lr))
+
+    def run(self, events, batch=1000000):
+        """ simulate (more) initiating events of each kind
+                events -- number of primary and of secondary events
+                batch -- number of events per NumPy step
+        """
+        while events > 0:
+            n = min(events, batch)
+            for (i, expected, sim) in ((0, self.E1, self._primary),
+                                       (1, self.E2, self._secondary)):
+                if expected <= 0:
+                    continue
+                (lost, lr) = sim(n)
+                w = np.where(lost, lr, 0.0)
+                self.sum[i] += w.sum()
+                self.sum2[i] += (w * w).sum()
+            self.events += n
+            events -= n
+        return self
+
+    def _estimate(self):
+        """ expected losses per period and its variance """
+        n = float(self.events)
+        mean = 0.0
+        var = 0.0
+        for (i, expected) in ((0, self.E1), (1, self.E2)):
+            m = self.sum[i] / n
+            v = max(0.0, self.sum2[i] / n - m * m) / n
+            mean += expected * m
+            var += expected * expected * v
+        return (mean, var)
+
+    def p_loss(self):
+        """ estimated probability of loss (per period) """
+        if self.events == 0:
+            return 0.0
+        return -math.expm1(-self._estimate()[0])
+
+    def relerr(self):
+        """ relative (standard) error of the p_loss estimate """
+        (mean, var) = self._estimate()
+        return math.sqrt(var) / mean if mean > 0 else float("inf")
+
+    def interval(self, z=1.96):
+        """ (normal) confidence interval for p_loss (default 95%) """
+        (mean, var) = self._estimate()
+        half = z * math.sqrt(var)
+        return (-math.expm1(-max(0.0, mean - half)),
+                -math.expm1(-(mean + half)))
+
+
+def simulate(models, trials=1000000, capacity=1*PiB, period=1*YEAR,
+             seed=None, importance=False):
+    """ simulate a list of models and compare them with Results
+        models -- list of models to be simulated
+        trials -- number of periods (or events) to simulate per model
+        capacity -- total system capacity (bytes)
+        period -- modeled time period (hours)
+        seed -- random number generator seed
+        importance -- use failure-biased (importance) sampling
+    """
+    if importance:
+        heads = ["configuration", "Ploss", "Ploss(IS)", "rel err",
+                 "95% low", "95% high"]
+    else:
+        heads = ["configuration", "Ploss", "Ploss(MC)",
+                 "95% low", "95% high"]
+    maxlen = len(heads[0])
+    for m in models:
+        maxlen = max(maxlen, len(m.descr))
+    format = ColumnPrint(heads, maxdesc=maxlen)
+    format.printHeadings()
+
+    for m in models:
+        (sizes, rates, results) = evaluate(m, capacity, period)
+        s = [m.descr, printProbability(results.p_loss)]
+        if importance:
+            sim = ImportanceSimulation(m, sizes, rates, period, seed)
+            sim.run(trials)
+            s.append(printProbability(sim.p_loss()))
+            s.append(printExp(sim.relerr()))
+        else:
+            sim = Simulation(m, sizes, rates, period, seed).run(trials)
+            s.append(printProbability(sim.p_loss()))
+        (lo, hi) = sim.interval()
+        s.append(printProbability(lo))
+        s.append(printProbability(hi))
+        format.printLine(s)
@@ -0,0 +1,149 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the Pareto frontier of node count vs recovery bandwidth vs durability
+
+    With thousands of configurations, most are simply worse (more
+    nodes, more recovery bandwidth, and a higher probability of loss)
+    than some other configuration.  The interesting ones are those on
+    the frontier: the configurations that no other configuration beats
+    (or ties) in every objective.
+
+    Models are evaluated (by Batch) a chunk at a time, and each chunk
+    is merged into the running frontier, so only the frontier (never
+    the whole sweep) is kept in memory.  Within a chunk, the points are
+    considered in lexicographic order, so that a point can only be
+    dominated by points that have already been seen, and each point is
+    compared (as a vector operation) against the whole frontier at once.
+"""
+
+import sys
+from itertools import islice
+
+import numpy as np
+
+import Batch
+from ColumnPrint import ColumnPrint, printSize, printProbability
+from RelyFuncts import YEAR
+from sizes import PiB
+
+OBJECTIVES = ("nodes", "bw_recov", "p_loss")
+
+
+def objectives(t, sizes, results):
+    """ the (minimized) objectives for a batch of configurations
+            t -- ModelTable of simulation parameters
+            sizes -- BatchSizes for that table
+            results -- BatchResults for that table
+
+        returns an array with a row per configuration and a column
+            per objective (see OBJECTIVES)
+    """
+    nodes = sizes.n_primary + np.where(t.symmetric, 0, sizes.n_secondary)
+    bw = np.maximum(results.bw_pfail, results.bw_sfail)
+    return np.column_stack((nodes, bw, results.p_loss)).astype(float)
+
+
+class Frontier:
+    """ the set of non-dominated points seen so far """
+
+    def __init__(self):
+        self.points = np.zeros((0, len(OBJECTIVES)))
+        self.items = list()     # whatever each point describes
+        self.seen = 0           # number of points offered
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, points, items):
+        """ merge a batch of points into the frontier
+                points -- array, with a row per point
+                items -- the things (e.g. models) those points describe
+
+            returns the number of frontier changes (additions)
+        """
+        points = np.asarray(points, dtype=float)
+        self.seen += len(points)
+        changes = 0
+        order = np.lexsort(points.T[::-1])
+        for i in order:
+            p = points[i]
+            # dominated by (or identical to) something we already have
+            if np.any(np.all(self.points <= p, axis=1)):
+                continue
+            # drop whatever it dominates
+            keep = ~np.all(p <= self.points, axis=1)
+            if not keep.all():
+                self.points = self.points[keep]
+                self.items = [self.items[j] for j in np.nonzero(keep)[0]]
+            self.points = np.vstack((self.points, p))
+            self.items.append(items[i])
+            changes += 1
+        return changes
+
+    def sorted(self):
+        """ the frontier, as (point, item) pairs ordered by objective """
+        order = np.lexsort(self.points.T[::-1])
+        return [(self.points[i], self.items[i]) for i in order]
+
+
+def explore(models, capacity=1*PiB, period=1*YEAR, chunk=4096,
+            progress=None):
+    """ find the frontier for a (possibly very long) stream of models
+            models -- list (or other iterable) of models
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            chunk -- number of models to evaluate at a time
+            progress -- function(frontier) to call after every chunk
+
+        returns a Frontier, whose items are the frontier models
+    """
+    frontier = Frontier()
+    models = iter(models)
+    while True:
+        mlist = list(islice(models, chunk))
+        if len(mlist) == 0:
+            break
+        t = Batch.ModelTable.fromModels(mlist)
+        (sizes, rates, results) = Batch.evaluate(t, capacity, period)
+        frontier.add(objectives(t, sizes, results), mlist)
+        if progress is not None:
+            progress(frontier)
+    return frontier
+
+
+def pareto(models, capacity=1*PiB, period=1*YEAR, verbose=False):
+    """ find and print the frontier for a set of models
+            models -- list (or other iterable) of models
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            verbose -- report frontier updates (on stderr) as they happen
+    """
+    def progress(f):
+        sys.stderr.write("%d configurations, %d on the frontier\n" %
+                         (f.seen, len(f)))
+
+    frontier = explore(models, capacity, period,
+                       progress=progress if verbose else None)
+
+    heads = ["configuration", "nodes", "BW(recov)", "Ploss"]
+    maxlen = len(heads[0])
+    for m in frontier.items:
+        maxlen = max(maxlen, len(m.descr))
+    format = ColumnPrint(heads, maxdesc=maxlen)
+    format.printHeadings()
+    for ((nodes, bw, p), m) in frontier.sorted():
+        format.printLine([m.descr, "%d" % (nodes),
+                          "n/a" if bw == 0 else printSize(bw, 1000) + "/s",
+                          printProbability(p)])
+    print("%d of %d configurations are on the frontier" %
+          (len(frontier), frontier.seen))
+    return frontier
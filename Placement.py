@@ -0,0 +1,297 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+explicit placement of each primary's secondaries
+
+    Sizes computes the fan-in as an average (fan_out * n_primary /
+    n_secondary), and Results assumes that every secondary serves
+    exactly that many primaries.  Real placement policies are lumpier.
+    This module actually assigns the fan_out secondaries of each
+    primary, with one of
+        round-robin ... primary i gets the next fan_out secondaries
+        random ... fan_out distinct secondaries chosen at random
+        hash ... CRUSH-like consistent hashing, each secondary owning
+            VNODES points on a ring, and each primary taking the first
+            fan_out distinct owners after its own hash
+    and records the assignment as an (n_primary x fan_out) integer array.
+
+    Each primary's dirty data is declustered into decluster chunks, and
+    chunk j is mirrored on secondaries j ... j+copies-2 (mod fan_out) of
+    that primary's list.  From this we compute the exact per-secondary
+    fan-in, the secondary cache each secondary would actually need, and
+    the number of distinct copy-sets (sets of secondaries that hold the
+    mirrors of the same chunk of some primary) in the whole cluster.
+
+    Placement does not change the expected rate of loss from independent
+    failures: every such term is linear in the number of (primary, chunk)
+    pairs a secondary holds, and they add up to the same total however
+    they are spread.  What it does change is the damage done by a
+    correlated failure of a whole failure domain (a rack that loses its
+    power feeds or top-of-rack switches, at Rates.fits_domain).  The
+    primaries, and the secondaries, are assigned to domains of
+    domain_size consecutive ids (DOMAIN if the model has none), and for
+    each domain we find the distinct sets of copies that survive its
+    outage:
+        none ... every copy was in the domain, and the data is lost
+        some ... the data is lost if they all fail (at the same rates
+            as in Results) before they can be recovered (Tdomain)
+    Round-robin placement keeps a primary's chunks on a few copy-sets
+    (in a few domains), while random and hashed placement scatter them
+    all over the cluster, exposing more data to each domain outage.
+    The loss probability for a placement is that of the independent
+    terms of Results combined with these domain outages, and its cost
+    in nines is how many fewer it has than the best policy compared.
+"""
+
+import math
+
+import numpy as np
+
+from Model import Sizes
+from RelyFuncts import Punion, YEAR, BILLION
+from run import evaluate
+from ColumnPrint import ColumnPrint, printProbability, printSize
+from sizes import PiB
+
+VNODES = 64         # points on the hash ring per secondary
+DOMAIN = 20         # nodes per failure domain, if the model has none
+
+
+def _mix(x):
+    """ a (splitmix64) hash of an array of integers """
+    x = np.asarray(x, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _distinct(rows):
+    """ the distinct rows of a 2-D integer array (in no particular order) """
+    rows = np.ascontiguousarray(rows)
+    whole = np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))
+    return np.unique(rows.view(whole).ravel()).view(rows.dtype).reshape(
+        -1, rows.shape[1])
+
+
+def roundRobin(n1, n2, fo, symmetric=False, seed=0):
+    """ each primary gets the next fo secondaries """
+    i = np.arange(n1, dtype=np.int64)[:, None]
+    j = np.arange(fo, dtype=np.int64)[None, :]
+    if symmetric:       # the next fo nodes after itself
+        return ((i + 1 + j) % n2).astype(np.int32)
+    return ((i * fo + j) % n2).astype(np.int32)
+
+
+def randomly(n1, n2, fo, symmetric=False, seed=0):
+    """ each primary gets fo distinct randomly chosen secondaries """
+    rng = np.random.RandomState(seed)
+    choices = n2 - 1 if symmetric else n2
+    m = rng.randint(0, choices, size=(n1, fo))
+    while True:
+        # re-draw any choice that duplicates an earlier one in its row
+        order = np.argsort(m, axis=1, kind="mergesort")
+        s = np.take_along_axis(m, order, axis=1)
+        dup = np.zeros(m.shape, dtype=bool)
+        dup[:, 1:] = s[:, 1:] == s[:, :-1]
+        if not dup.any():
+            break
+        rows = np.nonzero(dup)[0]
+        cols = order[dup]
+        m[rows, cols] = rng.randint(0, choices, size=len(rows))
+    if symmetric:       # never ourselves
+        m += m >= np.arange(n1)[:, None]
+    return m.astype(np.int32)
+
+
+def hashed(n1, n2, fo, symmetric=False, seed=0):
+    """ each primary gets the first fo distinct owners on a hash ring """
+    salt = np.uint64(seed) << np.uint64(48)
+    points = _mix((np.arange(n2 * VNODES, dtype=np.uint64) +
+                   np.uint64(1 << 40)) ^ salt)
+    order = np.argsort(points, kind="mergesort")
+    ring = points[order]
+    owner = (order // VNODES).astype(np.int32)
+
+    m = np.full((n1, fo), -1, dtype=np.int32)
+    found = np.zeros(n1, dtype=int)
+    pos = np.searchsorted(ring, _mix(np.arange(n1, dtype=np.uint64) ^ salt))
+    me = np.arange(n1, dtype=np.int32)
+    live = np.arange(n1)
+    step = 0
+    while len(live) > 0:
+        o = owner[(pos[live] + step) % len(ring)]
+        ok = ~np.any(m[live] == o[:, None], axis=1)
+        if symmetric:
+            ok &= o != me[live]
+        m[live[ok], found[live[ok]]] = o[ok]
+        found[live[ok]] += 1
+        live = live[found[live] < fo]
+        step += 1
+    return m
+
+
+POLICIES = {"round-robin": roundRobin, "random": randomly, "hash": hashed}
+
+
+class Placement:
+    """ an explicit assignment of secondaries to primaries """
+
+    def __init__(self, m, policy="random", capacity=1*PiB, seed=0):
+        """ assign the secondaries for a model
+            m -- the base simulation parameters
+            policy -- round-robin, random, or hash
+            capacity -- total system capacity (bytes)
+            seed -- for random choices (and the hash salt)
+        """
+        if policy not in POLICIES:
+            raise ValueError("unknown placement policy: %s (try %s)" %
+                             (policy, ", ".join(sorted(POLICIES))))
+        if m.copies < 2:
+            raise ValueError("there is nothing to place without copies")
+        self.model = m
+        self.policy = policy
+        self.sizes = Sizes(m, capacity)
+        self.n1 = max(1, int(round(self.sizes.n_primary)))
+        self.n2 = self.n1 if m.symmetric else \
+            max(1, int(round(self.sizes.n_secondary)))
+        limit = self.n2 - 1 if m.symmetric else self.n2
+        self.fan_out = max(1, min(limit, int(self.sizes.fan_out)))
+        self.map = POLICIES[policy](self.n1, self.n2, self.fan_out,
+                                    m.symmetric, seed)
+
+    def fanIn(self):
+        """ number of primaries served by each secondary """
+        return np.bincount(self.map.ravel(), minlength=self.n2)
+
+    def copySets(self):
+        """ the number of distinct copy-sets (sets of secondaries that
+            hold the mirrors of the same chunk of some primary)
+        """
+        scp = min(self.model.copies - 1, self.fan_out)
+        fo = self.fan_out
+        chunks = set()
+        for j in range(max(1, self.model.decluster)):
+            chunks.add(tuple(sorted([(j + r) % fo for r in range(scp)])))
+        sets = np.concatenate([self.map[:, list(c)] for c in chunks])
+        return len(_distinct(np.sort(sets, axis=1)))
+
+    def domains(self):
+        """ the failure domain of each primary, and of each secondary """
+        size = self.model.domain_size
+        size = DOMAIN if size <= 0 else int(size)
+        primary = np.arange(self.n1) // size
+        if self.model.symmetric:
+            return (primary, np.arange(self.n2) // size)
+        # primaries and secondaries are in racks of their own
+        return (primary, primary[-1] + 1 + np.arange(self.n2) // size)
+
+    def pDomain(self, q1, q2):
+        """ the probability that the outage of each failure domain
+            loses data
+                q1 -- probability that a surviving primary fails
+                      before it has been recovered
+                q2 -- the same, for a surviving secondary
+        """
+        scp = min(self.model.copies - 1, self.fan_out)
+        fo = self.fan_out
+        (pdom, sdom) = self.domains()
+        primary = np.arange(self.n1, dtype=np.int32)
+        rows = list()
+        for j in range(max(1, self.model.decluster)):
+            copies = self.map[:, [(j + r) % fo for r in range(scp)]]
+            where = sdom[copies]
+            # the outages of the primary's and each secondary's domains
+            for d in [pdom] + [where[:, r] for r in range(scp)]:
+                alive = np.where(where == d[:, None], -1, copies)
+                rows.append(np.column_stack(
+                    (d, np.where(pdom == d, -1, primary),
+                     np.sort(alive, axis=1))).astype(np.int32))
+        # each distinct set of survivors only counts once per domain
+        rows = _distinct(np.concatenate(rows))
+        p = np.where(rows[:, 1] >= 0, q1, 1.0) * \
+            q2 ** np.count_nonzero(rows[:, 2:] >= 0, axis=1)
+        with np.errstate(divide="ignore"):
+            kept = np.bincount(rows[:, 0], weights=np.log1p(-p),
+                               minlength=max(pdom.max(), sdom.max()) + 1)
+        return -np.expm1(kept)
+
+    def pLoss(self, rates, results, period=1*YEAR):
+        """ probability of loss within a period for this placement
+                rates -- Rates for the model
+                results -- Results for the model
+                period -- modeled time period (hours)
+        """
+        T = results.Tdomain
+        if T <= 0:
+            T = max(results.Trp, results.Trs)
+        q1 = -math.expm1(-(rates.fits_1_loss + results.fits_1_ure) *
+                         T / BILLION)
+        q2 = -math.expm1(-(rates.fits_2_loss + results.fits_2_ure) *
+                         T / BILLION)
+        outages = rates.fits_domain * period / BILLION
+        p_dom = -math.expm1(-outages * self.pDomain(q1, q2).sum())
+        return Punion(results.loss(period, results.terms[:2]), p_dom)
+
+    def cacheNeeded(self):
+        """ mirror space each secondary needs (bytes) """
+        m = self.model
+        pcache = m.cache_1 / m.copies if m.symmetric else m.cache_1
+        per = float(pcache) * (m.copies - 1) / self.fan_out
+        return self.fanIn() * per
+
+    def summary(self, period=1*YEAR):
+        """ fan-in, cache, copy-set and loss statistics, as a dictionary """
+        (sizes, rates, results) = evaluate(self.model, self.sizes.total,
+                                           period)
+        fi = self.fanIn()
+        return {"fan_in": (fi.min(), fi.mean(), fi.max()),
+                "cache_needed": self.cacheNeeded().max(),
+                "copy_sets": self.copySets(),
+                "p_loss": self.pLoss(rates, results, period)}
+
+
+def placement(models, policies=None, capacity=1*PiB, period=1*YEAR):
+    """ compare placement policies for a list of models
+            models -- list (or other iterable) of models
+            policies -- list of policy names (default: all of them)
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+
+        prints the min/mean/max fan-in, the largest secondary cache
+            needed, the number of distinct copy-sets, the probability
+            of loss with that placement, and how many nines it costs
+            relative to the best of the policies compared
+    """
+    policies = sorted(POLICIES) if policies is None else policies
+    heads = ["configuration", "policy", "fan-in", "cache(2)",
+             "copy-sets", "Ploss", "cost(nines)"]
+    rows = list()
+    for m in models:
+        if m.copies < 2:
+            continue
+        summaries = [Placement(m, policy, capacity).summary(period)
+                     for policy in policies]
+        best = min([s["p_loss"] for s in summaries])
+        for (policy, s) in zip(policies, summaries):
+            cost = 0 if best <= 0 else math.log10(s["p_loss"] / best)
+            rows.append((m.descr, policy, s, cost))
+    maxlen = len(heads[0])
+    for (descr, policy, s, cost) in rows:
+        maxlen = max(maxlen, len(descr))
+    format = ColumnPrint(heads, maxdesc=maxlen)
+    format.printHeadings()
+    for (descr, policy, s, cost) in rows:
+        (lo, mean, hi) = s["fan_in"]
+        format.printLine([descr, policy, "%d/%.1f/%d" % (lo, mean, hi),
+                          printSize(s["cache_needed"]),
+                          "%d" % (s["copy_sets"]),
+                          printProbability(s["p_loss"]),
+                          "%.3f" % (cost)])
@@ -18,6 +18,9 @@ basic mathematical functions used in reliability modeling
 """
 
 import math
+from itertools import product
+
+from Memo import memoize
 
 # units of time (FIT rates)
 HOUR = 1
@@ -77,13 +80,7 @@ def Pfail_gt(fitRate, hours, n=1):
             n -- number of events for which we want estimate
     """
     expected = float(fitRate) * hours / 1000000000
-    tot = float(0)
-    i = n
-    while i >= 0:
-        p = Pn(expected, i)
-        tot += p
-        i -= 1
-    return 1.0E0 - tot
+    return Ptail(expected, n)
 
 
 def Pn(expected=1, n=0):
@@ -98,18 +95,139 @@ def Pn(expected=1, n=0):
     return p
 
 
+def Ptail(expected, n=0):
+    """ probability of more than n events occurring when exp are expected
+            expected -- number of events expected during this period
+            n -- number of events that must be exceeded
+
+        When few events are expected, 1 - (P(0) + ... + P(n)) rounds to
+        zero (or to noise) long before the probability gets interesting,
+        so we sum the tail (P(n+1) + P(n+2) + ...) directly, starting
+        from a term computed in log-space.  This series converges quickly
+        when expected < n+1, and otherwise the tail is large enough that
+        the complement is accurate.
+
+        expected and n may also be (broadcastable) NumPy arrays.
+    """
+    if not isinstance(n, int) or not isinstance(expected, (float, int)):
+        return _Ptail_array(expected, n)
+    expected = float(expected)     # (an int would floor-divide below)
+    if n < 0:
+        return 1.0
+    if expected <= 0:
+        return 0.0
+    if n == 0:
+        return -math.expm1(-expected)
+    if expected > n + 1:
+        tot = float(0)
+        i = n
+        while i >= 0:
+            tot += Pn(expected, i)
+            i -= 1
+        return 1.0 - tot
+
+    # P(n+1) * (1 + exp/(n+2) + exp^2/((n+2)(n+3)) + ...)
+    k = n + 1
+    tot = 1.0
+    r = expected / (k + 1)
+    while r > 1E-17:
+        tot += r
+        k += 1
+        r *= expected / (k + 1)
+    k = n + 1
+    if expected > 1E-30:
+        return tot * math.exp(-expected) * expected ** k / math.factorial(k)
+    # the first term might underflow, but its log will not
+    return tot * math.exp(k * math.log(expected) - math.lgamma(k + 1))
+
+
+def _Ptail_array(expected, n):
+    """ Ptail for NumPy arrays (see above) """
+    import numpy as np
+    expected = np.asarray(expected, dtype=float)
+    n = np.asarray(n, dtype=int)
+    (expected, n) = np.broadcast_arrays(expected, n)
+    if expected.size == 0:
+        return np.zeros(expected.shape)
+    top = max(int(np.max(n)), 0)
+
+    # where the tail is not small, the complement is good enough
+    big = (expected > n + 1) & (n >= 0)
+    tot = np.zeros(expected.shape)
+    p = np.where(big, np.exp(-expected), 0.0)
+    for i in range(0, top + 1):
+        if i > 0:
+            p = p * expected / i
+        tot += np.where(i <= n, p, 0.0)
+    result = np.where(big, 1.0 - tot, 0.0)
+    result = np.where(n < 0, 1.0, result)
+    result = np.where((n == 0) & (expected > 0), -np.expm1(-expected),
+                      result)
+
+    # everywhere else, sum the series directly
+    small = (expected > 0) & (n > 0) & ~big
+    if small.any():
+        lam = expected[small]
+        k = n[small] + 1
+        lgam = np.array([math.lgamma(i + 1) for i in range(top + 2)])
+        term = np.exp(k * np.log(lam) - lam - lgam[k])
+        tot = term.copy()
+        while (term > tot * 1E-17).any():
+            k = k + 1
+            term = term * lam / k
+            tot += term
+        result[small] = tot
+    return result
+
+
+def mttdl(terms):
+    """ mean time (hours) to the first of several independent losses
+            terms -- list of (rate, n, scale) for losses that will have
+                     happened by time t with probability
+                        scale * Ptail(rate * t, n)
+
+        Each loss is treated as the n+1'th event of a Poisson process
+        (whose rate is reduced by scale^(1/(n+1)) so it has the same
+        probability while that is small).  The probability of no loss
+        by time t is then a product of Poisson CDFs, which expands into
+        terms of the form exp(-R t) t^j, whose integrals (j!/R^(j+1))
+        add up to the mean.
+    """
+    live = list()
+    for (rate, n, scale) in terms:
+        if rate <= 0 or scale <= 0:
+            continue
+        if n < 0:
+            return 0.0          # loss is certain
+        live.append((float(rate) * scale ** (1.0 / (n + 1)), n))
+    if len(live) == 0:
+        return float("inf")
+
+    total = sum([r for (r, n) in live])
+    mean = 0.0
+    for js in product(*[range(n + 1) for (r, n) in live]):
+        # j! / R^(j+1) * (each r^j_i / j_i!), computed in log-space
+        l = math.lgamma(sum(js) + 1) - math.log(total)
+        for ((r, n), j) in zip(live, js):
+            l += j * math.log(r / total) - math.lgamma(j + 1)
+        mean += math.exp(l)
+    return mean
+
+
 def Punion(*probs):
     """ probability of the Union of multiple events
         probs -- a list of probabilities
     """
 
     # DeMorgan: negation of disjunction equals union of the negations
-    Pu = 1.0
+    #   (accumulated as p + q - pq, which does not round away tiny p)
+    Pu = 0.0
     for p in probs:
-        Pu *= (1 - p)
-    return(1 - Pu)
+        Pu += p - Pu * p
+    return Pu
 
 
+@memoize(256)
 def multiFit(fitRate, total, required, repair, oneRepair=True):
     """ effective FIT rate required/total redundant components
             fitRate -- FIT rate of a single component
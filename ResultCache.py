@@ -0,0 +1,156 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+persistent (content-addressed) cache of computed results
+
+    The same sweeps tend to be re-run over and over, with only a few
+    parameters changed.  This cache remembers the Sizes, Rates and
+    Results for each configuration in an SQLite database, keyed by a
+    hash of
+        every Model attribute (other than its description)
+        the capacity and period
+        the source code of the modules that compute them
+    so that a changed parameter (or a changed computation) is simply a
+    different key, and nothing ever needs to be invalidated.
+
+    The database is limited in size; when it grows too large, the least
+    recently used entries are evicted.
+
+    NOTE:
+        A hit is not free: hashing the model takes about 17us, and the
+        lookup and unpickling of its result another 40us or so.  A cold
+        evaluation of a typical model (e.g. nvramber.json) takes 80-100us,
+        so a warm cache saves only 20-40% on sweeps of such models (and
+        a cold one costs the hash, lookup and insert on top of the
+        evaluation).  It is worth using only when the same sweeps are
+        re-run many times, or when models cost well over 60us each.
+"""
+
+import sys
+import sqlite3
+import hashlib
+import marshal
+import inspect
+import cPickle as pickle
+
+import Model
+import RelyFuncts
+
+
+def codeVersion():
+    """ a hash of the code that computes Sizes, Rates and Results """
+    h = hashlib.sha1()
+    for module in (Model, RelyFuncts):
+        h.update(inspect.getsource(module))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """ an on-disk cache of (sizes, rates, results) for models """
+
+    def __init__(self, filename, maxbytes=256 * 1024 * 1024):
+        """ open (or create) a cache
+            filename -- SQLite database file
+            maxbytes -- approximate limit on the size of the cached data
+        """
+        self.filename = filename
+        self.maxbytes = maxbytes
+        self.version = codeVersion()
+        self.names = list()         # (sorted) Model attribute names
+        self.known = set()          # the same names, and "descr"
+        self.hits = 0
+        self.misses = 0
+        self.used = list()          # keys of hits, not yet recorded
+        self.added = 0              # bytes added since last eviction
+
+        self.db = sqlite3.connect(filename)
+        self.db.text_factory = str
+        self.db.execute("CREATE TABLE IF NOT EXISTS results ("
+                        "key TEXT PRIMARY KEY, value BLOB, "
+                        "size INTEGER, used INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS lru ON results (used)")
+        row = self.db.execute("SELECT MAX(used) FROM results").fetchone()
+        self.clock = row[0] or 0    # (logical) time of last use
+
+    def key(self, m, capacity, period):
+        """ the canonical hash for a model evaluation
+
+            (marshal distinguishes 1 from 1.0 and True, which matters,
+             because integer division gives them different results)
+        """
+        params = vars(m)
+        if params.viewkeys() != self.known:
+            self.known = set(params)
+            self.names = sorted([k for k in params if k != "descr"])
+        values = [params[k] for k in self.names]
+        text = marshal.dumps((self.names, values, capacity, period,
+                              self.version), 2)
+        return hashlib.sha1(text).hexdigest()
+
+    def get(self, m, capacity, period):
+        """ the cached (sizes, rates, results) for a model, or None """
+        k = self.key(m, capacity, period)
+        row = self.db.execute("SELECT value FROM results WHERE key = ?",
+                              (k,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used.append(k)
+        return pickle.loads(str(row[0]))
+
+    def put(self, m, capacity, period, value):
+        """ remember the (sizes, rates, results) for a model """
+        k = self.key(m, capacity, period)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.clock += 1
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        (k, sqlite3.Binary(blob), len(blob), self.clock))
+        self.added += len(blob)
+        if self.added > self.maxbytes / 10:
+            self.flush()
+
+    def flush(self):
+        """ record recent uses, evict old entries, and commit """
+        if len(self.used) > 0:
+            self.clock += 1
+            self.db.executemany("UPDATE results SET used = ? WHERE key = ?",
+                                [(self.clock, k) for k in self.used])
+            self.used = list()
+        if self.added > 0:
+            self.evict()
+            self.added = 0
+        self.db.commit()
+
+    def evict(self):
+        """ discard least recently used entries until we are under 90% """
+        total = self.db.execute("SELECT SUM(size) FROM results").fetchone()
+        total = total[0] or 0
+        if total <= self.maxbytes:
+            return
+        excess = total - self.maxbytes * 9 / 10
+        cursor = self.db.execute("SELECT used, size FROM results "
+                                 "ORDER BY used")
+        for (used, size) in cursor:
+            excess -= size
+            if excess <= 0:
+                break
+        self.db.execute("DELETE FROM results WHERE used <= ?", (used,))
+
+    def close(self):
+        """ flush everything out and close the database """
+        self.flush()
+        self.db.close()
+
+    def report(self, f=sys.stderr):
+        """ print out hit/miss statistics """
+        f.write("result cache %s: %d hits, %d misses\n" %
+                (self.filename, self.hits, self.misses))
@@ -0,0 +1,129 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+local sensitivity of the probability of loss to each parameter
+
+    The elasticity of p_loss with respect to a parameter x is
+        d log(p_loss) / d log(x)
+    i.e. the percentage change in the probability of loss for a one
+    percent change in x.  An elasticity of 2 means that p_loss grows
+    as the square of x, and 0 means that x doesn't matter.
+
+    These are computed by central differences (x * (1 +/- h)), but
+    for every parameter of every configuration at once: a chunk of
+    configurations becomes a single ModelTable (with 2 perturbed rows
+    per parameter per configuration) that is evaluated by Compiled.
+
+    NOTE:
+        The scalar model computes recovery times with (Python 2) integer
+        division, which makes p_loss a step function of integer
+        parameters like rate_flush.  All of the differentiated parameters
+        are made floats (in every row, perturbed or not), so these are
+        the elasticities of the underlying smooth function.
+
+        Parameters that are inherently discrete (copies, decluster, and
+        component counts) are not differentiated, and neither is
+        anything with a value of zero (whose elasticity is undefined).
+"""
+
+from itertools import islice
+
+import numpy as np
+
+import Batch
+import Compiled
+from Model import Model
+from RelyFuncts import YEAR
+from sizes import PiB
+
+# parameters whose values are counts, not continuous quantities
+DISCRETE = ("copies", "decluster", "n_power", "m_power",
+            "n_fan", "m_fan", "n_nic", "m_nic", "domain_size",
+            "domain_copies", "n_feed", "m_feed", "n_tor", "m_tor")
+
+
+def parameters():
+    """ the (sorted) names of the continuous Model parameters """
+    m = Model("")
+    return [k for k in Batch.attributes()
+            if not isinstance(getattr(m, k), bool) and k not in DISCRETE]
+
+
+def elasticities(models, names=None, h=0.01, capacity=1*PiB,
+                 period=1*YEAR, chunk=1024):
+    """ elasticities of p_loss for a list of models
+            models -- list (or other iterable) of models
+            names -- parameters to be considered (default: all of them)
+            h -- relative perturbation
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            chunk -- number of models to evaluate at a time
+
+        returns an array with a row per model and a column per name
+            (NaN where the elasticity is undefined)
+    """
+    names = parameters() if names is None else list(names)
+    k = len(names)
+    rows = list()
+    models = iter(models)
+    while True:
+        mlist = list(islice(models, chunk))
+        if len(mlist) == 0:
+            break
+        base = Batch.ModelTable.fromModels(mlist)
+        n = len(mlist)
+
+        # block 0 is the base, blocks 2j+1/2j+2 perturb names[j] up/down
+        columns = dict()
+        for a in Batch.attributes():
+            columns[a] = np.tile(getattr(base, a), 2 * k + 1)
+        for (j, a) in enumerate(names):
+            col = columns[a].astype(float)
+            col[(2 * j + 1) * n:(2 * j + 2) * n] *= 1 + h
+            col[(2 * j + 2) * n:(2 * j + 3) * n] *= 1 - h
+            columns[a] = col
+        t = Batch.ModelTable(columns, n=n * (2 * k + 1))
+        p = Compiled.pLoss(t, capacity, period).reshape(2 * k + 1, n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logp = np.log(p)
+            e = (logp[1::2] - logp[2::2]) / (np.log1p(h) - np.log1p(-h))
+        for (j, a) in enumerate(names):
+            e[j][getattr(base, a) == 0] = np.nan
+        e[~np.isfinite(e)] = np.nan
+        rows.append(e.T)
+    if len(rows) == 0:
+        return np.zeros((0, k))
+    return np.vstack(rows)
+
+
+def sensitivity(models, top=8, capacity=1*PiB, period=1*YEAR):
+    """ print the parameters to which each model is most sensitive
+            models -- list of models
+            top -- number of parameters to list for each model
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+    """
+    models = list(models)
+    names = parameters()
+    e = elasticities(models, names, capacity=capacity, period=period)
+    for (i, m) in enumerate(models):
+        print("")
+        print("%s:" % (m.descr))
+        row = np.where(np.isnan(e[i]), 0, e[i])
+        shown = 0
+        for j in np.argsort(-np.abs(row), kind="mergesort"):
+            if shown >= top or abs(row[j]) < 1E-3:
+                break
+            print("\t%-14s %+8.3f" % (names[j], row[j]))
+            shown += 1
+        if shown == 0:
+            print("\t(insensitive to every parameter)")
+    return e
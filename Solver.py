@@ -0,0 +1,253 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+find the cheapest configuration that meets a durability target
+
+    Rather than running sweeps and looking for the cheapest line with
+    enough nines, we search the space of
+        copies, decluster, nv_1, nv_2, cache_1, cache_2  (discrete)
+        rate_flush, rate_mirror                          (graded)
+    for the configuration with the lowest (weighted) hardware cost
+    whose probability of loss is no greater than the target.
+
+    The discrete choices are tried in order of a lower bound on their
+    cost (their cost with the slowest rates), and the search stops as
+    soon as that lower bound exceeds the cheapest feasible configuration
+    found so far (branch and bound).
+
+    Within a discrete choice, faster flushing or remirroring can only
+    shorten the recovery windows, so the probability of loss can only
+    go down as either rate goes up.  Thus, if the fastest rates are not
+    good enough nothing is, and otherwise the minimum feasible mirror
+    rate for each flush rate can be found by bisection (and can only
+    get lower as the flush rate goes up).
+"""
+
+from Batch import ModelTable
+from Model import Model, Sizes
+from run import evaluate
+from RelyFuncts import YEAR
+from sizes import GB, MiB, PiB
+
+# relative costs of the hardware
+DEFAULT_COSTS = {
+    "node": 2000.0,         # per (primary or secondary) node
+    "dram": 10.0,           # per GB of volatile cache
+    "nvram": 40.0,          # per GB of non-volatile cache
+    "flush": 1.0,           # per MiB/s of flush bandwidth (per node)
+    "mirror": 0.5,          # per MiB/s of remirror bandwidth (per node)
+}
+
+# the choices to be considered
+DEFAULT_SPACE = {
+    "copies": [1, 2, 3, 4, 5],
+    "decluster": [1, 2, 4, 8],
+    "nv_1": [False, True],
+    "nv_2": [False, True],
+    "cache_1": [4 * GB],
+    "cache_2": [40 * GB],
+    "rate_flush": [50 * MiB * 2 ** i for i in range(7)],
+    "rate_mirror": [50 * MiB * 2 ** i for i in range(7)],
+}
+
+DISCRETE = ("copies", "decluster", "nv_1", "nv_2", "cache_1", "cache_2")
+
+
+def targetLoss(target):
+    """ the maximum acceptable probability of loss
+            target -- number of nines (>= 1), or probability of loss
+    """
+    return 10.0 ** -target if target >= 1 else float(target)
+
+
+class Solver:
+    """ a search for the cheapest configuration meeting a target """
+
+    def __init__(self, base, target, costs=None, space=None,
+                 capacity=1*PiB, period=1*YEAR, aging=None):
+        """ describe the problem
+            base -- Model with all of the parameters that are not varied
+            target -- number of nines (>= 1), or probability of loss
+            costs -- relative hardware costs (default DEFAULT_COSTS)
+            space -- lists of values for each of the varied parameters
+                     (missing parameters are taken from DEFAULT_SPACE)
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            aging -- Aging (age-dependent FIT rates) or None
+        """
+        self.base = base
+        self.p_target = targetLoss(target)
+        self.costs = dict(DEFAULT_COSTS)
+        self.costs.update(costs or dict())
+        self.space = dict(DEFAULT_SPACE)
+        self.space.update(space or dict())
+        self.space["rate_flush"] = sorted(self.space["rate_flush"])
+        self.space["rate_mirror"] = sorted(self.space["rate_mirror"])
+        self.capacity = capacity
+        self.period = period
+        self.aging = aging
+        self.evaluations = 0        # number of Results computed
+
+    def gridSize(self):
+        """ number of points a brute force search would evaluate """
+        n = 1
+        for k in self.space:
+            n *= len(self.space[k])
+        return n
+
+    def model(self, choice, flush, mirror):
+        """ instantiate a Model for a point in the search space """
+        m = Model("")
+        m.__dict__.update(self.base.__dict__)
+        for (k, v) in zip(DISCRETE, choice):
+            setattr(m, k, v)
+        m.rate_flush = flush
+        m.rate_mirror = mirror
+        return m
+
+    def cost(self, m, sizes):
+        """ the relative hardware cost of a configuration """
+        c = self.costs
+        mem1 = c["nvram"] if m.nv_1 else c["dram"]
+        mem2 = c["nvram"] if m.nv_2 else c["dram"]
+        per1 = c["node"] + mem1 * m.cache_1 / GB + \
+            c["flush"] * m.rate_flush / MiB + \
+            (c["mirror"] * m.rate_mirror / MiB if m.copies > 1 else 0)
+        per2 = c["node"] + mem2 * m.cache_2 / GB
+        n2 = 0 if m.symmetric else sizes.n_secondary
+        return sizes.n_primary * per1 + n2 * per2
+
+    def aged(self, m):
+        """ a configuration with its FIT rates adjusted for age
+            (each one, because NVRAM wear depends on the cache sizes)
+        """
+        if self.aging is None:
+            return m
+        return self.aging.table(ModelTable.fromModels([m]),
+                                self.capacity, self.period).model(0)
+
+    def feasible(self, m):
+        """ does a configuration meet the target (and what is p_loss) """
+        self.evaluations += 1
+        (sizes, rates, results) = evaluate(self.aged(m), self.capacity,
+                                           self.period)
+        return (results.p_loss <= self.p_target, results.p_loss)
+
+    def choices(self):
+        """ the distinct discrete choices (in order of a lower bound on
+            their cost), as (bound, choice) pairs
+        """
+        flush = self.space["rate_flush"][0]
+        mirror = self.space["rate_mirror"][0]
+        seen = set()
+        result = list()
+        for copies in self.space["copies"]:
+            for decluster in self.space["decluster"]:
+                for nv_1 in self.space["nv_1"]:
+                    for nv_2 in self.space["nv_2"]:
+                        for cache_1 in self.space["cache_1"]:
+                            for cache_2 in self.space["cache_2"]:
+                                # without copies, some choices are moot
+                                if copies == 1:
+                                    decluster = 1
+                                    nv_2 = self.space["nv_2"][0]
+                                    cache_2 = self.space["cache_2"][0]
+                                choice = (copies, decluster, nv_1, nv_2,
+                                          cache_1, cache_2)
+                                if choice in seen:
+                                    continue
+                                seen.add(choice)
+                                m = self.model(choice, flush, mirror)
+                                bound = self.cost(m, Sizes(m, self.capacity))
+                                result.append((bound, choice))
+        result.sort()
+        return result
+
+    def solve(self):
+        """ find the cheapest feasible configuration
+                returns (model, cost, p_loss), or None if nothing works
+        """
+        flushes = self.space["rate_flush"]
+        mirrors = self.space["rate_mirror"]
+        best = None
+        for (bound, choice) in self.choices():
+            if best is not None and bound >= best[1]:
+                break       # nothing that remains can be any cheaper
+
+            # if the fastest rates aren't good enough, nothing is
+            m = self.model(choice, flushes[-1], mirrors[-1])
+            (ok, p) = self.feasible(m)
+            if not ok:
+                continue
+            known = {(len(flushes) - 1, len(mirrors) - 1): p}
+
+            # slowest mirror rate that works, for each flush rate
+            hi = len(mirrors) - 1
+            for i in range(len(flushes)):
+                # mirror rates >= hi are feasible (at this flush rate)
+                if (i, hi) not in known:
+                    m = self.model(choice, flushes[i], mirrors[hi])
+                    (ok, p) = self.feasible(m)
+                    if not ok:
+                        continue
+                    known[(i, hi)] = p
+                lo = -1         # mirror rates <= lo are infeasible
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    m = self.model(choice, flushes[i], mirrors[mid])
+                    (ok, p) = self.feasible(m)
+                    if ok:
+                        hi = mid
+                        known[(i, hi)] = p
+                    else:
+                        lo = mid
+
+                m = self.model(choice, flushes[i], mirrors[hi])
+                c = self.cost(m, Sizes(m, self.capacity))
+                if best is None or c < best[1]:
+                    best = (m, c, known[(i, hi)])
+                if hi == 0:
+                    break   # faster flushing would only cost more
+        return best
+
+
+def solve(base, target, costs=None, space=None,
+          capacity=1*PiB, period=1*YEAR, aging=None):
+    """ find and report the cheapest configuration meeting a target
+            base -- Model with all of the parameters that are not varied
+            target -- number of nines (>= 1), or probability of loss
+            costs -- relative hardware costs (default DEFAULT_COSTS)
+            space -- lists of values for each of the varied parameters
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+            aging -- Aging (age-dependent FIT rates) or None
+    """
+    from run import printParms
+    from ColumnPrint import printProbability
+    solver = Solver(base, target, costs, space, capacity, period, aging)
+    best = solver.solve()
+    print("target: Ploss <= %s (per year), %d of %d points evaluated" %
+          (printProbability(solver.p_target).strip(), solver.evaluations,
+           solver.gridSize()))
+    if best is None:
+        print("no configuration in the search space meets the target")
+        return None
+
+    (m, cost, p) = best
+    (sizes, rates, results) = evaluate(solver.aged(m), capacity, period)
+    printParms(solver.aged(m), sizes, rates)
+    print("")
+    print("cheapest: copies=%d, decluster=%d, %s primary, %s secondary, "
+          "cost=%.0f, Ploss=%s" %
+          (m.copies, m.decluster, "nv" if m.nv_1 else "volatile",
+           "nv" if m.nv_2 else "volatile", cost,
+           printProbability(p).strip()))
+    return best
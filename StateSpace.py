@@ -0,0 +1,167 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+generate failure/recovery state models for any number of copies
+
+    Sym3C and Asy3C are drawn by hand for three copies.  This module
+    generates the equivalent state model (in the same graphviz format,
+    so that it can be drawn with rundot.sh or solved with Markov.py)
+    for any number of copies, with the recovery phases made explicit:
+
+        primary failed ... its secondaries are detecting the failure
+                (Td) and then flushing its dirty data (Ts)
+        secondaries failed ... the primaries that were mirroring to
+                them are timing out (Tt) and then remirroring (Tp)
+
+    A model with C copies must keep track of up to C-1 failed
+    secondaries, each of which might be in any phase.  Since all of
+    the secondaries holding copies of a primary's data are alike, we
+    lump the states by the NUMBER of secondaries in each phase rather
+    than by which ones they are, which reduces an exponential number
+    of states to (C-1)*C/2 + 3*(C-1) + 2 (e.g. 11 for 3 copies).
+
+    Declustering does not change the shape of the model, only the
+    number of secondaries involved (Fo, Fi) and the recovery times,
+    which are bound when the model is solved.
+
+    Note that, as in any CTMC, each phase has an exponentially
+    distributed (rather than fixed) duration.  This makes long windows
+    more likely than they really are, so combinations of two or more
+    failures within a window come out somewhat (up to 2x) more likely
+    than in the hand-drawn models, which assume fixed windows.
+"""
+
+from Markov import StateGraph
+
+HEADER = """#
+# %s - a generated state-model for event combinations leading to
+#\t\tdata loss in a%s %d-copy vCACHE configuration
+#
+# Format:
+#\tThis is a graphvis directed graph, augmented with class/rate attributes
+#
+# Rate Multiplier Legend (see also Sym3C/Asy3C)
+#\t1Y ... any time, FL ... while flushing (including UREs)
+#\t1/T ... completion of a Tt (timeout), Td (detect), Ts (flush),
+#\t\tor Tp (remirror) phase
+#
+digraph vCACHE {
+\trankdir=LR;
+\tnode [ fixedsize = true, height = 1.25 ];
+"""
+
+
+def _secondaries(timing, mirroring):
+    """ name of a state with failed secondaries (and their phases) """
+    return "S-%d:%dt,%dr" % (timing + mirroring, timing, mirroring)
+
+
+def _primary(phase, failed):
+    """ name of a state with a failed primary (and failed secondaries) """
+    if failed == 0:
+        return "P-1:%s" % (phase)
+    return "P-1:%s,S-%d" % (phase, failed)
+
+
+def _count(base, k):
+    """ a rate multiplier expression for base - k """
+    return base if k == 0 else "%s-%d" % (base, k)
+
+
+def generate(copies, symmetric=False, name=None):
+    """ generate the text of a state model
+            copies -- number of copies (primary + secondaries)
+            symmetric -- every node is both a primary and a secondary
+            name -- name to put in the header comment
+    """
+    scp = copies - 1
+    if name is None:
+        name = "%s%dC" % ("Sym" if symmetric else "Asy", copies)
+    lines = [HEADER % (name, " symmetric" if symmetric else "n asymmetric",
+                       copies)]
+
+    def state(s, kind, color, shape="circle"):
+        lines.append('\t"%s" [ state = "%s" shape = %s color = %s ];' %
+                     (s, kind, shape, color))
+
+    def edge(src, dst, window, mult):
+        lines.append('\t"%s" -> "%s" [ label = "%s, %s" ];' %
+                     (src, dst, window, mult))
+
+    # the states
+    state("OK", "nominal", "green", "doublecircle")
+    for k in range(1, scp + 1):
+        for t in range(k, -1, -1):
+            state(_secondaries(t, k - t),
+                  "critical" if k == scp else "compromised", "orange")
+    for phase in ("detect", "flush"):
+        for k in range(0, scp):
+            state(_primary(phase, k),
+                  "critical" if k == scp - 1 else "compromised", "orange")
+    state("FAIL", "failed", "red", "doublecircle")
+
+    # the first failure (in a symmetric cluster, a node is both)
+    first = "detect" if scp > 0 else None
+    edge("OK", _primary(first, 0) if first else "FAIL", "1Y",
+         "N" if symmetric else "Np")
+    if scp > 0:
+        edge("OK", _secondaries(1, 0), "1Y", "N" if symmetric else "Ns")
+
+    # failed secondaries, in various phases of recovery
+    for k in range(1, scp + 1):
+        for t in range(k, -1, -1):
+            r = k - t
+            src = _secondaries(t, r)
+
+            # a primary mirroring to them fails
+            edge(src, "FAIL" if k == scp else _primary("detect", k),
+                 "1Y", "Fi")
+
+            # another secondary holding copies of the same primary fails
+            if k < scp:
+                edge(src, _secondaries(t + 1, r), "1Y", _count("Fo", k))
+
+            # they finish timing out, or finish remirroring
+            if t > 0:
+                edge(src, _secondaries(t - 1, r + 1), "1/Tt", t)
+            if r > 0:
+                edge(src, "OK" if k == 1 else _secondaries(t, r - 1),
+                     "1/Tp", r)
+
+    # a failed primary, whose data survives only on secondaries
+    for k in range(0, scp):
+        for phase in ("detect", "flush"):
+            src = _primary(phase, k)
+            dst = "FAIL" if k + 1 == scp else _primary(phase, k + 1)
+            edge(src, dst, "FL" if phase == "flush" else "1Y",
+                 _count("Fo", k))
+        edge(_primary("detect", k), _primary("flush", k), "1/Td", 1)
+        edge(_primary("flush", k), "OK", "1/Ts", 1)
+
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def stateGraph(model):
+    """ the (parsed) generated state model for a Model """
+    return StateGraph(generate(model.copies, model.symmetric))
+
+
+if __name__ == "__main__":
+    # write out a generated model, e.g. to be drawn by rundot.sh
+    from optparse import OptionParser
+    parser = OptionParser(usage="usage: %prog [options] copies")
+    parser.add_option("-s", "--symmetric", dest="symmetric",
+                      action="store_true", default=False,
+                      help="symmetric (every node a primary)")
+    (opts, args) = parser.parse_args()
+    for a in args:
+        print(generate(int(a), opts.symmetric))
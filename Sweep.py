@@ -0,0 +1,192 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+declarative parameter sweeps
+
+    A sweep is described by a JSON file like:
+
+        {
+          "base": { "cache_1": "4 * GB", "cache_2": 0 },
+          "axes": [
+            { "name": "copies", "values": [1, 2, 3] },
+            { "name": "primary", "values": {
+                " v": { "nv_1": false },
+                "nv": { "nv_1": true } } }
+          ],
+          "exclude": [ "copies == 1 and primary == ' v'" ],
+          "descr": "'%d copies, %s primary' % (copies, primary)"
+        }
+
+    base ... Model attributes to override in every configuration
+    axes ... (in nesting order) the dimensions to be crossed, either
+        a list of values for the Model attribute of the same name, or
+        a map from value labels to the attributes that value implies
+    exclude ... conditions (on the axis values) under which a
+        combination is skipped
+    let ... (optional) names for expressions used in descriptions
+    descr ... an expression for the description of each configuration,
+        or a list of [condition, expression] pairs (the first pair whose
+        condition is true is used)
+
+    Any string attribute value is an expression, evaluated (in order)
+    after the values before it have been set, which can use the size
+    and time constants (GB, MiB, SECOND, YEAR, ...), the current value
+    of any Model attribute, the (label) value of any axis, and the
+    ColumnPrint formatting functions.
+
+    The combinations are expanded lazily, so even a sweep with millions
+    of points never exists as a list of Model objects.
+"""
+
+import os
+import json
+from collections import OrderedDict
+from itertools import product
+from types import CodeType
+
+import sizes
+import RelyFuncts
+import ColumnPrint
+from Model import Model
+
+# names that any sweep expression may use
+CONSTANTS = dict()
+for k in ("KiB", "MiB", "GiB", "TiB", "PiB", "KB", "MB", "GB", "TB"):
+    CONSTANTS[k] = getattr(sizes, k)
+for k in ("SECOND", "MINUTE", "HOUR", "DAY", "YEAR", "BILLION"):
+    CONSTANTS[k] = getattr(RelyFuncts, k)
+for k in ("printSize", "printTime", "printFloat", "printExp"):
+    CONSTANTS[k] = getattr(ColumnPrint, k)
+
+# the only builtins they may use
+BUILTINS = {"True": True, "False": False, "None": None,
+            "abs": abs, "min": min, "max": max, "int": int, "float": float}
+
+
+def _compile(expr, what):
+    """ compile a sweep expression (reporting where a bad one came from) """
+    try:
+        return compile(expr, "<%s>" % (what), "eval")
+    except SyntaxError:
+        raise ValueError("bad %s expression: %s" % (what, expr))
+
+
+class Sweep:
+    """ a lazily expanded Cartesian product of Model configurations """
+
+    def __init__(self, spec):
+        """ digest a sweep specification
+            spec -- (parsed JSON) dictionary, as described above
+        """
+        attrs = set(vars(Model("")))
+        for k in spec:
+            if k not in ("base", "axes", "exclude", "let", "descr"):
+                raise ValueError("unknown sweep field: %s" % (k))
+
+        # every assignment is a (name, value or compiled expression)
+        def assignments(d, what):
+            result = list()
+            for (k, v) in d.items():
+                if k not in attrs or k == "descr":
+                    raise ValueError("%s: unknown Model attribute: %s" %
+                                     (what, k))
+                if isinstance(v, basestring):
+                    v = _compile(v, "%s %s" % (what, k))
+                result.append((k, v))
+            return result
+
+        self.base = assignments(spec.get("base", dict()), "base")
+
+        # each axis is a name and a list of (label, assignments)
+        self.axes = list()
+        for a in spec.get("axes", list()):
+            name = a["name"]
+            values = a["values"]
+            if isinstance(values, dict):
+                values = [(label, assignments(v, "%s=%s" % (name, label)))
+                          for (label, v) in values.items()]
+            elif name in attrs:
+                values = [(v, [(name, v)]) for v in values]
+            else:
+                raise ValueError("axis %s: not a Model attribute" % (name))
+            self.axes.append((name, values))
+
+        self.exclude = [_compile(e, "exclude")
+                        for e in spec.get("exclude", list())]
+
+        self.let = [(k, _compile(e, "let %s" % (k)))
+                    for (k, e) in spec.get("let", dict()).items()]
+
+        descr = spec.get("descr", "''")
+        if isinstance(descr, basestring):
+            descr = [["True", descr]]
+        self.descr = [(_compile(c, "descr"), _compile(e, "descr"))
+                      for (c, e) in descr]
+
+    def size(self):
+        """ number of combinations (before exclusions) """
+        n = 1
+        for (name, values) in self.axes:
+            n *= len(values)
+        return n
+
+    def _set(self, m, assignments, symbols):
+        """ apply a list of assignments to a model """
+        for (k, v) in assignments:
+            if isinstance(v, CodeType):
+                symbols.update(vars(m))
+                v = eval(v, symbols)
+            setattr(m, k, v)
+
+    def models(self):
+        """ generate the (non-excluded) configurations, in order """
+        names = [name for (name, values) in self.axes]
+        symbols = dict(CONSTANTS)
+        symbols["__builtins__"] = BUILTINS
+        for combo in product(*[values for (name, values) in self.axes]):
+            labels = dict(zip(names, [label for (label, a) in combo]))
+            symbols.update(labels)
+            if any([eval(e, symbols) for e in self.exclude]):
+                continue
+
+            m = Model("")
+            self._set(m, self.base, symbols)
+            for (label, assignments) in combo:
+                self._set(m, assignments, symbols)
+
+            symbols.update(vars(m))
+            symbols.update(labels)
+            for (k, e) in self.let:
+                symbols[k] = eval(e, symbols)
+            for (cond, expr) in self.descr:
+                if eval(cond, symbols):
+                    m.descr = eval(expr, symbols)
+                    break
+            yield m
+
+
+def load(filename):
+    """ read a sweep specification from a JSON file """
+    f = open(filename)
+    try:
+        return Sweep(json.load(f, object_pairs_hook=OrderedDict))
+    finally:
+        f.close()
+
+
+def path(name):
+    """ find a sweep specification that lives with the code """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+
+
+def isSweep(name):
+    """ does a command line argument name a sweep (vs a test module) """
+    return name.endswith(".json")
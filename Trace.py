@@ -0,0 +1,408 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+trace-driven dirty data
+
+    Results assumes that every primary always holds max_dirty bytes of
+    unflushed data.  Real workloads are burstier: right after a flush a
+    primary holds almost nothing, and rewrites of blocks that are
+    already dirty don't add to what must be flushed.  This module
+    replays block I/O traces through a write-back cache simulator, and
+    measures
+        the (time-weighted) distribution of dirty bytes per primary
+        the effective write aggregation (blocks written / flushed)
+
+    Traces are CSV text (optionally gzip or bzip2 compressed), one
+    request per line, and FORMATS describes which fields are which:
+        msr ... Timestamp,Hostname,DiskNumber,Type,Offset,Size,Response
+            (the SNIA/MSR Cambridge format, time in 100ns ticks)
+        simple ... seconds,R|W,offset,size
+    Lines that don't have the right number of fields or don't start
+    with a digit (headers, comments) are ignored.
+
+    Traces are read a chunk (of bytes) at a time.  Each chunk's lines
+    are checked (as arrays of delimiter positions), its non-numeric
+    fields are translated into digits (W for write becomes 1, other
+    letters 0), and numpy parses the whole chunk into a single array.
+    With a key field (e.g. DiskNumber), each distinct key is replayed
+    through its own primary's cache.
+
+    The cache simulator tracks the set of dirty blocks, and flushes all
+    of them when there are max_dirty bytes of them.  Writes are handled
+    a window at a time: within a window, the writes that dirty a new
+    block are those that are the first to that block and hit a block
+    that was not already dirty, so a cumulative sum gives the dirty
+    level after every write, and a binary search finds the next flush.
+
+    The measured distribution then drives b2f, Ts and Tp: Batch
+    evaluates the model with max_dirty at every histogram bin (and
+    write_aggr as measured), and Ploss is the time-weighted average,
+    since a failure sees whatever was dirty at the time it happened.
+"""
+
+import bz2
+import gzip
+import string
+
+import numpy as np
+
+import Batch
+from RelyFuncts import YEAR
+from ColumnPrint import ColumnPrint, printProbability, printSize
+from sizes import PiB
+
+CHUNK = 16 * 1024 * 1024    # bytes of trace to parse at a time
+BINS = 100                  # buckets in the dirty data histogram
+
+# field positions, time unit (seconds) and whether times have fractions
+FORMATS = {
+    "msr": {"fields": 7, "time": 0, "key": 2, "op": 3,
+            "offset": 4, "size": 5, "unit": 1E-7, "fraction": False},
+    "simple": {"fields": 4, "time": 0, "key": None, "op": 1,
+               "offset": 2, "size": 3, "unit": 1.0, "fraction": True},
+}
+
+
+def translation(fraction):
+    """ what each character becomes before numeric parsing
+            fraction -- whether decimal points are to be kept
+
+        W (or w) becomes 1, other letters (e.g. Read, host names)
+            become 0, and the ends of lines become field separators
+    """
+    other = string.ascii_letters + "-_:" + ("" if fraction else ".")
+    digits = "".join(["1" if c in "Ww" else "0" for c in other])
+    return string.maketrans(other + "\n\r", digits + ", ")
+
+
+TEXT = {False: translation(False), True: translation(True)}
+
+
+def openTrace(filename):
+    """ open a (possibly compressed) trace for streaming """
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    if filename.endswith(".bz2"):
+        return bz2.BZ2File(filename, "rb")
+    return open(filename, "rb")
+
+
+def chunks(f, size=CHUNK):
+    """ generate blocks of complete lines from a file """
+    rest = b""
+    while True:
+        data = f.read(size)
+        if len(data) == 0:
+            if len(rest) > 0:
+                yield rest + b"\n"
+            return
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        if cut > 0:
+            yield data[:cut]
+
+
+def parse(text, format):
+    """ parse a block of complete lines
+            text -- the lines (a string)
+            format -- a FORMATS entry
+
+        returns (time, key, write, offset, size) arrays
+            (time in the trace's own units, key None without one)
+    """
+    a = np.frombuffer(text, dtype=np.uint8)
+    fields = format["fields"]
+    delim = np.nonzero((a == 44) | (a == 10))[0]
+    newline = a[delim] == 10
+    ends = np.nonzero(newline)[0]
+
+    # only keep lines with the right number of fields
+    count = np.diff(np.concatenate(([-1], ends)))
+    starts = np.zeros(len(ends), dtype=np.int64)
+    starts[1:] = delim[ends[:-1]] + 1
+    first = a[np.minimum(starts, max(len(a) - 1, 0))]
+    good = (count == fields) & (first >= 48) & (first <= 57)
+    if not good.all():
+        lines = text.split(b"\n")
+        text = b"".join([l + b"\n" for (l, g) in zip(lines, good) if g])
+
+    # everything else becomes digits, so numpy can parse it all at once
+    fraction = format["fraction"]
+    x = np.fromstring(text.translate(TEXT[fraction]), sep=",",
+                      dtype=float if fraction else np.int64)
+    if len(x) != fields * good.sum():
+        raise ValueError("malformed trace data")
+    x = x.reshape(-1, fields)
+    key = None if format["key"] is None else \
+        x[:, format["key"]].astype(np.int64)
+    return (x[:, format["time"]], key, x[:, format["op"]] != 0,
+            x[:, format["offset"]].astype(np.int64),
+            x[:, format["size"]].astype(np.int64))
+
+
+def blocks(offset, size, bsize):
+    """ expand requests into the (index of each) block they touch """
+    first = offset // bsize
+    last = (offset + np.maximum(size, 1) - 1) // bsize
+    count = last - first + 1
+    total = int(count.sum())
+    base = np.repeat(first - np.cumsum(count) + count, count)
+    return (base + np.arange(total, dtype=np.int64), count)
+
+
+class Cache:
+    """ write-back cache (dirty block) simulator for one primary """
+
+    def __init__(self, max_dirty, bsize):
+        """ an empty cache
+            max_dirty -- flush threshold (bytes)
+            bsize -- block size (bytes)
+        """
+        self.bsize = bsize
+        self.limit = max(1, int(max_dirty // bsize))
+        self.dirty = np.zeros(0, dtype=np.int64)    # sorted block ids
+        self.hist = np.zeros(BINS)      # seconds at each dirty level
+        self.last = None                # time of the last write
+        self.written = 0                # blocks written
+        self.pending = 0                # ... since the last flush
+        self.flushed = 0                # blocks flushed
+        self.aggregated = 0             # blocks written then flushed
+        self.flushes = 0
+        self.peak = 0                   # most dirty blocks
+
+    def write(self, time, blocks):
+        """ replay a (time ordered) sequence of block writes
+                time -- array of write times (seconds)
+                blocks -- array of block numbers
+        """
+        pos = 0
+        window = min(max(4 * self.limit, 4096), 1 << 20)
+        while pos < len(blocks):
+            w = blocks[pos:pos + window]
+            t = time[pos:pos + window]
+            if self.last is None:
+                self.last = t[0]
+
+            # which of these dirty a block that wasn't already: sorting
+            # (block, position) pairs puts each block's first write first
+            pairs = np.sort((w << 20) | np.arange(len(w), dtype=np.int64))
+            b = pairs >> 20
+            first = np.ones(len(w), dtype=bool)
+            first[1:] = b[1:] != b[:-1]
+            new = np.zeros(len(w), dtype=bool)
+            new[pairs[first] & 0xFFFFF] = True
+            if len(self.dirty) > 0:
+                i = np.searchsorted(self.dirty, w)
+                i[i == len(self.dirty)] = 0
+                new &= self.dirty[i] != w
+            level = len(self.dirty) + np.cumsum(new)
+            hit = int(np.searchsorted(level, self.limit))
+            n = min(hit + 1, len(w))
+
+            # the dirty level (in bytes) since the previous write
+            before = np.empty(n)
+            before[0] = len(self.dirty)
+            before[1:] = level[:n - 1]
+            dt = np.diff(np.concatenate(([self.last], t[:n])))
+            bins = np.minimum((before * BINS / self.limit).astype(int),
+                              BINS - 1)
+            self.hist += np.bincount(bins, weights=np.maximum(dt, 0),
+                                     minlength=BINS)
+            self.peak = max(self.peak, int(level[n - 1]))
+            self.written += n
+            self.pending += n
+            self.last = t[n - 1]
+            if hit < len(w):
+                # flush everything
+                self.flushed += int(level[hit])
+                self.aggregated += self.pending
+                self.pending = 0
+                self.flushes += 1
+                self.dirty = np.zeros(0, dtype=np.int64)
+            else:
+                self.dirty = np.sort(np.concatenate((self.dirty, w[new])))
+            pos += n
+
+
+class Replay:
+    """ the dirty data statistics for a trace """
+
+    def __init__(self, filename, max_dirty, bsize, format="msr",
+                 chunk=CHUNK):
+        """ replay a trace through a cache for each primary
+            filename -- the trace (.gz and .bz2 are decompressed)
+            max_dirty -- flush threshold (bytes)
+            bsize -- block size (bytes)
+            format -- name of a FORMATS entry
+            chunk -- bytes of trace to parse at a time
+        """
+        if format not in FORMATS:
+            raise ValueError("unknown trace format: %s (try %s)" %
+                             (format, ", ".join(sorted(FORMATS))))
+        fmt = FORMATS[format]
+        self.filename = filename
+        self.max_dirty = max_dirty
+        self.bsize = bsize
+        self.caches = dict()
+        self.records = 0
+        self.writes = 0
+        self.start = None
+        self.end = None
+        f = openTrace(filename)
+        try:
+            for text in chunks(f, chunk):
+                (time, key, write, offset, size) = parse(text, fmt)
+                self.records += len(time)
+                if len(time) == 0:
+                    continue
+                if self.start is None:
+                    self.start = time[0]
+                self.end = time[-1]
+                time = (time[write] - self.start) * fmt["unit"]
+                offset = offset[write]
+                size = size[write]
+                self.writes += len(time)
+                if key is None:
+                    self.__replay(0, time, offset, size)
+                    continue
+                # each key's writes, still in time order
+                key = key[write]
+                order = np.argsort(key, kind="mergesort")
+                key = key[order]
+                bounds = np.concatenate(
+                    ([0], np.nonzero(key[1:] != key[:-1])[0] + 1,
+                     [len(key)]))
+                for j in range(len(bounds) - 1):
+                    i = order[bounds[j]:bounds[j + 1]]
+                    if len(i) > 0:
+                        self.__replay(int(key[bounds[j]]), time[i],
+                                      offset[i], size[i])
+        finally:
+            f.close()
+        if self.start is not None:
+            self.duration = (self.end - self.start) * fmt["unit"]
+        else:
+            self.duration = 0
+
+    def __replay(self, key, time, offset, size):
+        if key not in self.caches:
+            self.caches[key] = Cache(self.max_dirty, self.bsize)
+        (b, count) = blocks(offset, size, self.bsize)
+        self.caches[key].write(np.repeat(time, count), b)
+
+    def histogram(self):
+        """ fraction of (primary) time at each dirty level
+            returns (bin centers in bytes, fractions)
+        """
+        hist = np.zeros(BINS)
+        for c in self.caches.values():
+            hist += c.hist
+        top = max(1, int(self.max_dirty // self.bsize)) * self.bsize
+        edges = np.linspace(0, top, BINS + 1)
+        total = hist.sum()
+        return ((edges[:-1] + edges[1:]) / 2,
+                hist / total if total > 0 else hist)
+
+    def percentile(self, q):
+        """ dirty bytes not exceeded q percent of the time """
+        (level, frac) = self.histogram()
+        cdf = np.cumsum(frac)
+        if cdf[-1] == 0:
+            return 0
+        i = min(int(np.searchsorted(cdf, q / 100.0)), BINS - 1)
+        return level[i]
+
+    def mean(self):
+        """ the time-weighted mean dirty bytes """
+        (level, frac) = self.histogram()
+        return float((level * frac).sum())
+
+    def aggregation(self):
+        """ blocks written per block flushed (None without a flush) """
+        flushed = sum(c.flushed for c in self.caches.values())
+        written = sum(c.aggregated for c in self.caches.values())
+        return float(written) / flushed if flushed > 0 else None
+
+
+def pLoss(m, replay, capacity=1*PiB, period=1*YEAR):
+    """ probability of loss for a model, given a replayed trace
+            m -- the base simulation parameters
+            replay -- Replay (with the model's max_dirty and bsize)
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+
+        returns (Ploss with max_dirty always dirty, Ploss weighted by
+            the measured distribution of dirty data)
+    """
+    p_max = Batch.evaluate([m], capacity, period)[2].p_loss[0]
+    (level, frac) = replay.histogram()
+    used = np.nonzero(frac)[0]
+    if len(used) == 0:
+        return (p_max, 0.0)
+
+    # each bin's dirty data, in whole blocks (as the cache would hold)
+    t = Batch.ModelTable.fromModels([m])
+    columns = dict()
+    for a in Batch.attributes():
+        columns[a] = np.repeat(getattr(t, a), len(used))
+    columns["max_dirty"] = (level[used] // m.bsize).astype(np.int64) * \
+        m.bsize
+    aggr = replay.aggregation()
+    if aggr is not None:
+        columns["write_aggr"] = np.repeat(aggr, len(used))
+    t = Batch.ModelTable(columns, n=len(used))
+    p = Batch.evaluate(t, capacity, period)[2].p_loss
+    return (p_max, float((p * frac[used]).sum()))
+
+
+def trace(models, filename, format="msr", capacity=1*PiB, period=1*YEAR):
+    """ replay a trace and report what it does to each model
+            models -- list (or other iterable) of models
+            filename -- the trace
+            format -- name of a FORMATS entry
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+    """
+    replays = dict()
+    rows = list()
+    for m in models:
+        k = (m.max_dirty, m.bsize)
+        if k not in replays:
+            r = Replay(filename, m.max_dirty, m.bsize, format)
+            replays[k] = r
+            aggr = r.aggregation()
+            print("%s: %d records, %d writes, %.1f seconds, %d primaries" %
+                  (filename, r.records, r.writes, r.duration,
+                   len(r.caches)))
+            print("    max_dirty=%s: %d flushes, aggregation %s" %
+                  (printSize(m.max_dirty),
+                   sum(c.flushes for c in r.caches.values()),
+                   "n/a" if aggr is None else "%.2f" % (aggr)))
+            print("    dirty: mean %s, 50%% %s, 99%% %s, peak %s" %
+                  (printSize(r.mean()), printSize(r.percentile(50)),
+                   printSize(r.percentile(99)),
+                   printSize(max([c.peak for c in r.caches.values()] +
+                                 [0]) * m.bsize)))
+        (p_max, p_trace) = pLoss(m, replays[k], capacity, period)
+        rows.append((m.descr, p_max, p_trace))
+
+    if len(rows) == 0:
+        return
+    heads = ["configuration", "Ploss(max)", "Ploss(trace)"]
+    maxlen = len(heads[0])
+    for (descr, p_max, p_trace) in rows:
+        maxlen = max(maxlen, len(descr))
+    format = ColumnPrint(heads, maxdesc=maxlen)
+    format.printHeadings()
+    for (descr, p_max, p_trace) in rows:
+        format.printLine([descr, printProbability(p_max),
+                          printProbability(p_trace)])
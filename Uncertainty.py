@@ -0,0 +1,319 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+propagation of the uncertainty in the (guessed) input parameters
+
+    Many of the Model parameters (e.g. dram_2bit and sw_hard) are little
+    more than guesses.  Rather than a single answer, we can give each
+    of those a distribution, and look at the resulting distribution of
+    the probability of loss.  This is described by a JSON file like:
+
+        {
+          "method": "sobol",
+          "samples": 65536,
+          "seed": 1,
+          "percentiles": [5, 50, 95],
+          "inputs": {
+            "dram_2bit": ["loguniform", 0.001, 0.1],
+            "f_dram": ["lognormal", "f_dram", 3]
+          }
+        }
+
+    method ... "lhs" (Latin hypercube) or "sobol" (randomly shifted
+        Sobol sequence, best with a power of two samples)
+    samples ... number of samples (per configuration)
+    inputs ... a distribution for each uncertain parameter:
+        uniform lo hi
+        loguniform lo hi
+        normal mean sd
+        lognormal median error-factor (the 95th percentile / median)
+        triangular lo mode hi
+      whose parameters may be expressions (as in a Sweep) that can use
+      the (nominal) value of any Model attribute
+
+    Besides percentiles of Ploss and nines, we estimate (on log Ploss)
+    the Sobol first order (S1) and total (ST) sensitivity indices for
+    each input: the fraction of the output variance that is due to
+    that input alone, and to that input and its interactions.  These
+    use the Saltelli (S1) and Jansen (ST) estimators, which need
+    (inputs + 2) * samples evaluations, all done by Compiled (every
+    sample of a configuration has the same structure).
+"""
+
+import json
+import math
+from collections import OrderedDict
+
+import numpy as np
+from scipy.special import ndtri
+
+import Batch
+import Compiled
+import Sweep
+from RelyFuncts import FitRate, YEAR
+from Sensitivity import parameters
+from ColumnPrint import printProbability
+from sizes import PiB
+
+Z95 = 1.6448536269514722    # standard normal 95th percentile
+
+
+def _uniform(u, lo, hi):
+    return lo + u * (hi - lo)
+
+
+def _loguniform(u, lo, hi):
+    return np.exp(math.log(lo) + u * (math.log(hi) - math.log(lo)))
+
+
+def _normal(u, mean, sd):
+    return mean + sd * ndtri(u)
+
+
+def _lognormal(u, median, factor):
+    return median * np.exp(ndtri(u) * math.log(factor) / Z95)
+
+
+def _triangular(u, lo, mode, hi):
+    c = float(mode - lo) / (hi - lo)
+    return np.where(u < c,
+                    lo + np.sqrt(u * (hi - lo) * (mode - lo)),
+                    hi - np.sqrt((1 - u) * (hi - lo) * (hi - mode)))
+
+
+# inverse CDFs (of a uniform sample) for each kind of distribution
+DISTRIBUTIONS = {
+    "uniform": _uniform,
+    "loguniform": _loguniform,
+    "normal": _normal,
+    "lognormal": _lognormal,
+    "triangular": _triangular,
+}
+
+# Sobol sequence direction numbers for dimensions 2, 3, ...
+#   (degree, primitive polynomial coefficients, initial m values)
+DIRECTIONS = [
+    (1, 0, [1]), (2, 1, [1, 3]), (3, 1, [1, 3, 1]), (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]), (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]), (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]), (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]), (5, 14, [1, 3, 5, 5, 31]),
+    (6, 1, [1, 3, 3, 9, 7, 49]), (6, 13, [1, 1, 1, 15, 21, 21]),
+    (6, 16, [1, 3, 1, 13, 27, 49]), (6, 19, [1, 1, 1, 15, 7, 5]),
+    (6, 22, [1, 3, 1, 15, 13, 25]), (6, 25, [1, 1, 5, 5, 19, 61]),
+    (7, 1, [1, 3, 7, 11, 23, 15, 103]), (7, 4, [1, 3, 7, 13, 13, 15, 69]),
+    (7, 7, [1, 1, 3, 13, 7, 35, 63]), (7, 8, [1, 3, 5, 9, 1, 25, 53]),
+    (7, 14, [1, 3, 1, 13, 9, 35, 107]), (7, 19, [1, 3, 1, 5, 27, 61, 31]),
+    (7, 21, [1, 1, 5, 11, 19, 41, 61]), (7, 28, [1, 3, 5, 3, 3, 13, 69]),
+    (7, 31, [1, 1, 7, 13, 1, 19, 1]),
+]
+BITS = 32
+
+
+def sobol(n, dims, rng):
+    """ randomly (digitally) shifted Sobol points
+            n -- number of points
+            dims -- number of dimensions
+            rng -- numpy RandomState for the shift
+
+        returns an n x dims array of points in (0, 1)
+    """
+    if dims > len(DIRECTIONS) + 1:
+        raise ValueError("Sobol sampling is limited to %d dimensions" %
+                         (len(DIRECTIONS) + 1))
+    gray = np.arange(n, dtype=np.uint64)
+    gray ^= gray >> np.uint64(1)
+    points = np.empty((n, dims))
+    for j in range(dims):
+        # direction integers (dimension 1 is the van der Corput sequence)
+        if j == 0:
+            m = [1] * BITS
+        else:
+            (s, a, m) = DIRECTIONS[j - 1]
+            m = list(m)
+            for k in range(s, BITS):
+                new = m[k - s] ^ (m[k - s] << s)
+                for i in range(1, s):
+                    if (a >> (s - 1 - i)) & 1:
+                        new ^= m[k - i] << i
+                m.append(new)
+        x = np.zeros(n, dtype=np.uint64)
+        for k in range(BITS):
+            v = np.uint64(m[k] << (BITS - 1 - k))
+            x[(gray >> np.uint64(k)) & np.uint64(1) == 1] ^= v
+        x ^= np.uint64(rng.randint(0, 2 ** BITS))
+        points[:, j] = (x + 0.5) / 2.0 ** BITS
+    return points
+
+
+def lhs(n, dims, rng):
+    """ Latin hypercube sample of n points in dims dimensions """
+    points = np.empty((n, dims))
+    for j in range(dims):
+        points[:, j] = (rng.permutation(n) + rng.uniform(size=n)) / n
+    return points
+
+
+METHODS = {"sobol": sobol, "lhs": lhs}
+
+
+class Uncertainty:
+    """ distributions for some of the inputs of a model """
+
+    def __init__(self, spec):
+        """ digest a (parsed) JSON specification """
+        self.method = spec.get("method", "lhs")
+        if self.method not in METHODS:
+            raise ValueError("unknown sampling method: %s" % (self.method))
+        self.samples = int(spec.get("samples", 10000))
+        self.seed = spec.get("seed", 1)
+        self.percentiles = spec.get("percentiles", [5, 50, 95])
+
+        allowed = parameters()
+        self.inputs = OrderedDict()
+        for (k, v) in spec["inputs"].items():
+            if k not in allowed:
+                raise ValueError("not a continuous Model parameter: %s" % (k))
+            if v[0] not in DISTRIBUTIONS:
+                raise ValueError("unknown distribution for %s: %s" % (k, v[0]))
+            params = [Sweep._compile(p, k) if isinstance(p, basestring)
+                      else p for p in v[1:]]
+            self.inputs[k] = (DISTRIBUTIONS[v[0]], params)
+        if len(self.inputs) == 0:
+            raise ValueError("no uncertain inputs")
+
+    def design(self):
+        """ the (A, B) uniform sample matrices, each samples x inputs """
+        d = len(self.inputs)
+        rng = np.random.RandomState(self.seed)
+        u = METHODS[self.method](self.samples, 2 * d, rng)
+        return (u[:, :d], u[:, d:])
+
+    def values(self, m, u):
+        """ the input values for a model, from a uniform sample matrix """
+        symbols = dict(Sweep.CONSTANTS)
+        symbols.update(vars(m))
+        symbols["FitRate"] = FitRate
+        symbols["__builtins__"] = Sweep.BUILTINS
+        columns = dict()
+        for (j, (k, (f, params))) in enumerate(self.inputs.items()):
+            args = [float(eval(p, symbols) if not
+                          isinstance(p, (int, long, float)) else p)
+                    for p in params]
+            columns[k] = f(u[:, j], *args)
+        return columns
+
+    def evaluate(self, m, u, capacity=1*PiB, period=1*YEAR, chunk=65536):
+        """ p_loss and nines for each sample of one model
+                m -- the nominal model
+                u -- uniform sample matrix (a row per sample)
+                capacity -- total system capacity (bytes)
+                period -- modeled time period (hours)
+                chunk -- number of samples to evaluate at a time
+        """
+        p = np.empty(len(u))
+        nines = np.empty(len(u), dtype=int)
+        base = dict(vars(m))
+        del base["descr"]
+        for start in range(0, len(u), chunk):
+            rows = u[start:start + chunk]
+            columns = dict(base)
+            columns.update(self.values(m, rows))
+            t = Batch.ModelTable(columns, n=len(rows))
+            loss = Compiled.pLoss(t, capacity, period)
+            p[start:start + len(rows)] = loss
+            nines[start:start + len(rows)] = Compiled.nines(loss)
+        return (p, nines)
+
+    def analyze(self, m, design=None, capacity=1*PiB, period=1*YEAR):
+        """ distribution of, and input contributions to, p_loss
+                m -- the nominal model
+                design -- (A, B) sample matrices (default: self.design())
+                capacity -- total system capacity (bytes)
+                period -- modeled time period (hours)
+
+            returns a dictionary with
+                p_loss, nines -- lists of (percentile, value) pairs
+                mean -- mean probability of loss
+                S1, ST -- first order and total index for each input
+        """
+        (A, B) = self.design() if design is None else design
+        (pA, nA) = self.evaluate(m, A, capacity, period)
+        (pB, nB) = self.evaluate(m, B, capacity, period)
+        p = np.concatenate((pA, pB))
+        nines = np.concatenate((nA, nB))
+        result = {
+            "p_loss": [(q, np.percentile(p, q)) for q in self.percentiles],
+            "nines": [(q, np.percentile(nines, q, interpolation="lower"))
+                      for q in self.percentiles],
+            "mean": p.mean(),
+            "S1": OrderedDict(), "ST": OrderedDict()}
+
+        # variance decomposition of log(p_loss)
+        def y(p):
+            return np.log10(np.maximum(p, 1E-300))
+        yA = y(pA)
+        yB = y(pB)
+        f0 = np.concatenate((yA, yB)).mean()
+        yA -= f0
+        yB -= f0
+        var = np.concatenate((yA, yB)).var()
+        for (j, k) in enumerate(self.inputs):
+            ABj = A.copy()
+            ABj[:, j] = B[:, j]
+            yABj = y(self.evaluate(m, ABj, capacity, period)[0]) - f0
+            if var > 0:
+                result["S1"][k] = np.mean(yB * (yABj - yA)) / var
+                result["ST"][k] = 0.5 * np.mean((yA - yABj) ** 2) / var
+            else:
+                result["S1"][k] = result["ST"][k] = float("nan")
+        return result
+
+
+def load(filename):
+    """ read an uncertainty specification from a JSON file """
+    f = open(filename)
+    try:
+        return Uncertainty(json.load(f, object_pairs_hook=OrderedDict))
+    finally:
+        f.close()
+
+
+def uncertainty(models, spec, capacity=1*PiB, period=1*YEAR):
+    """ print the distribution of Ploss for each of a list of models
+            models -- list (or other iterable) of models
+            spec -- Uncertainty (or name of its JSON specification)
+            capacity -- total system capacity (bytes)
+            period -- modeled time period (hours)
+    """
+    if not isinstance(spec, Uncertainty):
+        spec = load(spec)
+    design = spec.design()      # the same samples for every model
+    print("%d %s samples of %s" % (spec.samples, spec.method,
+                                   ", ".join(spec.inputs.keys())))
+    for m in models:
+        r = spec.analyze(m, design, capacity, period)
+        print("")
+        print("%s:" % (m.descr))
+        print("\tPloss  %s   mean %s" %
+              ("  ".join(["%2d%%: %s" % (q, printProbability(v).strip())
+                          for (q, v) in r["p_loss"]]),
+               printProbability(r["mean"]).strip()))
+        print("\tnines  %s" %
+              ("  ".join(["%2d%%: %d" % (q, v) for (q, v) in r["nines"]])))
+        print("\t%-14s %7s %7s" % ("input", "S1", "ST"))
+        for k in spec.inputs:
+            s1 = r["S1"][k]
+            st = r["ST"][k]
+            if math.isnan(s1):
+                print("\t%-14s %7s %7s" % (k, "n/a", "n/a"))
+            else:
+                print("\t%-14s %7.3f %7.3f" % (k, s1, st))
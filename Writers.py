@@ -0,0 +1,236 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+streaming writers for machine-readable results
+
+    ColumnPrint output is meant for people, and (with its percentages
+    and n-nines) is a poor way to get numbers into analysis tools.
+    These writers record every Model parameter and every computed
+    Sizes, Rates and Results field, one row per configuration, as
+
+        CSV ... (.csv) one header line and a line per configuration
+        JSON Lines ... (.jsonl) a JSON object per configuration
+        columnar binary ... (.col) a directory with a raw little-endian
+            file per field, plus a schema.json describing them, which
+            can be loaded (e.g. by load() below) straight into arrays
+
+    Rows are written as they are computed (the columnar writer buffers
+    a bounded chunk of each column), so memory use does not grow with
+    the number of configurations.
+"""
+
+import os
+import csv
+import json
+import math
+from collections import OrderedDict
+
+
+def fields(m, sizes, rates, results):
+    """ all of the parameters and results for one configuration
+            m -- the base simulation parameters
+            sizes -- key capacities and counts
+            rates -- key fit rates
+            results -- computed results
+
+        returns an OrderedDict of model.x, sizes.x, rates.x, results.x
+    """
+    row = OrderedDict()
+    for (prefix, o) in (("model", m), ("sizes", sizes),
+                        ("rates", rates), ("results", results)):
+        for k in sorted(vars(o)):
+            row["%s.%s" % (prefix, k)] = getattr(o, k)
+    return row
+
+
+class Writer:
+    """ common behavior of all of the writers """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.rows = 0
+        self.names = None
+
+    def write(self, m, sizes, rates, results):
+        """ record the results for one configuration """
+        row = fields(m, sizes, rates, results)
+        if self.names is None:
+            self.names = list(row.keys())
+            self.start(row)
+        elif list(row.keys()) != self.names:
+            raise ValueError("%s: row %d has different fields" %
+                             (self.filename, self.rows))
+        self.put(row)
+        self.rows += 1
+
+    def start(self, row):
+        """ (subclass) called with the first row, before it is put """
+        pass
+
+    def put(self, row):
+        """ (subclass) write out a row """
+        raise NotImplementedError
+
+    def close(self):
+        """ (subclass) flush everything out """
+        pass
+
+
+class CSVWriter(Writer):
+    """ comma separated values, with a header line """
+
+    def __init__(self, filename):
+        Writer.__init__(self, filename)
+        self.f = open(filename, "wb")
+        self.out = csv.writer(self.f)
+
+    def start(self, row):
+        self.out.writerow(self.names)
+
+    def put(self, row):
+        self.out.writerow([_text(v) for v in row.values()])
+
+    def close(self):
+        self.f.close()
+
+
+class JSONLinesWriter(Writer):
+    """ one JSON object per line """
+
+    def __init__(self, filename):
+        Writer.__init__(self, filename)
+        self.f = open(filename, "w")
+
+    def put(self, row):
+        # (JSON has no Infinity or NaN, e.g. for an infinite mttdl)
+        self.f.write(json.dumps(OrderedDict([(k, _finite(v))
+                                             for (k, v) in row.items()]),
+                                allow_nan=False))
+        self.f.write("\n")
+
+    def close(self):
+        self.f.close()
+
+
+class ColumnWriter(Writer):
+    """ a directory of raw binary columns
+
+        booleans are stored as bytes, all other numbers as 8-byte
+        floats, and strings as lines in a text file
+    """
+
+    def __init__(self, filename, chunk=8192):
+        """ create the output directory
+            filename -- name of the directory
+            chunk -- rows to buffer before writing them out
+        """
+        Writer.__init__(self, filename)
+        self.chunk = chunk
+        if not os.path.isdir(filename):
+            os.makedirs(filename)
+
+    def start(self, row):
+        self.types = OrderedDict()
+        self.files = dict()
+        self.buffers = dict()
+        for (k, v) in row.items():
+            if isinstance(v, bool):
+                t = "bool"
+            elif isinstance(v, (int, long, float)):
+                t = "<f8"
+            else:
+                t = "text"
+            self.types[k] = t
+            name = os.path.join(self.filename,
+                                k + (".txt" if t == "text" else ".bin"))
+            self.files[k] = open(name, "w" if t == "text" else "wb")
+            self.buffers[k] = list()
+
+    def put(self, row):
+        for (k, v) in row.items():
+            self.buffers[k].append(v)
+        if len(self.buffers[self.names[0]]) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        """ write out the buffered rows """
+        import numpy as np
+        for (k, t) in self.types.items():
+            if t == "text":
+                for v in self.buffers[k]:
+                    self.files[k].write(_text(v).replace("\n", " ") + "\n")
+            else:
+                np.array(self.buffers[k], dtype=t).tofile(self.files[k])
+            self.buffers[k] = list()
+
+    def close(self):
+        if self.names is not None:
+            self.flush()
+            for f in self.files.values():
+                f.close()
+        schema = {"rows": self.rows,
+                  "columns": [[k, t] for (k, t) in
+                              (self.types.items() if self.names else [])]}
+        f = open(os.path.join(self.filename, "schema.json"), "w")
+        json.dump(schema, f, indent=1, separators=(",", ": "))
+        f.close()
+
+
+def load(dirname):
+    """ read a columnar result directory back in
+            dirname -- directory written by a ColumnWriter
+
+        returns an OrderedDict of field names to (NumPy) arrays
+    """
+    import numpy as np
+    f = open(os.path.join(dirname, "schema.json"))
+    schema = json.load(f)
+    f.close()
+    columns = OrderedDict()
+    for (k, t) in schema["columns"]:
+        if t == "text":
+            f = open(os.path.join(dirname, k + ".txt"))
+            columns[k] = np.array([l.rstrip("\n") for l in f])
+            f.close()
+        else:
+            columns[k] = np.fromfile(os.path.join(dirname, k + ".bin"),
+                                     dtype=t)
+    return columns
+
+
+# the writers for each file name extension
+FORMATS = {".csv": CSVWriter, ".jsonl": JSONLinesWriter,
+           ".col": ColumnWriter}
+
+
+def writer(filename):
+    """ create the right kind of writer for a file name """
+    ext = os.path.splitext(filename)[1]
+    if ext not in FORMATS:
+        raise ValueError("unknown output format: %s (try %s)" %
+                         (filename, ", ".join(sorted(FORMATS))))
+    return FORMATS[ext](filename)
+
+
+def _finite(v):
+    """ a value with any non-finite numbers (in it) replaced by None """
+    if isinstance(v, float):
+        return v if not (math.isinf(v) or math.isnan(v)) else None
+    if isinstance(v, (list, tuple)):
+        return [_finite(x) for x in v]
+    return v
+
+
+def _text(v):
+    """ a value as (plain ASCII) text """
+    if isinstance(v, unicode):
+        return v.encode("utf-8")
+    return v if isinstance(v, str) else repr(v)
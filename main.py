@@ -7,58 +7,61 @@ main routine for driving simulations
 """
 
 from importlib import import_module
-from Model import Model
+from inspect import getargspec
+from itertools import chain
 from run import run
-from sizes import GB, MiB, GiB
-from ColumnPrint import printSize
+import Sweep
 
 
-def defaultTests(columns="", verbosity="default"):
+def defaultModels():
+        """ create a set of standard test scenarios (see default.json) """
+        return list(Sweep.load(Sweep.path("default.json")).models())
+
+
+def sweepModels(f):
+        """ the models in a sweep specification or a test module """
+        if Sweep.isSweep(f):
+            return Sweep.load(f).models()
+        module = import_module(f, package=__package__)
+        return getattr(module, 'models')()
+
+
+def aged(models, aging=None):
+        """ models with their FIT rates adjusted for age (see Aging.py) """
+        if aging is None:
+            return models
+        import Aging
+        return Aging.load(aging).models(models)
+
+
+def selectedModels(files, aging=None):
+        """ the models in the named sweeps/modules (or the defaults) """
+        if len(files) > 0:
+            models = chain(*[sweepModels(f) for f in files])
+        else:
+            models = defaultModels()
+        return aged(models, aging)
+
+
+def defaultTests(columns="", verbosity="default", jobs=1, cache=None,
+                 aging=None):
         """ create and run a set of standard test scenarios """
-        # note the key background parameters
-        m = Model("")
-        misc = ", %d/%ds, %s/%s/s" % (m.time_timeout, m.time_detect,
-                                      printSize(m.rate_mirror, 1000),
-                                      printSize(m.rate_flush, 1000))
-
-        # create a list of tests to be run
-        mlist = list()
-
-        # run tests for all the interesting combinations
-        for cp in (1, 2, 3):
-            for primary in (" v", "nv"):
-                sList = ["none"] if cp == 1 else [" v", "nv", "symmetric"]
-                for secondary in sList:
-                    # suppress irrelevent combinations
-                    if primary == "nv" and secondary == " v":
-                        continue
-
-                    # figure out how to caption this configuration
-                    if secondary == "symmetric":
-                        desc = ("symmetric: %d %s cp" % (cp, primary))
-                    elif (cp > 1):
-                        desc = ("prim: %s   %d %s cp" %
-                               (primary, cp - 1, secondary))
-                    else:
-                        desc = "prim: %s      0 cp" % (primary)
-
-                    # instantiate the model
-                    m = Model(desc + misc)
-                    m.copies = cp
-                    m.nv_1 = (primary == "nv")
-                    m.cache_1 = 4 * GB
-                    if secondary == "symmetric":
-                        m.symmetric = True
-                        m.cache_1 *= cp
-                        m.nv_2 = (primary == "nv")
-                        m.cache_2 = 0
-                    elif cp > 1:
-                        m.nv_2 = (secondary == "nv")
-                        m.cache_2 = 40 * GB
-                    mlist.append(m)
-
-        # run all the specified models
-        run(mlist, columns, verbosity)
+        run(aged(defaultModels(), aging), columns, verbosity, jobs=jobs,
+            cache=cache)
+
+
+def moduleTests(module, columns="", verbosity="default", jobs=1,
+                cache=None):
+        """ run a test module's tests, passing jobs and cache only if
+            it takes them (older ones take just columns and verbosity)
+        """
+        method = getattr(module, 'tests')
+        (args, varargs, keywords, defaults) = getargspec(method)
+        options = dict()
+        for (name, value) in (("jobs", jobs), ("cache", cache)):
+            if keywords is not None or name in args:
+                options[name] = value
+        return method(columns, verbosity, **options)
 
 
 def main():
@@ -66,25 +69,200 @@ def main():
 
     # process the command line arguments arguments
     from optparse import OptionParser
-    parser = OptionParser(usage="usage: %prog [options] [modules]")
+    parser = OptionParser(usage="usage: %prog [options] [modules|sweeps]")
     parser.add_option("-g", "--gui", dest="gui", action="store_true",
                       default=False, help="GUI control panel")
     parser.add_option("-r", "--report", dest="columns",
-                      metavar="bw,time", help="output columns",
+                      metavar="bw,time,stretch,avail", help="output columns",
                       default="")
     parser.add_option("-v", "--verbosity", dest="verbose",
                       metavar="data|headings|parameters|debug|all",
                       default="")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int",
+                      metavar="N", help="evaluate models in N processes",
+                      default=1)
+    parser.add_option("-s", "--simulate", dest="trials", type="int",
+                      metavar="TRIALS", help="Monte Carlo cross-check",
+                      default=0)
+    parser.add_option("-i", "--importance", dest="importance",
+                      action="store_true", default=False,
+                      help="importance sampling for simulation")
+    parser.add_option("-o", "--output", dest="output", metavar="FILE",
+                      help="write all results to a .csv/.jsonl/.col file",
+                      default=None)
+    parser.add_option("-k", "--cache", dest="cache", metavar="DBFILE",
+                      help="reuse previously computed results",
+                      default=None)
+    parser.add_option("-t", "--target", dest="target", type="float",
+                      metavar="NINES|PLOSS",
+                      help="find the cheapest configuration this durable",
+                      default=None)
+    parser.add_option("-w", "--weights", dest="weights",
+                      metavar="node=2000,nvram=40,...",
+                      help="relative hardware costs (for --target)",
+                      default="")
+    parser.add_option("-p", "--pareto", dest="pareto",
+                      action="store_true", default=False,
+                      help="only show the nodes/bandwidth/Ploss frontier")
+    parser.add_option("-e", "--elasticity", dest="elasticity",
+                      action="store_true", default=False,
+                      help="parameters to which Ploss is most sensitive")
+    parser.add_option("-l", "--placement", dest="placement",
+                      metavar="all|random|hash|round-robin",
+                      help="fan-in skew and Ploss of explicit placement",
+                      default=None)
+    parser.add_option("-u", "--uncertainty", dest="uncertainty",
+                      metavar="SPEC.json",
+                      help="distribution of Ploss given input distributions",
+                      default=None)
+    parser.add_option("-x", "--trace", dest="trace",
+                      metavar="FILE[,msr|simple]",
+                      help="dirty data distribution from an I/O trace",
+                      default=None)
+    parser.add_option("-d", "--durability", dest="durability",
+                      metavar="FROM,TO,N",
+                      help="Ploss for N periods from FROM to TO years",
+                      default=None)
+    parser.add_option("-a", "--aging", dest="aging", metavar="SPEC.json",
+                      help="age-dependent (Weibull/bathtub) failure rates",
+                      default=None)
+    parser.add_option("-c", "--ctmc", dest="ctmc", metavar="DOTFILE",
+                      help="solve a graphviz state model (e.g. Asy3C)",
+                      default=None)
     (opts, files) = parser.parse_args()
 
-    # file names are test modules
+    # results computed by previous runs may be reused
+    cache = None
+    if opts.cache is not None:
+        from ResultCache import ResultCache
+        cache = ResultCache(opts.cache)
+    try:
+        dispatch(opts, files, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+            cache.report()
+
+
+def dispatch(opts, files, cache=None):
+    """ run whatever the command line options asked for """
+
+    # cheapest configuration that meets a durability target
+    if opts.target is not None:
+        from Solver import solve
+        from Model import Model
+        costs = dict()
+        for w in opts.weights.split(","):
+            if w != "":
+                (k, v) = w.split("=")
+                costs[k.strip()] = float(v)
+        aging = None
+        if opts.aging is not None:
+            import Aging
+            aging = Aging.load(opts.aging)
+        solve(Model(""), opts.target, costs, aging=aging)
+        return
+
+    # the Pareto frontier of the same models
+    if opts.pareto:
+        from Pareto import pareto
+        models = selectedModels(files, opts.aging)
+        pareto(models, verbose=(opts.verbose == "debug"))
+        return
+
+    # sensitivity of the same models to each of their parameters
+    if opts.elasticity:
+        from Sensitivity import sensitivity
+        models = selectedModels(files, opts.aging)
+        sensitivity(models)
+        return
+
+    # explicit placement of the secondaries for the same models
+    if opts.placement is not None:
+        from Placement import placement
+        models = selectedModels(files, opts.aging)
+        policies = None if opts.placement == "all" else \
+            opts.placement.split(",")
+        placement(models, policies)
+        return
+
+    # uncertainty in the results for the same models
+    if opts.uncertainty is not None:
+        from Uncertainty import uncertainty
+        models = selectedModels(files, opts.aging)
+        uncertainty(models, opts.uncertainty)
+        return
+
+    # dirty data (and Ploss) measured by replaying an I/O trace
+    if opts.trace is not None:
+        from Trace import trace
+        models = selectedModels(files, opts.aging)
+        (filename, _, format) = opts.trace.partition(",")
+        trace(models, filename, format if format != "" else "msr")
+        return
+
+    # durability curves (over many periods) for the same models
+    if opts.durability is not None:
+        from run import curves
+        from RelyFuncts import YEAR
+        (lo, hi, n) = opts.durability.split(",")
+        (lo, hi, n) = (float(lo) * YEAR, float(hi) * YEAR, int(n))
+        periods = [lo * (hi / lo) ** (float(i) / max(n - 1, 1))
+                   for i in range(n)]
+        models = selectedModels(files, opts.aging)
+        curves(models, periods)
+        return
+
+    # machine-readable results for the same models
+    if opts.output is not None:
+        from run import export
+        models = selectedModels(files, opts.aging)
+        n = export(models, opts.output, jobs=opts.jobs, cache=cache)
+        print("%d configurations written to %s" % (n, opts.output))
+        return
+
+    # Markov chain solution of a state model for the same models
+    if opts.ctmc is not None:
+        from Markov import solve
+        if len(files) > 0:
+            for f in files:
+                solve(list(aged(sweepModels(f), opts.aging)), opts.ctmc)
+        else:
+            solve(list(aged(defaultModels(), opts.aging)), opts.ctmc)
+        return
+
+    # Monte Carlo simulation of the same models
+    if opts.trials > 0:
+        from MonteCarlo import simulate
+        if len(files) > 0:
+            for f in files:
+                simulate(list(aged(sweepModels(f), opts.aging)),
+                         opts.trials, importance=opts.importance)
+        else:
+            simulate(list(aged(defaultModels(), opts.aging)), opts.trials,
+                     importance=opts.importance)
+        return
+
+    # file names are sweep specifications or test modules
     if len(files) > 0:
         for f in files:
+            if Sweep.isSweep(f):
+                run(aged(Sweep.load(f).models(), opts.aging), opts.columns,
+                    opts.verbose, jobs=opts.jobs, cache=cache)
+                continue
             module = import_module(f, package=__package__)
-            method = getattr(module, 'tests')
-            method(opts.columns, opts.verbose)
+            if opts.aging is not None:
+                # (its tests would run its own, unaged, models)
+                if not hasattr(module, 'models'):
+                    raise ValueError("%s has no models to age" % (f))
+                run(aged(module.models(), opts.aging), opts.columns,
+                    opts.verbose, jobs=opts.jobs, cache=cache)
+                continue
+            moduleTests(module, opts.columns, opts.verbose, opts.jobs,
+                        cache)
     else:
-        defaultTests(opts.columns, opts.verbose)
+        defaultTests(opts.columns, opts.verbose, opts.jobs, cache,
+                     opts.aging)
 
 if __name__ == "__main__":
     main()
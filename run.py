@@ -1,11 +1,15 @@
 #
 
 from sizes import MB, MiB, GB, PiB
-from RelyFuncts import YEAR, HOUR
+from RelyFuncts import YEAR, HOUR, MINUTE
 
-from Model import Model, Sizes, Rates, Results
+from Model import Model, Sizes, Rates, Results, getRates
 from ColumnPrint import ColumnPrint, printTime, printSize, printFloat, printExp
 from ColumnPrint import printDurability, printProbability
+import Memo
+import Writers
+
+from itertools import islice, tee, izip
 
 
 #
@@ -43,6 +47,9 @@ def printParms(m, s, r):
     else:
         print("\tmirroring: \tdecluster=%d, max_dirty=%dMB" %
               (m.decluster, m.max_dirty/MB))
+    if m.domain_size > 0:
+        print("\tdomains:   \t%d nodes each, <= %d copies in any one" %
+              (m.domain_size, m.domain_copies))
 
     print("\tdetection:  \tnodefail=%ds, timeout=%ds" %
           (m.time_detect, m.time_timeout))
@@ -52,6 +59,13 @@ def printParms(m, s, r):
     else:
         print("\trecovery:  \tflush=%dMiB/s" %
               (m.rate_flush/MiB))
+    if m.bw_backing > 0 or m.bw_network > 0:
+        print("\tshared:    \tbacking=%s, network=%s/node, %s" %
+              ("unlimited" if m.bw_backing <= 0 else
+               printSize(m.bw_backing, 1000) + "/s",
+               "unlimited" if m.bw_network <= 0 else
+               printSize(m.bw_network, 1000) + "/s",
+               "recovery first" if m.recovery_first else "fair share"))
 
     if r is not None or s is not None:
         print("Cache Use Statistics:")
@@ -71,6 +85,9 @@ def printParms(m, s, r):
           (m.f_dram, m.dram_2bit * 100))
     print("\tNVRAM:     \tR-BER=%6.2e, W-BER=%6.2e" %
           (m.ber_nvm_r, m.ber_nvm_w))
+    if m.f_nvm_1 > 0 or m.f_nvm_2 > 0:
+        print("\t          \t%d/%d FITs per primary/secondary" %
+              (m.f_nvm_1, m.f_nvm_2))
     print("\tfans:     \t%d/%d, %d FITs per, MTTR=%dh" %
           (m.m_fan, m.n_fan, m.f_fan, m.time_repair/HOUR))
     print("\tpower:    \t%d/%d, %d FITs per, MTTR=%dh" %
@@ -78,27 +95,156 @@ def printParms(m, s, r):
     print("\tNICs:     \t%d/%d, %d FITs per, MTTR=%dh" %
           (m.m_nic, m.n_nic, m.f_nic, m.time_repair/HOUR))
     print("\tsoftware:  \tFITs=%d, hard=%.2f%%" % (m.f_sw, 100 * m.sw_hard))
+    if m.domain_size > 0:
+        print("\tfeeds:    \t%d/%d, %d FITs per, MTTR=%dh" %
+              (m.m_feed, m.n_feed, m.f_feed, m.time_repair/HOUR))
+        print("\tswitches: \t%d/%d, %d FITs per, MTTR=%dh" %
+              (m.m_tor, m.n_tor, m.f_tor, m.time_repair/HOUR))
     if r is not None:
         if (m.symmetric):
             print("\tloss:      \tFITs=%d" % (r.fits_1_loss))
         else:
             print("\tloss(1):   \tFITs=%d" % (r.fits_1_loss))
             print("\tloss(2):   \tFITs=%d" % (r.fits_2_loss))
+        if m.domain_size > 0:
+            print("\tdomain:    \tFITs=%d" % (r.fits_domain))
+
+
+def evaluate(m, capacity=1*PiB, period=1*YEAR, debug=False):
+    """ compute the sizes, rates and results for a single model
+        m -- the model to be evaluated
+        capacity -- total system capacity (bytes)
+        period -- modeled time period (hours)
+        debug -- enable diagnostic output
+
+        returns (sizes, rates, results)
+    """
+    sizes = Sizes(m, capacity, debug)
+    rates = getRates(m, debug)
+    results = Results(m, sizes, rates, period, debug)
+    return (sizes, rates, results)
+
+
+# models per parallel work unit, when we don't know how many there are
+CHUNK = 256
+
+
+def _evaluate(args):
+    """ Pool.imap can only pass a single argument to its workers """
+    return evaluate(*args)
+
+
+def evaluateAll(models, capacity=1*PiB, period=1*YEAR, debug=False, jobs=1,
+                cache=None):
+    """ generate (sizes, rates, results) for each model, in order
+        models -- list (or other iterable) of models to be evaluated
+        capacity -- total system capacity (bytes)
+        period -- modeled time period (hours)
+        debug -- enable diagnostic output
+        jobs -- number of worker processes to spread the models across
+        cache -- ResultCache of previously computed results (or None)
+
+        NOTE:
+            diagnostic output from parallel workers would be interleaved
+            beyond recognition, so debug forces serial evaluation.
+            It also bypasses the cache, since it would not be very
+            diagnostic if nothing were computed.
+    """
+    if debug:
+        cache = None
+    known = hasattr(models, "__len__")
+    if jobs <= 1 or debug or (known and len(models) < 2):
+        for m in models:
+            r = None if cache is None else cache.get(m, capacity, period)
+            if r is None:
+                r = evaluate(m, capacity, period, debug)
+                if cache is not None:
+                    cache.put(m, capacity, period, r)
+            yield r
+        return
+
+    # hand each worker a few large chunks, and collect them in order
+    #   (Pool.imap would swallow a whole generator at once, so those
+    #    are handed out a block at a time)
+    from multiprocessing import Pool
+    if known:
+        jobs = min(jobs, len(models))
+        chunk = max(1, len(models) // (4 * jobs))
+    else:
+        chunk = CHUNK
+    block = 4 * jobs * chunk
+    models = iter(models)
+    pool = Pool(jobs)
+    try:
+        while True:
+            mlist = list(islice(models, block))
+            if len(mlist) == 0:
+                break
+            if cache is None:
+                found = [None] * len(mlist)
+            else:
+                found = [cache.get(m, capacity, period) for m in mlist]
+            args = [(m, capacity, period, False)
+                    for (m, r) in zip(mlist, found) if r is None]
+            computed = pool.imap(_evaluate, args, chunk)
+            for (m, r) in zip(mlist, found):
+                if r is None:
+                    r = computed.next()
+                    if cache is not None:
+                        cache.put(m, capacity, period, r)
+                yield r
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def export(models, filename, capacity=1*PiB, period=1*YEAR, jobs=1,
+           cache=None):
+    """ write every parameter and result for a set of models to a file
+        models -- list (or other iterable) of models to be evaluated
+        filename -- output file (format chosen by extension, see Writers)
+        capacity -- total system capacity (bytes)
+        period -- modeled time period (hours)
+        jobs -- number of worker processes to evaluate models
+        cache -- ResultCache of previously computed results (or None)
+
+        returns the number of configurations written
+    """
+    out = Writers.writer(filename)
+    try:
+        if hasattr(models, "__len__"):
+            evaluated = evaluateAll(models, capacity, period, False, jobs,
+                                    cache)
+        else:
+            (models, evaluating) = tee(models)
+            evaluated = evaluateAll(evaluating, capacity, period, False,
+                                    jobs, cache)
+        for (m, (sizes, rates, results)) in izip(models, evaluated):
+            out.write(m, sizes, rates, results)
+    finally:
+        out.close()
+    return out.rows
 
 
 def run(models, columns="", verbosity="default",
-        capacity=1*PiB, period=1*YEAR):
+        capacity=1*PiB, period=1*YEAR, jobs=1, cache=None):
     """ execute a single model and print out the results
-        models -- list of models to be run
+        models -- list (or other iterable) of models to be run
         columns -- what optional columns to include
         verbosity -- what kind of output we want
         capacity -- total system capacity (bytes)
         period -- modeled time period (hours)
+        jobs -- number of worker processes to evaluate models
+        cache -- ResultCache of previously computed results (or None)
     """
 
     # figure out what optional fields to include
-    showTr = False     # FIX get from columns
-    showBW = False     # FIX get from columns
+    optional = [c.strip() for c in columns.split(",")]
+    showTr = "time" in optional
+    showBW = "bw" in optional
+    showStretch = "stretch" in optional
+    showAvail = "avail" in optional
 
     # define the column headings
     heads = [
@@ -118,10 +264,24 @@ def run(models, columns="", verbosity="default",
     if showTr:
         heads.append("T(recov)")
         legends.append("max detect/recovery time")
+    if showStretch:
+        heads.append("stretch")
+        legends.append("recovery time vs an otherwise idle system")
+    if showAvail:
+        heads.extend(["unavail", "degraded", "I/O lost"])
+        legends.extend(["expected minutes each VM is down or stalled*",
+                        "expected minutes with fewer copies*",
+                        "minutes of normal I/O moved by recovery*"])
 
     # figure out the longest description
+    #   (a generated sweep can only be seen once, so we go by the first)
+    if not hasattr(models, "__len__"):
+        (first, models) = tee(models)
+        first = list(islice(first, 1))
+    else:
+        first = models
     maxlen = len(heads[0])
-    for m in models:
+    for m in first:
         l = len(m.descr)
         if l > maxlen:
             maxlen = l
@@ -160,7 +320,7 @@ def run(models, columns="", verbosity="default",
 
     # print out basic parameters (assumed not to change)
     if parm1:
-        printParms(models[0], None, None)
+        printParms(first[0], None, None)
 
     # print out column legends
     if descr:
@@ -180,24 +340,27 @@ def run(models, columns="", verbosity="default",
     if headings:
         format.printHeadings()
 
-    for m in models:
-        # compute sizes and rates
-        sizes = Sizes(m, capacity, debug)
-        rates = Rates(m, debug)
+    # compute sizes, rates and reliability (possibly in parallel)
+    if hasattr(models, "__len__"):
+        evaluated = evaluateAll(models, capacity, period, debug, jobs, cache)
+    else:
+        (models, evaluating) = tee(models)
+        evaluated = evaluateAll(evaluating, capacity, period, debug, jobs,
+                                cache)
+    for (m, (sizes, rates, results)) in izip(models, evaluated):
 
         # print out the model parameters
         if parms:
             printParms(m, sizes, rates)
 
-        # compute and print the reliability
-        results = Results(m, sizes, rates, period, debug)
+        # print the reliability
         s = list()
         s.append(m.descr)
         if m.symmetric:
             s.append("<%d>" % (sizes.n_primary))
         else:
             s.append("<%d,%d>" % (sizes.n_primary, sizes.n_secondary))
-        s.append(printDurability(results.durability))
+        s.append(printDurability(results.durability, results.p_loss))
         s.append(printProbability(results.p_loss))
         bw = max(results.bw_sfail, results.bw_pfail)
 
@@ -205,4 +368,37 @@ def run(models, columns="", verbosity="default",
             s.append("n/a" if bw == 0 else printSize(bw, 1000) + "/s")
         if showTr:
             s.append("n/a" if bw == 0 else printFloat(results.Trecov)+"s")
+        if showStretch:
+            s.append("n/a" if bw == 0 else "x%.2f" % (results.stretch))
+        if showAvail:
+            s.append(printFloat(results.t_down / MINUTE) + "m")
+            s.append(printFloat(results.t_degraded / MINUTE) + "m")
+            s.append(printFloat(results.t_slow / MINUTE) + "m")
         format.printLine(s)
+
+    # (serial) debug runs also report how well the caches worked
+    if debug:
+        print("Cache statistics:")
+        Memo.report()
+
+
+def curves(models, periods, capacity=1*PiB):
+    """ print the probability of loss over a range of periods
+        models -- list (or other iterable) of models
+        periods -- list of modeled time periods (hours)
+        capacity -- total system capacity (bytes)
+
+        (each model is evaluated once, for all of the periods)
+    """
+    heads = ["period", "Ploss", "durability"]
+    for m in models:
+        (sizes, rates, results) = evaluate(m, capacity, periods)
+        print("")
+        print("%s: MTTDL=%s" % (m.descr, "infinite" if
+                                results.mttdl == float("inf") else
+                                printTime(results.mttdl)))
+        format = ColumnPrint(heads, maxdesc=12)
+        format.printHeadings()
+        for (t, p, d) in izip(periods, results.p_loss, results.durability):
+            format.printLine([printTime(t), printProbability(p),
+                              printDurability(d, p)])
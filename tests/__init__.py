@@ -0,0 +1,16 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+regression checks that the faster engines give the same answers as
+the reference implementations
+
+    python -m unittest discover ... (from the top level) runs them all
+"""
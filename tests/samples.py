@@ -0,0 +1,49 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+reproducible (pseudo-random) models to exercise the structural branches
+"""
+
+import random
+
+from Model import Model
+from sizes import GB, MiB
+
+
+def randomModels(n, seed=1):
+    """ a list of n models with randomly chosen structures and rates
+            n -- number of models
+            seed -- for the random choices
+    """
+    rng = random.Random(seed)
+    models = list()
+    for i in range(n):
+        m = Model("random %d" % (i))
+        m.copies = rng.choice([1, 2, 3, 4, 5])
+        m.decluster = rng.choice([1, 2, 3, 4, 8])
+        m.symmetric = rng.random() < 0.3
+        m.nv_1 = rng.random() < 0.5
+        m.nv_2 = rng.random() < 0.5
+        m.remirror = rng.random() < 0.5
+        m.cache_1 = rng.choice([2, 4, 8, 12]) * GB
+        if m.symmetric:
+            m.cache_1 *= m.copies
+        m.cache_2 = rng.choice([20, 40, 80]) * GB
+        m.ber_nvm_r = 10 ** rng.uniform(-17, -5)
+        m.time_detect = rng.choice([5, 30, 60])
+        m.rate_mirror = rng.choice([100, 500, 2000]) * MiB
+        m.n_fan = rng.choice([1, 2, 3])
+        m.m_fan = 1
+        m.domain_size = rng.choice([0, 0, 10, 40])
+        m.bw_backing = rng.choice([0, 0, 1000 * MiB])
+        m.bw_network = rng.choice([0, 0, 2000 * MiB])
+        models.append(m)
+    return models
@@ -0,0 +1,187 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the renewal functions settle to one failure per mean life, the aged
+rates are the constant ones that give the same expected failures, and
+bad specifications (and rates) are caught
+"""
+
+import math
+import sys
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+import Aging
+import Sweep
+from Aging import Constant, Weibull, Piecewise, Bathtub, meanFits
+from Model import Model
+from RelyFuncts import YEAR, BILLION
+from tests.samples import randomModels
+
+SHAPES = (0.5, 1.0, 2.0, 4.0)
+
+
+class TestRenewal(unittest.TestCase):
+
+    def test_exponential(self):
+        # a memoryless part fails at the same rate, however often replaced
+        w = Weibull(1.0, 5 * YEAR)
+        for t in (YEAR / 10, YEAR, 30 * YEAR, 500 * YEAR):
+            self.assertAlmostEqual(w.renewals(t) / (t / (5 * YEAR)), 1, 4)
+
+    def test_young(self):
+        # before many have failed, few have been replaced
+        for shape in SHAPES:
+            w = Weibull(shape, 10 * YEAR)
+            t = YEAR / 1000
+            self.assertAlmostEqual(w.renewals(t) / w.cumulative(t), 1, 2)
+
+    def test_old(self):
+        # long after the first replacement, one failure per mean life
+        #   on either side of the end of the computed renewal function
+        life = 4 * YEAR
+        for shape in SHAPES:
+            w = Weibull(shape, life)
+            mean = life * math.gamma(1 + 1.0 / shape)
+            end = Aging._renewal(shape)[0][-1] * life
+            for age in (end - 2 * life, end + life, 10 * end):
+                rate = (w.renewals(age + YEAR) - w.renewals(age)) / YEAR
+                self.assertTrue(abs(rate * mean - 1) < 0.01,
+                                "shape %g at %g lives: %g" %
+                                (shape, age / life, rate * mean))
+            # and far less than the unrenewed wear-out would suggest
+            if shape > 1:
+                self.assertTrue(w.renewals(10 * life) <
+                                w.cumulative(10 * life) / 5)
+
+    def test_arrays(self):
+        shapes = np.array(SHAPES)
+        w = Weibull(shapes, 3 * YEAR)
+        m = w.renewals(7 * YEAR)
+        for (i, shape) in enumerate(SHAPES):
+            self.assertEqual(m[i], Weibull(shape, 3 * YEAR).renewals(7 * YEAR))
+
+
+class TestMeanFits(unittest.TestCase):
+
+    def test_constant(self):
+        for h in (Constant(1000), Piecewise([0, YEAR], [1000, 1000])):
+            self.assertAlmostEqual(meanFits(h, YEAR, [0, YEAR, 5 * YEAR]),
+                                   1000, 9)
+
+    def test_piecewise(self):
+        # ramping from 0 to 2000 over the year averages 1000
+        h = Piecewise([0, YEAR], [0, 2000])
+        self.assertAlmostEqual(meanFits(h, YEAR), 1000, 9)
+        self.assertAlmostEqual(meanFits(h, YEAR, [YEAR]), 2000, 9)
+        self.assertRaises(ValueError, Piecewise, [0, YEAR], [1000])
+
+    def test_bathtub(self):
+        b = Bathtub(0.5, 1000 * YEAR, 500, 4, 8 * YEAR)
+        parts = [meanFits(p, YEAR, [0, 3 * YEAR]) for p in b.parts]
+        self.assertAlmostEqual(meanFits(b, YEAR, [0, 3 * YEAR]),
+                               sum(parts), 9)
+        # infant mortality when new, wear-out when old
+        self.assertTrue(meanFits(b, YEAR, [0]) > meanFits(b, YEAR, [YEAR]))
+        self.assertTrue(meanFits(b, YEAR, [10 * YEAR]) >
+                        meanFits(b, YEAR, [3 * YEAR]))
+
+    def test_weights(self):
+        h = Weibull(3, 6 * YEAR)
+        a = meanFits(h, YEAR, [0])
+        b = meanFits(h, YEAR, [4 * YEAR])
+        self.assertAlmostEqual(meanFits(h, YEAR, [0, 4 * YEAR], [3, 1]),
+                               (3 * a + b) / 4, 9)
+
+
+class TestAging(unittest.TestCase):
+
+    def test_errors(self):
+        for spec in ({"fleet": {}, "bogus": {}},
+                     {"components": {"f_nvm_1": ["constant", 100]}},
+                     {"components": {"f_fan": ["gompertz", 1, 2]}},
+                     {"fleet": {"ages": [0, "YEAR"], "weights": [1]}},
+                     {"nvram": {"life": "5*YEAR"}}):
+            self.assertRaises(ValueError, Aging.Aging, spec)
+
+    def test_check(self):
+        a = Aging.Aging({})
+        for fits in (float("nan"), float("inf"), -1, [1, -1]):
+            self.assertRaises(ValueError, a.check, "f_fan", fits, YEAR)
+
+        # more than one failure per period is only a warning
+        saved = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            a.check("f_fan", [100, 1000], YEAR)
+            a.check("f_fan", [], YEAR)
+            self.assertEqual(sys.stderr.getvalue(), "")
+            a.check("f_fan", [100, 2 * BILLION / YEAR], YEAR)
+            self.assertTrue("f_fan" in sys.stderr.getvalue())
+        finally:
+            sys.stderr = saved
+
+    def test_nominal(self):
+        # constant hazards at the nominal rates change nothing
+        models = randomModels(10, seed=9)
+        a = Aging.Aging({"components": {
+            "f_ctlr": ["constant", "f_ctlr"],
+            "f_power": ["piecewise", [0, "YEAR"], ["f_power", "f_power"]]}})
+        for (m, aged) in zip(models, a.models(models, chunk=3)):
+            for k in vars(m):
+                (a, b) = (getattr(aged, k), getattr(m, k))
+                self.assertTrue(a == b if isinstance(b, basestring) else
+                                np.isclose(a, b, rtol=1e-12, atol=0), k)
+
+    def test_models(self):
+        m = Model("")
+        spec = {"fleet": {"ages": [0, "YEAR", "2*YEAR"],
+                          "weights": [3, 2, 1]},
+                "components": {"f_fan": ["weibull", 3, "12*YEAR"]}}
+        aged = list(Aging.Aging(spec).models([m]))[0]
+        h = Weibull(3, 12 * YEAR)
+        self.assertAlmostEqual(aged.f_fan / meanFits(h, YEAR,
+                                                     [0, YEAR, 2 * YEAR],
+                                                     [3, 2, 1]), 1, 9)
+        self.assertEqual(aged.f_ctlr, m.f_ctlr)
+        self.assertEqual(aged.f_nvm_1, m.f_nvm_1)
+
+    def test_nvram(self):
+        # the harder an NVRAM is written, the sooner it wears out
+        spec = {"fleet": {"ages": ["2*YEAR"]},
+                "nvram": {"dwpd": 100, "life": "5*YEAR", "fits": 10}}
+        a = Aging.Aging(spec)
+        fits = list()
+        for iops in (10, 100, 1000):
+            m = Model("")
+            m.iops = iops
+            aged = list(a.models([m]))[0]
+            self.assertTrue(aged.f_nvm_1 >= 10)
+            fits.append(aged.f_nvm_1)
+        self.assertEqual(sorted(fits), fits)
+
+    def test_example(self):
+        a = Aging.load(Sweep.path("aging.json"))
+        saved = sys.stderr
+        sys.stderr = StringIO()     # (some write their NVRAM very hard)
+        try:
+            models = list(a.models(randomModels(20, seed=10)))
+        finally:
+            sys.stderr = saved
+        for m in models:
+            for k in Aging.COMPONENTS + ("f_nvm_1", "f_nvm_2"):
+                self.assertTrue(getattr(m, k) >= 0, k)
+
+
+if __name__ == "__main__":
+    unittest.main()
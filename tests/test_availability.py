@@ -0,0 +1,84 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+expected downtime is what the failure rates and outage durations imply,
+it scales with the period, and it responds to the things it should
+"""
+
+import unittest
+
+import numpy as np
+
+import Batch
+from Model import Model
+from RelyFuncts import SECOND, YEAR, BILLION
+from run import evaluate
+from tests.samples import randomModels
+
+
+class TestAvailability(unittest.TestCase):
+
+    def test_no_copies(self):
+        # every hard failure waits for a repair, every soft one a reboot
+        m = Model("")
+        m.copies = 1
+        (sizes, rates, results) = evaluate(m)
+        hours = rates.fits_hard * m.time_repair + \
+            rates.fits_reboot * (m.time_detect * SECOND + m.time_reboot)
+        self.assertAlmostEqual(results.t_down / (hours * YEAR / BILLION),
+                               1, 12)
+        self.assertEqual(results.t_degraded, 0)
+        self.assertAlmostEqual(results.availability,
+                               1 - results.t_down / YEAR, 15)
+
+    def test_copies(self):
+        # a copy lets the VMs restart elsewhere rather than wait
+        m = Model("")
+        m.copies = 1
+        alone = evaluate(m)[2]
+        m.copies = 2
+        mirrored = evaluate(m)[2]
+        self.assertTrue(mirrored.t_down < alone.t_down / 10)
+        self.assertTrue(mirrored.t_degraded > 0)
+        self.assertTrue(mirrored.t_slow > 0)
+
+    def test_period(self):
+        for m in randomModels(20, seed=5):
+            one = evaluate(m, period=YEAR)[2]
+            ten = evaluate(m, period=10 * YEAR)[2]
+            for k in ("t_down", "t_degraded", "t_slow"):
+                a = getattr(one, k)
+                b = getattr(ten, k)
+                self.assertTrue(abs(b - 10 * a) <= 1E-9 * b, k)
+
+    def test_domains(self):
+        # rack-local copies wait for the rack to be repaired
+        m = Model("")
+        m.domain_size = 20
+        spread = evaluate(m)[2]
+        m.domain_copies = m.copies
+        local = evaluate(m)[2]
+        self.assertTrue(local.t_down > spread.t_down)
+        self.assertTrue(spread.t_degraded > evaluate(Model(""))[2].t_degraded)
+
+    def test_batch(self):
+        models = randomModels(100, seed=6)
+        (sizes, rates, results) = Batch.evaluate(models)
+        for (i, m) in enumerate(models):
+            x = evaluate(m)[2]
+            for k in ("t_down", "t_degraded", "t_slow", "availability"):
+                self.assertTrue(np.isclose(getattr(results, k)[i],
+                                           getattr(x, k), rtol=1e-9, atol=0),
+                                "%s: %s" % (m.descr, k))
+
+
+if __name__ == "__main__":
+    unittest.main()
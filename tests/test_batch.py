@@ -0,0 +1,61 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+Batch gives the same Sizes, Rates and Results as the scalar classes
+"""
+
+import unittest
+
+import numpy as np
+
+import Batch
+import Sweep
+from Model import Sizes, Rates, Results
+from RelyFuncts import YEAR
+from tests.samples import randomModels
+
+
+class TestBatch(unittest.TestCase):
+
+    def compare(self, models, period=1*YEAR):
+        """ every (numeric) attribute, of every stage, of every model """
+        (sizes, rates, results) = Batch.evaluate(models, period=period)
+        for (i, m) in enumerate(models):
+            s = Sizes(m)
+            r = Rates(m)
+            x = Results(m, s, r, period)
+            for (scalar, batch) in ((s, sizes), (r, rates), (x, results)):
+                for (k, v) in vars(scalar).items():
+                    if not isinstance(v, (int, long, float)) or \
+                            not hasattr(batch, k):
+                        continue
+                    b = np.asarray(getattr(batch, k))
+                    b = b[i] if b.ndim > 0 else b
+                    self.assertTrue(np.isclose(v, b, rtol=1e-9, atol=0),
+                                    "%s: %s %s != %s" % (m.descr, k, v, b))
+
+    def test_default(self):
+        self.compare(list(Sweep.load(Sweep.path("default.json")).models()))
+
+    def test_nvramber(self):
+        self.compare(list(Sweep.load(Sweep.path("nvramber.json")).models()))
+
+    def test_domains(self):
+        self.compare(list(Sweep.load(Sweep.path("domains.json")).models()))
+
+    def test_random(self):
+        models = randomModels(300)
+        self.compare(models)
+        self.compare(models, period=10*YEAR)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+a benchmark run is compared with its baseline as it should be: slowdowns
+beyond the threshold (and the measured noise) and changed answers fail,
+and nothing else does
+"""
+
+import os
+import sys
+import unittest
+from collections import OrderedDict
+
+import Benchmark
+
+
+def _run(**workloads):
+    """ a hand-built benchmark result
+            workloads -- name=(rate, noise, golden values)
+    """
+    result = {"python": "2.7", "numpy": "1.16", "host": "here",
+              "quick": False, "startup": 0.1, "workloads": OrderedDict()}
+    for (name, (rate, noise, golden)) in sorted(workloads.items()):
+        result["workloads"][name] = {
+            "items": 1000, "unit": "configurations",
+            "seconds": 1000.0 / rate, "rate": rate, "noise": noise,
+            "peak_mb": 20.0, "golden": golden}
+    return result
+
+
+def _compare(result, baseline, threshold=Benchmark.THRESHOLD):
+    """ Benchmark.compare, with its report discarded """
+    saved = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        return Benchmark.compare(result, baseline, threshold)
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_changed(self):
+        self.assertEqual(Benchmark._changed([1.0, 2.0], [1.0, 2.0]), [])
+        self.assertEqual(Benchmark._changed([1.0, 2.0 * (1 + 1E-12)],
+                                            [1.0, 2.0]), [])
+        self.assertEqual(Benchmark._changed([1.0, 2.0 * (1 + 1E-6)],
+                                            [1.0, 2.0]), [1])
+        self.assertEqual(Benchmark._changed([0.0, 1E-300], [0.0, 2E-300]),
+                         [1])
+        self.assertEqual(list(Benchmark._changed([1.0], [1.0, 2.0])),
+                         [0, 1])
+
+    def test_same(self):
+        baseline = _run(a=(100.0, 0.0, [1.0]), b=(5.0, 0.0, [2.0, 3.0]))
+        self.assertEqual(_compare(baseline, baseline), [])
+
+    def test_slower(self):
+        baseline = _run(a=(100.0, 0.0, [1.0]), b=(5.0, 0.0, [2.0]))
+        # within the threshold
+        self.assertEqual(_compare(_run(a=(81.0, 0.0, [1.0]),
+                                       b=(5.0, 0.0, [2.0])), baseline), [])
+        # beyond it
+        failures = _compare(_run(a=(79.0, 0.0, [1.0]),
+                                 b=(5.0, 0.0, [2.0])), baseline)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].startswith("a: 21.0% slower"))
+        # but the noise of either run widens it
+        self.assertEqual(_compare(_run(a=(79.0, 0.05, [1.0]),
+                                       b=(5.0, 0.0, [2.0])), baseline), [])
+        self.assertEqual(_compare(_run(a=(79.0, 0.0, [1.0]),
+                                       b=(5.0, 0.0, [2.0])), baseline,
+                                  0.25), [])
+        # and faster is never a failure
+        self.assertEqual(_compare(_run(a=(1000.0, 0.0, [1.0]),
+                                       b=(50.0, 0.0, [2.0])), baseline), [])
+
+    def test_answers(self):
+        baseline = _run(a=(100.0, 0.0, [1.0, 2.0]))
+        failures = _compare(_run(a=(100.0, 0.0, [1.0, 2.5])), baseline)
+        self.assertEqual(failures, ["a: golden value 1 was 2.0, now 2.5"])
+        failures = _compare(_run(a=(100.0, 0.0, [1.0])), baseline)
+        self.assertEqual(failures[-1], "a: golden value 1 was 2.0, now None")
+
+    def test_not_comparable(self):
+        # different workloads, or different sizes, are only reported
+        baseline = _run(a=(100.0, 0.0, [1.0]))
+        result = _run(a=(1.0, 0.0, [9.0]), b=(1.0, 0.0, [9.0]))
+        result["workloads"]["a"]["items"] = 10
+        self.assertEqual(_compare(result, baseline), [])
+
+        # and baselines without the noise are still comparable
+        del baseline["workloads"]["a"]["noise"]
+        self.assertEqual(_compare(baseline, baseline), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
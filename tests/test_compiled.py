@@ -0,0 +1,98 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the generated code gives the same answers as Batch, bit for bit
+"""
+
+import unittest
+
+import numpy as np
+
+import Batch
+import Compiled
+import Sweep
+from RelyFuncts import YEAR
+from sizes import GiB, MiB
+from tests.samples import randomModels
+
+
+def randomTable(n, seed=11):
+    """ a ModelTable that mixes every structure (and Batch's special
+        cases), with integer and float columns
+    """
+    rng = np.random.RandomState(seed)
+    c = dict()
+    c["copies"] = rng.randint(0, 6, n)
+    c["symmetric"] = rng.randint(0, 2, n).astype(bool)
+    c["nv_1"] = rng.randint(0, 2, n).astype(bool)
+    c["nv_2"] = rng.randint(0, 2, n).astype(bool)
+    c["remirror"] = rng.randint(0, 2, n).astype(bool)
+    c["decluster"] = rng.randint(1, 20, n)
+    c["rate_flush"] = rng.choice([100 * MiB, 200 * MiB, 300 * MiB], n)
+    c["rate_mirror"] = rng.choice([100 * MiB, 1000 * MiB], n)
+    c["max_dirty"] = rng.choice([250 * MiB, 1 * GiB, 77777777], n)
+    c["ber_nvm_r"] = 10.0 ** rng.uniform(-17, -5, n)
+    c["ber_nvm_w"] = 10.0 ** rng.uniform(-17, -5, n) * rng.randint(0, 2, n)
+    c["f_nvm_1"] = rng.uniform(0, 1000, n)
+    c["f_nvm_2"] = rng.uniform(0, 1000, n)
+    c["time_detect"] = rng.randint(5, 60, n)
+    c["f_ctlr"] = rng.uniform(1000, 8000, n)
+    c["cache_2"] = rng.choice([10 * GiB, 40 * GiB], n)
+    special = rng.rand(n)
+    c["domain_size"] = np.where(special < 0.05, 10, 0)
+    c["bw_backing"] = np.where((special > 0.05) & (special < 0.1),
+                               1000 * MiB, 0)
+    return Batch.ModelTable(c, n=n)
+
+
+class TestCompiled(unittest.TestCase):
+
+    def same(self, t, period=1*YEAR):
+        # (rows without copies divide by zero, in both)
+        with np.errstate(all="ignore"):
+            results = Batch.evaluate(t, period=period)[2]
+            p = Compiled.pLoss(t, period=period)
+        differ = np.nonzero(p != results.p_loss)[0]
+        self.assertEqual(len(differ), 0, "%d rows differ (e.g. row %s)" %
+                         (len(differ), differ[:1]))
+        self.assertTrue((Compiled.nines(p) == results.nines).all())
+
+    def test_random(self):
+        t = randomTable(20000)
+        self.same(t)
+        self.same(t, period=10*YEAR)
+
+    def test_types(self):
+        # a float rate_mirror with integer rate_flush (as np.where mixes)
+        t = randomTable(5000, seed=12)
+        t.rate_mirror = t.rate_mirror.astype(float)
+        self.same(t)
+
+    def test_models(self):
+        self.same(Batch.ModelTable.fromModels(randomModels(300)))
+        for name in ("default.json", "nvramber.json"):
+            models = list(Sweep.load(Sweep.path(name)).models())
+            self.same(Batch.ModelTable.fromModels(models))
+
+    def test_homogeneous(self):
+        # every row of one structure (evaluated without selecting rows)
+        t = randomTable(1000, seed=13)
+        for k in ("symmetric", "nv_1", "nv_2", "remirror"):
+            setattr(t, k, np.repeat(getattr(t, k)[:1], len(t)))
+        t.copies[:] = 3
+        t.domain_size[:] = 0
+        t.bw_backing[:] = 0
+        self.assertEqual(len(np.unique(Compiled.structures(t))), 1)
+        self.same(t)
+
+
+if __name__ == "__main__":
+    unittest.main()
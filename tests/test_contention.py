@@ -0,0 +1,85 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+recovery gets the bandwidth it asks for until a shared resource runs
+out, and then a (max-min fair, or prioritized) share of it, which makes
+recovery, and loss, more likely the tighter the limits are
+"""
+
+import unittest
+
+import Batch
+import Sweep
+from Model import Model, share
+from run import evaluate
+from sizes import MB, GB
+
+
+class TestShare(unittest.TestCase):
+
+    def test_unlimited(self):
+        self.assertEqual(share(100, 10, 0, 5000), 100)
+        self.assertEqual(share(100, 0, 500, 5000), 100)
+        self.assertEqual(share(100, 10, 2000, 1000), 100)
+
+    def test_fair(self):
+        # normal I/O is light: recovery gets whatever is left
+        self.assertEqual(share(100, 10, 1000, 200), 80)
+        # normal I/O is heavy: recovery still gets half of it
+        self.assertEqual(share(100, 10, 1000, 900), 50)
+        # and never more than it asked for
+        self.assertEqual(share(40, 10, 1000, 900), 40)
+
+    def test_priority(self):
+        self.assertEqual(share(100, 10, 1000, 900, True), 100)
+        self.assertEqual(share(100, 20, 1000, 900, True), 50)
+
+
+class TestContention(unittest.TestCase):
+
+    def test_default(self):
+        # with no limits, recovery runs at full speed
+        (sizes, rates, results) = evaluate(Model(""))
+        self.assertEqual(results.stretch, 1)
+
+    def test_limits(self):
+        last = None
+        for backing in (0, 4 * GB, 1 * GB, 500 * MB):
+            m = Model("")
+            m.decluster = 4
+            m.bw_backing = backing
+            (sizes, rates, results) = evaluate(m)
+            if last is not None:
+                self.assertTrue(results.stretch >= last.stretch)
+                self.assertTrue(results.Trecov >= last.Trecov)
+                self.assertTrue(results.p_loss >= last.p_loss)
+            last = results
+        self.assertTrue(last.stretch > 1)
+
+        # and putting recovery first shortens it
+        m.recovery_first = True
+        (sizes, rates, results) = evaluate(m)
+        self.assertTrue(results.Trecov < last.Trecov)
+
+    def test_batch(self):
+        models = list(Sweep.load(Sweep.path("contention.json")).models())
+        (sizes, rates, results) = Batch.evaluate(models)
+        stretched = 0
+        for (i, m) in enumerate(models):
+            x = evaluate(m)[2]
+            self.assertAlmostEqual(results.stretch[i] / x.stretch, 1, 12)
+            self.assertAlmostEqual(results.p_loss[i] / x.p_loss, 1, 9)
+            stretched += x.stretch > 1
+        self.assertTrue(stretched > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+a whole durability curve is the same as evaluating each period on its
+own, and the MTTDL is the integral of the probability of no loss
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy.integrate import quad
+from scipy.stats import poisson
+
+import Batch
+import RelyFuncts
+from RelyFuncts import DAY, YEAR
+from run import curves, evaluate
+from tests.samples import randomModels
+
+PERIODS = [1 * DAY, 30 * DAY, 1 * YEAR, 5 * YEAR, 25 * YEAR]
+
+
+def _at(value, *index):
+    """ one entry of a curve (which may be a constant, e.g. no domains) """
+    value = np.asarray(value)
+    return value[index] if value.ndim == len(index) else value
+
+
+class TestCurves(unittest.TestCase):
+
+    def test_periods(self):
+        models = randomModels(50, seed=7)
+        (sizes, rates, batch) = Batch.evaluate(models, period=PERIODS)
+        for (i, m) in enumerate(models):
+            curve = evaluate(m, period=PERIODS)[2]
+            for (j, t) in enumerate(PERIODS):
+                single = evaluate(m, period=t)[2]
+                for k in ("p_loss", "p_domain", "t_down"):
+                    a = getattr(single, k)
+                    for b in (_at(getattr(curve, k), j),
+                              _at(getattr(batch, k), i, j)):
+                        self.assertTrue(np.isclose(a, b, rtol=1e-9,
+                                                   atol=0),
+                                        "%s %s(%g): %s != %s" %
+                                        (m.descr, k, t, a, b))
+                self.assertEqual(_at(curve.nines, j), single.nines)
+            # and an MTTDL that doesn't depend on the period
+            self.assertEqual(curve.mttdl, single.mttdl)
+            self.assertTrue(np.isclose(batch.mttdl[i], single.mttdl,
+                                       rtol=1e-9, atol=0))
+
+    def test_mttdl(self):
+        self.assertEqual(RelyFuncts.mttdl([]), float("inf"))
+        self.assertEqual(RelyFuncts.mttdl([(1.0, -1, 1.0)]), 0.0)
+        self.assertAlmostEqual(RelyFuncts.mttdl([(0.5, 0, 1.0)]), 2.0)
+        # the n+1'th event of a Poisson process
+        self.assertAlmostEqual(RelyFuncts.mttdl([(0.5, 2, 1.0)]), 6.0)
+        for terms in ([(1E-3, 0, 1.0), (2E-3, 1, 1.0)],
+                      [(1E-2, 2, 1.0), (4E-3, 1, 0.5), (1E-4, 0, 1.0)]):
+            def survive(t):
+                s = 1.0
+                for (r, n, scale) in terms:
+                    s *= poisson.cdf(n, r * scale ** (1.0 / (n + 1)) * t)
+                return s
+            (mean, err) = quad(survive, 0, np.inf)
+            self.assertAlmostEqual(RelyFuncts.mttdl(terms) / mean, 1, 6)
+            rows = [(np.array([r, r]), np.array([n, n]), np.array([s, s]))
+                    for (r, n, s) in terms]
+            self.assertTrue(np.allclose(Batch.mttdl(rows), mean,
+                                        rtol=1e-6, atol=0))
+
+    def test_print(self):
+        saved = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            curves(randomModels(3, seed=8), PERIODS)
+        finally:
+            sys.stdout.close()
+            sys.stdout = saved
+
+
+if __name__ == "__main__":
+    unittest.main()
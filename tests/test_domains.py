@@ -0,0 +1,84 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+failure domains add nothing when there are none, lose everything they
+hold when every copy is in one, and cost less the more they are spread
+"""
+
+import math
+import unittest
+
+from Model import Model
+from RelyFuncts import YEAR, BILLION
+from run import evaluate
+
+
+def _model(copies=3, domain_size=20, domain_copies=1):
+    """ a default model, in failure domains """
+    m = Model("")
+    m.copies = copies
+    m.domain_size = domain_size
+    m.domain_copies = domain_copies
+    return m
+
+
+class TestDomains(unittest.TestCase):
+
+    def test_none(self):
+        (sizes, rates, results) = evaluate(_model(domain_size=0))
+        self.assertEqual(sizes.n_domains, 0)
+        self.assertEqual(results.p_domain, 0)
+        self.assertEqual(len(results.terms), 2)
+        self.assertEqual(results.p_loss, results.loss(YEAR))
+
+        # (and nothing goes down if nothing can)
+        m = _model()
+        m.f_feed = 0
+        m.f_tor = 0
+        (sizes, rates, results) = evaluate(m)
+        self.assertEqual(rates.fits_domain, 0)
+        self.assertEqual(results.p_domain, 0)
+
+    def test_local(self):
+        # every copy in the same rack: any outage loses data
+        for copies in (2, 3, 4):
+            m = _model(copies, domain_copies=copies)
+            (sizes, rates, results) = evaluate(m)
+            self.assertAlmostEqual(sizes.n_domains * m.domain_size,
+                                   sizes.n_primary + sizes.n_secondary)
+            outages = rates.fits_domain * sizes.n_domains * YEAR / BILLION
+            self.assertAlmostEqual(results.p_domain,
+                                   -math.expm1(-outages), places=12)
+
+    def test_spread(self):
+        for copies in (3, 4):
+            p = list()
+            for cd in range(copies, 0, -1):
+                m = _model(copies, domain_copies=cd)
+                (sizes, rates, results) = evaluate(m)
+                self.assertTrue(results.p_domain <= results.p_loss)
+                p.append(results.p_domain)
+            # fewer copies per domain, fewer losses
+            for (a, b) in zip(p, p[1:]):
+                self.assertTrue(b < a, "%d copies: %s" % (copies, p))
+
+    def test_redundancy(self):
+        # a second power feed makes feed failures much less likely
+        single = _model()
+        single.n_feed = 1
+        single.m_feed = 1
+        dual = _model()
+        self.assertTrue(evaluate(dual)[1].fits_domain <
+                        evaluate(single)[1].fits_domain)
+
+
+if __name__ == "__main__":
+    unittest.main()
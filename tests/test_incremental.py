@@ -0,0 +1,84 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+incremental re-evaluation gives the same results as starting over
+"""
+
+import random
+import unittest
+
+from Incremental import LiveModel
+from Model import Model, Sizes, Rates, Results
+from RelyFuncts import YEAR
+from sizes import GB, PiB
+from tests.samples import randomModels
+
+
+def _text(evaluated):
+    """ an exact (repr) transcript of (sizes, rates, results) """
+    return repr([sorted(vars(stage).items()) for stage in evaluated])
+
+
+def _fresh(m, capacity, period):
+    """ (sizes, rates, results) computed from scratch """
+    sizes = Sizes(m, capacity)
+    rates = Rates(m)
+    return (sizes, rates, Results(m, sizes, rates, period))
+
+
+class TestIncremental(unittest.TestCase):
+
+    def test_changes(self):
+        rng = random.Random(3)
+        others = randomModels(50, seed=4)
+        names = sorted([k for k in vars(others[0]) if k != "descr"])
+        for m in randomModels(10, seed=5):
+            live = LiveModel(m)
+            for i in range(40):
+                # one or a few parameters, from another model
+                other = rng.choice(others)
+                changes = dict([(k, getattr(other, k))
+                                for k in rng.sample(names,
+                                                    rng.choice([1, 1, 3]))])
+                live.set(**changes)
+                if rng.random() < 0.1:
+                    live.period = rng.choice([YEAR, 5 * YEAR])
+                if rng.random() < 0.1:
+                    live.capacity = rng.choice([PiB, 4 * PiB])
+                self.assertEqual(_text(live.evaluate()),
+                                 _text(_fresh(m, live.capacity,
+                                              live.period)))
+
+    def test_types(self):
+        # 4 and 4.0 compare equal, but do not divide alike
+        m = Model("")
+        m.cache_1 = 4 * GB
+        live = LiveModel(m)
+        live.evaluate()
+        live.set(cache_1=float(4 * GB), lun_per_vm=3)
+        live.evaluate()
+        live.set(lun_per_vm=3.0)
+        self.assertEqual(_text(live.evaluate()),
+                         _text(_fresh(m, live.capacity, live.period)))
+
+    def test_stale(self):
+        live = LiveModel(Model(""))
+        live.evaluate()
+        self.assertEqual(live.stale(), [])
+        live.set(f_ctlr=live.model.f_ctlr * 2)
+        self.assertEqual(live.stale(), ["rates", "results"])
+        live.evaluate()
+        self.assertEqual(live.computed,
+                         {"sizes": 1, "rates": 2, "results": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
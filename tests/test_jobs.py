@@ -0,0 +1,63 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+parallel (and cached) evaluation gives the same results, in the same
+order, as a serial one
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ResultCache import ResultCache
+from run import evaluateAll
+from tests.samples import randomModels
+
+
+def _text(evaluated):
+    """ an exact (repr) transcript of every (sizes, rates, results) """
+    return [repr([sorted(vars(stage).items()) for stage in r])
+            for r in evaluated]
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.models = randomModels(200, seed=2)
+        self.serial = _text(evaluateAll(self.models))
+
+    def test_list(self):
+        self.assertEqual(_text(evaluateAll(self.models, jobs=3)),
+                         self.serial)
+
+    def test_generator(self):
+        models = (m for m in self.models)
+        self.assertEqual(_text(evaluateAll(models, jobs=2)), self.serial)
+
+    def test_cache(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            cache = ResultCache(os.path.join(tmp, "results.db"))
+            # half of them known, then all of them
+            half = self.models[::2]
+            self.assertEqual(_text(evaluateAll(half, cache=cache)),
+                             self.serial[::2])
+            self.assertEqual(_text(evaluateAll(self.models, jobs=2,
+                                               cache=cache)), self.serial)
+            self.assertEqual(cache.hits, len(half))
+            cache.close()
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    unittest.main()
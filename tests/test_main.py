@@ -0,0 +1,52 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+test modules are run with whichever of jobs and cache their tests take
+"""
+
+import types
+import unittest
+
+import main
+
+
+def _old(columns, verbosity):
+    return (columns, verbosity)
+
+
+def _new(columns="", verbosity="default", jobs=1, cache=None):
+    return (columns, verbosity, jobs, cache)
+
+
+def _jobs(columns, verbosity, jobs=1):
+    return (columns, verbosity, jobs)
+
+
+def _any(columns, verbosity, **kwargs):
+    return (columns, verbosity, sorted(kwargs.items()))
+
+
+class TestModuleTests(unittest.TestCase):
+
+    def test_signatures(self):
+        for (tests, expect) in ((_old, ("c", "v")),
+                                (_new, ("c", "v", 4, "db")),
+                                (_jobs, ("c", "v", 4)),
+                                (_any, ("c", "v", [("cache", "db"),
+                                                   ("jobs", 4)]))):
+            module = types.ModuleType("module")
+            module.tests = tests
+            self.assertEqual(main.moduleTests(module, "c", "v", 4, "db"),
+                             expect)
+
+
+if __name__ == "__main__":
+    unittest.main()
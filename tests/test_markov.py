@@ -0,0 +1,78 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the two CTMC solutions (uniformization and renewal cycles) agree, for
+hand-drawn and generated state models of any size
+"""
+
+import math
+import unittest
+
+import Markov
+import StateSpace
+import Sweep
+from Model import Model
+from RelyFuncts import YEAR
+from run import evaluate
+
+
+def chain(graph, copies, symmetric=False):
+    """ a Chain for the default model with some number of copies """
+    m = Model("")
+    m.copies = copies
+    m.symmetric = symmetric
+    if symmetric:
+        m.cache_1 *= copies
+    (sizes, rates, results) = evaluate(m)
+    return (Markov.Chain(graph, m, sizes, rates, results), results)
+
+
+class TestMarkov(unittest.TestCase):
+
+    def consistent(self, c, period=YEAR):
+        """ P(fail within t) is what the MTTF implies (it starts from,
+            and almost always returns to, the nominal state)
+        """
+        p = c.p_fail(period)
+        expect = -math.expm1(-period / c.mttf())
+        self.assertTrue(0 < p < 1)
+        self.assertTrue(abs(p - expect) <= 1e-4 * expect,
+                        "%d states: %g != %g" % (len(c.states), p, expect))
+
+    def test_one_copy(self):
+        # nothing but a Poisson process
+        (c, results) = chain(Markov.StateGraph(StateSpace.generate(1)), 1)
+        self.assertTrue(abs(c.p_fail(YEAR) - results.p_loss) <=
+                        1e-12 * results.p_loss)
+
+    def test_drawn(self):
+        for (name, symmetric) in (("Asy3C", False), ("Sym3C", True)):
+            graph = Markov.StateGraph.load(Sweep.path(name))
+            self.consistent(chain(graph, 3, symmetric)[0])
+
+    def test_generated(self):
+        for copies in (2, 3, 4, 5):
+            for symmetric in (False, True):
+                graph = Markov.StateGraph(StateSpace.generate(copies,
+                                                              symmetric))
+                (c, results) = chain(graph, copies, symmetric)
+                self.consistent(c)
+                self.consistent(c, 10 * YEAR)
+
+    def test_large(self):
+        # hundreds of states, and a probability far below 1E-100
+        graph = Markov.StateGraph(StateSpace.generate(30))
+        self.assertEqual(len(graph.states), 524)
+        self.consistent(chain(graph, 30)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the caches keep the most recently used values, tell 1, 1.0 and True
+apart, and never change an answer
+"""
+
+import unittest
+
+import Memo
+from Model import Model, Rates, getRates, rateCache
+from RelyFuncts import multiFit
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru(self):
+        c = Memo.LRUCache(3, "test")
+        computed = list()
+
+        def compute(k):
+            computed.append(k)
+            return k * k
+        for k in (1, 2, 3, 1, 4, 2, 1):
+            self.assertEqual(c.lookup(k, lambda: compute(k)), k * k)
+        # 1 was used again before 4 pushed out 2 (the least recent)
+        self.assertEqual(computed, [1, 2, 3, 4, 2])
+        self.assertEqual(c.stats(), (2, 5, 3))
+        self.assertEqual(list(c.entries), [4, 2, 1])
+        c.clear()
+        self.assertEqual(c.stats(), (0, 0, 0))
+
+    def test_typed(self):
+        self.assertNotEqual(Memo.typedKey([1]), Memo.typedKey([1.0]))
+        self.assertNotEqual(Memo.typedKey([1]), Memo.typedKey([True]))
+        self.assertEqual(Memo.typedKey([1, "a"]), Memo.typedKey([1, "a"]))
+
+    def test_memoize(self):
+        calls = list()
+
+        @Memo.memoize(8, name="half")
+        def half(x, exact=False):
+            """ half of x """
+            calls.append(x)
+            return x / 2.0 if exact else x / 2
+        self.assertTrue(half.cache in Memo.caches)
+        self.assertEqual(half.__doc__, " half of x ")
+        self.assertEqual(half(3), 1)
+        self.assertEqual(half(3.0), 1.5)
+        self.assertEqual(half(3, exact=True), 1.5)
+        self.assertEqual(half(3), 1)
+        self.assertEqual(calls, [3, 3.0, 3])
+        Memo.caches.remove(half.cache)
+
+
+class TestRates(unittest.TestCase):
+
+    def test_same(self):
+        # cached and computed rates agree, whatever the parameter types
+        m = Model("")
+        for (name, value) in (("nv_1", 1), ("nv_1", True),
+                              ("cache_1", 1024 ** 3),
+                              ("cache_1", float(1024 ** 3)),
+                              ("f_nvm_1", 100), ("n_power", 3)):
+            setattr(m, name, value)
+            self.assertEqual(vars(getRates(m)), vars(Rates(m)))
+
+    def test_shared(self):
+        rateCache.clear()
+        m = Model("")
+        r = getRates(m)
+        m.copies = 4                # (Rates do not depend on copies)
+        self.assertTrue(getRates(m) is r)
+        m.f_sw = m.f_sw + 1
+        self.assertFalse(getRates(m) is r)
+        self.assertEqual(rateCache.stats(), (1, 2, 2))
+
+    def test_multifit(self):
+        multiFit.cache.clear()
+        self.assertEqual(multiFit(1000, 2, 1, 24), multiFit(1000, 2, 1, 24))
+        self.assertEqual(multiFit.cache.stats(), (1, 1, 1))
+        self.assertNotEqual(multiFit(1000, 2, 1, 24),
+                            multiFit(1000, 2, 1, 24, oneRepair=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the simulated probability of loss agrees with Results, where Results
+makes no approximations that matter (one or two copies), and importance
+sampling agrees with both where they can be checked
+"""
+
+import unittest
+
+from Model import Model
+from MonteCarlo import ImportanceSimulation, Simulation, wilson
+from run import evaluate
+from sizes import PiB
+
+
+def _model(copies=2, symmetric=False, nv=False):
+    """ a default model, with a few of its parameters changed """
+    m = Model("")
+    m.copies = copies
+    m.symmetric = symmetric
+    m.nv_1 = nv
+    m.nv_2 = nv
+    if symmetric:
+        m.cache_1 *= copies
+    return m
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_wilson(self):
+        self.assertEqual(wilson(0, 0), (0.0, 1.0))
+        (lo, hi) = wilson(0, 1000)
+        self.assertEqual(lo, 0.0)
+        self.assertTrue(0.003 < hi < 0.004)     # (the rule of three)
+        (lo, hi) = wilson(500, 1000)
+        self.assertAlmostEqual((lo + hi) / 2, 0.5)
+        self.assertTrue(0.46 < lo < 0.47)
+        (lo, hi) = wilson(1000, 1000)
+        self.assertEqual(hi, 1.0)
+
+    def test_one_copy(self):
+        m = _model(copies=1)
+        (sizes, rates, results) = evaluate(m, 1*PiB)
+        sim = Simulation(m, sizes, rates, seed=1).run(1000)
+        self.assertEqual(sim.trials, 1000)
+        self.assertEqual(sim.p_loss(), results.p_loss)
+
+    def test_two_copies(self):
+        models = [_model()]
+        for symmetric in (False, True):
+            # unreliable enough to see a few thousand losses
+            m = _model(symmetric=symmetric)
+            m.f_ctlr = 1E5
+            m.time_detect = 3600
+            m.time_timeout = 3600
+            models.append(m)
+        for m in models:
+            (sizes, rates, results) = evaluate(m, 1*PiB)
+            sim = Simulation(m, sizes, rates, seed=1)
+            # (in several batches)
+            sim.run(100000, batch=30000)
+            self.assertEqual(sim.trials, 100000)
+            (lo, hi) = sim.interval(z=3)
+            self.assertTrue(lo <= results.p_loss <= hi,
+                            "%s: %g not in (%g, %g)" %
+                            (m.descr, results.p_loss, lo, hi))
+
+
+class TestImportance(unittest.TestCase):
+
+    def test_results(self):
+        # down to 6 nines, where a straight simulation sees little or nothing
+        for m in (_model(), _model(symmetric=True), _model(nv=True)):
+            (sizes, rates, results) = evaluate(m, 1*PiB)
+            sim = ImportanceSimulation(m, sizes, rates, seed=1)
+            sim.run(100000)
+            self.assertTrue(sim.relerr() < 0.01)
+            self.assertTrue(abs(sim.p_loss() / results.p_loss - 1) < 0.01,
+                            "%s: %g vs %g" %
+                            (m.descr, sim.p_loss(), results.p_loss))
+
+    def test_unbiased(self):
+        # three copies, unreliable enough for a straight simulation
+        m = _model(copies=3)
+        m.f_ctlr = 1E5
+        m.time_detect = 36000
+        m.time_timeout = 36000
+        (sizes, rates, results) = evaluate(m, 1*PiB)
+        (lo, hi) = Simulation(m, sizes, rates, seed=1).run(
+            100000).interval(z=3)
+        sim = ImportanceSimulation(m, sizes, rates, seed=2).run(100000)
+        self.assertTrue(lo <= sim.p_loss() <= hi)
+        (islo, ishi) = sim.interval()
+        self.assertTrue(islo < sim.p_loss() < ishi)
+        self.assertTrue(ishi - islo < (hi - lo) / 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the incremental frontier is what comparing every pair of points gives
+"""
+
+import unittest
+
+import numpy as np
+
+import Batch
+import Pareto
+from tests.samples import randomModels
+
+
+def nonDominated(points):
+    """ the distinct points that no other point is at least as good as
+        in every objective (the O(n^2) definition)
+    """
+    distinct = set(map(tuple, points))
+    result = set()
+    for p in distinct:
+        if not any([q != p and all([a <= b for (a, b) in zip(q, p)])
+                    for q in distinct]):
+            result.add(p)
+    return result
+
+
+class TestPareto(unittest.TestCase):
+
+    def check(self, points, chunk):
+        frontier = Pareto.Frontier()
+        for i in range(0, len(points), chunk):
+            frontier.add(points[i:i + chunk], range(i, i + chunk))
+        found = [tuple(p) for p in frontier.points]
+        self.assertEqual(len(found), len(set(found)))
+        self.assertEqual(set(found), nonDominated(points))
+        for (p, i) in zip(frontier.points, frontier.items):
+            self.assertEqual(tuple(p), tuple(points[i]))
+
+    def test_ties(self):
+        rng = np.random.RandomState(6)
+        points = rng.randint(0, 6, size=(400, 3)).astype(float)
+        points[:, 2] += 10 - points[:, 0] - points[:, 1]
+        for chunk in (1, 37, 400):
+            self.check(points, chunk)
+
+    def test_random(self):
+        rng = np.random.RandomState(7)
+        points = rng.rand(600, 3)
+        points[:, 2] = 1 - points[:, 0] - points[:, 1] + rng.rand(600) / 4
+        for chunk in (50, 600):
+            self.check(points, chunk)
+
+    def test_models(self):
+        models = randomModels(300, seed=8)
+        t = Batch.ModelTable.fromModels(models)
+        (sizes, rates, results) = Batch.evaluate(t)
+        points = Pareto.objectives(t, sizes, results)
+        frontier = Pareto.explore(models, chunk=64)
+        self.assertEqual(set([tuple(p) for p in frontier.points]),
+                         nonDominated(points))
+
+
+if __name__ == "__main__":
+    unittest.main()
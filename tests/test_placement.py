@@ -0,0 +1,132 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the placement maps are valid, and their statistics (and domain outage
+losses) are what counting them one primary at a time gives
+"""
+
+import unittest
+
+import numpy as np
+
+import Placement
+from Model import Model
+from RelyFuncts import YEAR
+from run import evaluate
+from sizes import PiB
+
+
+def _models():
+    """ a few structures to place """
+    for (copies, decluster, symmetric) in ((2, 1, False), (3, 4, False),
+                                           (4, 3, False), (2, 2, True),
+                                           (3, 8, True)):
+        m = Model("")
+        m.copies = copies
+        m.decluster = decluster
+        m.symmetric = symmetric
+        if symmetric:
+            m.cache_1 *= copies
+        yield m
+
+
+class TestPlacement(unittest.TestCase):
+
+    def test_maps(self):
+        for m in _models():
+            for policy in sorted(Placement.POLICIES):
+                p = Placement.Placement(m, policy, 4*PiB)
+                self.assertEqual(p.map.shape, (p.n1, p.fan_out))
+                self.assertTrue((p.map >= 0).all())
+                self.assertTrue((p.map < p.n2).all())
+                for (i, row) in enumerate(p.map):
+                    self.assertEqual(len(set(row)), p.fan_out)
+                    if m.symmetric:
+                        self.assertTrue(i not in row)
+                self.assertEqual(p.fanIn().sum(), p.n1 * p.fan_out)
+
+    def test_copysets(self):
+        for m in _models():
+            for policy in sorted(Placement.POLICIES):
+                p = Placement.Placement(m, policy, 4*PiB)
+                scp = min(m.copies - 1, p.fan_out)
+                sets = set()
+                for row in p.map:
+                    for j in range(m.decluster):
+                        sets.add(frozenset([row[(j + r) % p.fan_out]
+                                            for r in range(scp)]))
+                self.assertEqual(p.copySets(), len(sets))
+
+    def test_domains(self):
+        (q1, q2) = (1E-3, 1E-2)
+        for m in _models():
+            for policy in sorted(Placement.POLICIES):
+                p = Placement.Placement(m, policy, 4*PiB)
+                (pdom, sdom) = p.domains()
+                if not m.symmetric:
+                    self.assertTrue(pdom.max() < sdom.min())
+                scp = min(m.copies - 1, p.fan_out)
+                survivors = dict()
+                for (i, row) in enumerate(p.map):
+                    for j in range(m.decluster):
+                        copies = [row[(j + r) % p.fan_out]
+                                  for r in range(scp)]
+                        for d in set([pdom[i]] + list(sdom[copies])):
+                            alive = (i if pdom[i] != d else -1,
+                                     frozenset([c for c in copies
+                                                if sdom[c] != d]))
+                            survivors.setdefault(d, set()).add(alive)
+                expect = np.zeros(len(p.pDomain(q1, q2)))
+                for (d, sets) in survivors.items():
+                    kept = 1.0
+                    for (primary, secondaries) in sets:
+                        kept *= 1 - (q1 if primary >= 0 else 1) * \
+                            q2 ** len(secondaries)
+                    expect[d] = 1 - kept
+                self.assertTrue(np.allclose(p.pDomain(q1, q2), expect,
+                                            rtol=1E-9, atol=0))
+
+    def test_loss(self):
+        m = Model("")
+        m.copies = 3
+        m.decluster = 4
+        (sizes, rates, results) = evaluate(m, 4*PiB)
+        independent = results.loss(1*YEAR, results.terms[:2])
+        loss = dict()
+        for policy in sorted(Placement.POLICIES):
+            p = Placement.Placement(m, policy, 4*PiB)
+            loss[policy] = p.pLoss(rates, results)
+            self.assertTrue(loss[policy] > independent)
+        # round-robin puts both mirrors of a chunk in the same rack
+        self.assertTrue(loss["round-robin"] > loss["random"])
+
+        # without domain outages, placement makes no difference
+        m.f_feed = 0
+        m.f_tor = 0
+        (sizes, rates, results) = evaluate(m, 4*PiB)
+        for policy in sorted(Placement.POLICIES):
+            p = Placement.Placement(m, policy, 4*PiB)
+            self.assertAlmostEqual(p.pLoss(rates, results),
+                                   results.p_loss, places=15)
+
+    def test_round_robin(self):
+        # round-robin reuses copy-sets, random placement scatters them
+        m = Model("")
+        m.copies = 3
+        m.decluster = 4
+        rr = Placement.Placement(m, "round-robin", 4*PiB)
+        rand = Placement.Placement(m, "random", 4*PiB)
+        self.assertTrue(rr.copySets() < rand.copySets())
+        self.assertTrue(np.ptp(rr.fanIn()) <= np.ptp(rand.fanIn()))
+
+
+if __name__ == "__main__":
+    unittest.main()
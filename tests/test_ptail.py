@@ -0,0 +1,78 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the Poisson tail for arrays agrees with the scalar one, and both keep
+their precision when the tail is tiny
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from RelyFuncts import Ptail, _Ptail_array
+
+
+class TestPtail(unittest.TestCase):
+
+    def test_array(self):
+        expected = [0.0, 1E-300, 1E-40, 1E-12, 1E-6, 0.01, 0.5, 0.99,
+                    1.0, 2.5, 3.0, 4.01, 10.0, 50.0, 700.0]
+        for n in range(-1, 8):
+            array = _Ptail_array(expected, n)
+            for (e, p) in zip(expected, array):
+                scalar = Ptail(e, n)
+                self.assertTrue(np.isclose(p, scalar, rtol=1e-12, atol=0),
+                                "Ptail(%g, %d) %r != %r" %
+                                (e, n, p, scalar))
+
+    def test_integers(self):
+        # an integer number of expected events is no different
+        for (e, n, p) in ((1, 1, 0.26424111765711533),
+                          (2, 1, 0.59399415029016189),
+                          (10, 9, 0.54207028552814784)):
+            self.assertTrue(np.isclose(Ptail(e, n), p, rtol=1e-12))
+            self.assertTrue(np.isclose(_Ptail_array(e, n), p, rtol=1e-12))
+        for e in range(0, 12):
+            for n in range(0, 12):
+                self.assertEqual(Ptail(e, n), Ptail(float(e), n))
+
+    def test_broadcast(self):
+        e = np.array([[1E-9], [0.3], [5.0]])
+        n = np.array([0, 1, 2, 4])
+        p = Ptail(e, n)
+        self.assertEqual(p.shape, (3, 4))
+        for i in range(3):
+            for j in range(4):
+                self.assertTrue(np.isclose(p[i, j], Ptail(e[i, 0], n[j]),
+                                           rtol=1e-12, atol=0))
+
+    def test_tiny(self):
+        # the first term dominates: e^(n+1) / (n+1)!
+        for n in range(0, 6):
+            for e in (1E-30, 1E-12, 1E-6):
+                first = e ** (n + 1) / math.factorial(n + 1)
+                self.assertTrue(np.isclose(Ptail(e, n), first, rtol=1e-5))
+                self.assertTrue(np.isclose(_Ptail_array([e], n)[0], first,
+                                           rtol=1e-5))
+
+    def test_complement(self):
+        # where it is not tiny, 1 - (P(0) + ... + P(n)) is good enough
+        for n in range(0, 6):
+            for e in (0.5, 2.0, 9.0):
+                head = sum([math.exp(-e) * e ** i / math.factorial(i)
+                            for i in range(n + 1)])
+                self.assertTrue(np.isclose(Ptail(e, n), 1 - head,
+                                           rtol=1e-9))
+
+
+if __name__ == "__main__":
+    unittest.main()
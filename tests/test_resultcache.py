@@ -0,0 +1,103 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+cached results are exactly the computed ones, survive being reopened,
+and are only found for exactly the same model, capacity and period
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from Model import Model
+from ResultCache import ResultCache
+from RelyFuncts import YEAR
+from run import evaluate
+from sizes import PiB, GB
+
+
+def _text(value):
+    """ an exact (repr) transcript of a (sizes, rates, results) """
+    return repr([sorted(vars(stage).items()) for stage in value])
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp, "results.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        m = Model("")
+        value = evaluate(m, 1*PiB, YEAR)
+        cache = ResultCache(self.filename)
+        self.assertEqual(cache.get(m, 1*PiB, YEAR), None)
+        cache.put(m, 1*PiB, YEAR, value)
+        self.assertEqual(_text(cache.get(m, 1*PiB, YEAR)), _text(value))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+        # and after it has been reopened
+        cache = ResultCache(self.filename)
+        self.assertEqual(_text(cache.get(m, 1*PiB, YEAR)), _text(value))
+        cache.close()
+
+    def test_keys(self):
+        cache = ResultCache(self.filename)
+        m = Model("one")
+        key = cache.key(m, 1*PiB, YEAR)
+        # the description does not matter
+        m.descr = "two"
+        self.assertEqual(cache.key(m, 1*PiB, YEAR), key)
+        # but everything else does, including the type of a number
+        self.assertNotEqual(cache.key(m, 2*PiB, YEAR), key)
+        self.assertNotEqual(cache.key(m, 1*PiB, 2 * YEAR), key)
+        for (name, value) in (("copies", 2), ("copies", 3.0),
+                              ("nv_1", 1), ("cache_1", 4.0 * GB)):
+            n = Model("")
+            setattr(n, name, value)
+            self.assertNotEqual(cache.key(n, 1*PiB, YEAR), key,
+                                "%s=%r" % (name, value))
+        # as does a new attribute, even after the names were cached
+        m.extra = 1
+        self.assertNotEqual(cache.key(m, 1*PiB, YEAR), key)
+        del m.extra
+        self.assertEqual(cache.key(m, 1*PiB, YEAR), key)
+        cache.close()
+
+    def test_evict(self):
+        m = Model("")
+        value = evaluate(m)
+        cache = ResultCache(self.filename)
+        cache.put(m, 1*PiB, YEAR, value)
+        size = cache.db.execute("SELECT size FROM results").fetchone()[0]
+        cache.maxbytes = 10 * size      # (room for about 10 results)
+        for i in range(2, 9):
+            cache.put(m, i * PiB, YEAR, value)
+        # using the first one makes it the most recently used
+        self.assertNotEqual(cache.get(m, 1*PiB, YEAR), None)
+        for i in range(9, 20):
+            cache.put(m, i * PiB, YEAR, value)
+        cache.flush()
+        count = cache.db.execute("SELECT COUNT(*) FROM results").fetchone()
+        self.assertTrue(count[0] <= 10)
+        self.assertNotEqual(cache.get(m, 19*PiB, YEAR), None)
+        self.assertNotEqual(cache.get(m, 1*PiB, YEAR), None)
+        self.assertEqual(cache.get(m, 2*PiB, YEAR), None)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the batched elasticities are the central differences of the scalar
+model, one parameter and one configuration at a time
+"""
+
+import copy
+import math
+import unittest
+
+import numpy as np
+
+import Sensitivity
+from run import evaluate
+from tests.samples import randomModels
+
+
+def _elasticity(m, name, names, h=0.01):
+    """ the scalar central difference (with the parameters as floats) """
+    m = copy.copy(m)
+    for a in names:
+        setattr(m, a, float(getattr(m, a)))
+    x = getattr(m, name)
+    p = list()
+    for scale in (1 + h, 1 - h):
+        setattr(m, name, x * scale)
+        p.append(evaluate(m)[2].p_loss)
+    return (math.log(p[0]) - math.log(p[1])) / \
+        (math.log1p(h) - math.log1p(-h))
+
+
+class TestSensitivity(unittest.TestCase):
+
+    def test_scalar(self):
+        models = [m for m in randomModels(12, seed=4) if m.copies > 1]
+        racked = copy.copy(models[-1])
+        racked.domain_size = 20     # (so that f_tor matters)
+        models.append(racked)
+        names = ["f_ctlr", "f_sw", "time_detect", "rate_flush",
+                 "max_dirty", "ber_nvm_r", "f_tor", "bw_network"]
+        # (in several chunks)
+        e = Sensitivity.elasticities(models, names, chunk=3)
+        self.assertEqual(e.shape, (len(models), len(names)))
+        for (i, m) in enumerate(models):
+            for (j, name) in enumerate(names):
+                if getattr(m, name) == 0:
+                    self.assertTrue(np.isnan(e[i, j]))
+                    continue
+                expect = _elasticity(m, name, names)
+                if name == "f_tor" and m is racked:
+                    self.assertTrue(expect > 0.01)
+                self.assertTrue(abs(e[i, j] - expect) <=
+                                1E-6 + 1E-6 * abs(expect),
+                                "%s %s: %g != %g" %
+                                (m.descr, name, e[i, j], expect))
+
+    def test_parameters(self):
+        names = Sensitivity.parameters()
+        for a in ("copies", "decluster", "nv_1", "symmetric"):
+            self.assertFalse(a in names)
+        for a in ("f_ctlr", "time_detect", "cache_1"):
+            self.assertTrue(a in names)
+        self.assertEqual(Sensitivity.elasticities([]).shape,
+                         (0, len(names)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the branch and bound search finds what a brute force search would
+"""
+
+import unittest
+from itertools import product
+
+import Aging
+import Sweep
+from Model import Model, Sizes
+from Solver import Solver, DISCRETE
+from sizes import GB, MiB
+
+
+def bruteForce(solver):
+    """ the cost of the cheapest feasible point in the whole grid """
+    space = solver.space
+    best = None
+    for choice in product(*[space[k] for k in DISCRETE]):
+        for flush in space["rate_flush"]:
+            for mirror in space["rate_mirror"]:
+                m = solver.model(choice, flush, mirror)
+                if not solver.feasible(m)[0]:
+                    continue
+                c = solver.cost(m, Sizes(m, solver.capacity))
+                best = c if best is None else min(best, c)
+    return best
+
+
+class TestSolver(unittest.TestCase):
+
+    def check(self, target, costs=None, space=None, aging=None):
+        solver = Solver(Model(""), target, costs, space, aging=aging)
+        found = solver.solve()
+        cheapest = bruteForce(Solver(Model(""), target, costs, space,
+                                     aging=aging))
+        if cheapest is None:
+            self.assertEqual(found, None)
+            return
+        (m, cost, p) = found
+        self.assertEqual(cost, cheapest, "%s nines: %s != %s" %
+                         (target, cost, cheapest))
+        self.assertTrue(p <= solver.p_target)
+        self.assertTrue(solver.evaluations < solver.gridSize())
+
+    def test_targets(self):
+        for target in (2, 4, 6, 8, 10, 12, 1E-5):
+            self.check(target)
+
+    def test_infeasible(self):
+        self.check(40)
+
+    def test_costs(self):
+        self.check(6, costs={"node": 500.0, "nvram": 5.0, "flush": 20.0})
+        self.check(9, costs={"mirror": 50.0},
+                   space={"cache_1": [2 * GB, 8 * GB],
+                          "cache_2": [20 * GB, 80 * GB]})
+
+    def test_aging(self):
+        # (aging each point is slow, so in a smaller space)
+        rates = [50 * MiB * 4 ** i for i in range(4)]
+        space = {"copies": [2, 3], "decluster": [1, 4],
+                 "rate_flush": rates, "rate_mirror": rates}
+        aging = Aging.load(Sweep.path("aging.json"))
+        for target in (6, 9):
+            self.check(target, space=space, aging=aging)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+generated state models have the promised number of states, every one of
+them on some path from OK to FAIL, and (for three copies) solve to about
+what the hand-drawn ones do
+"""
+
+import unittest
+
+import Markov
+import StateSpace
+import Sweep
+from RelyFuncts import YEAR
+from tests.test_markov import chain
+
+
+def _reachable(graph, start, forward=True):
+    """ the states that can be reached from (or that can reach) a state """
+    seen = set([start])
+    work = [start]
+    while len(work) > 0:
+        s = work.pop()
+        for (src, dst, window, mult) in graph.edges:
+            (a, b) = (src, dst) if forward else (dst, src)
+            if a == s and b not in seen:
+                seen.add(b)
+                work.append(b)
+    return seen
+
+
+class TestStateSpace(unittest.TestCase):
+
+    def test_states(self):
+        # (C-1)*C/2 + 3*(C-1) + 2 states
+        for copies in range(1, 12):
+            graph = Markov.StateGraph(StateSpace.generate(copies))
+            self.assertEqual(len(graph.states), (copies - 1) * copies / 2 +
+                             3 * (copies - 1) + 2)
+
+    def test_paths(self):
+        for copies in range(1, 7):
+            for symmetric in (False, True):
+                graph = Markov.StateGraph(StateSpace.generate(copies,
+                                                              symmetric))
+                kinds = [graph.kind(s) for s in graph.states]
+                self.assertEqual(kinds.count("nominal"), 1)
+                self.assertEqual(kinds.count("failed"), 1)
+                self.assertEqual(_reachable(graph, "OK"),
+                                 set(graph.states))
+                self.assertEqual(_reachable(graph, "FAIL", False),
+                                 set(graph.states))
+                # (and once data is lost, it stays lost)
+                self.assertEqual(_reachable(graph, "FAIL"),
+                                 set(["FAIL"]))
+
+    def test_drawn(self):
+        # exponential (rather than fixed) windows, up to 2x more likely
+        for (name, symmetric) in (("Asy3C", False), ("Sym3C", True)):
+            drawn = Markov.StateGraph.load(Sweep.path(name))
+            p = chain(drawn, 3, symmetric)[0].p_fail(YEAR)
+            generated = Markov.StateGraph(StateSpace.generate(3, symmetric))
+            q = chain(generated, 3, symmetric)[0].p_fail(YEAR)
+            self.assertTrue(p < q <= 2 * p, "%s: %g vs %g" % (name, q, p))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+sweep specifications expand (lazily, and in order) into the same models
+as the nested loops they replaced
+"""
+
+import unittest
+from collections import OrderedDict
+from itertools import islice
+
+import Sweep
+from ColumnPrint import printSize
+from Model import Model
+from sizes import GB
+
+
+def _handwritten():
+    """ the standard test scenarios, as main.py used to create them """
+    m = Model("")
+    misc = ", %d/%ds, %s/%s/s" % (m.time_timeout, m.time_detect,
+                                  printSize(m.rate_mirror, 1000),
+                                  printSize(m.rate_flush, 1000))
+    mlist = list()
+    for cp in (1, 2, 3):
+        for primary in (" v", "nv"):
+            sList = ["none"] if cp == 1 else [" v", "nv", "symmetric"]
+            for secondary in sList:
+                if primary == "nv" and secondary == " v":
+                    continue
+                if secondary == "symmetric":
+                    desc = ("symmetric: %d %s cp" % (cp, primary))
+                elif (cp > 1):
+                    desc = ("prim: %s   %d %s cp" %
+                            (primary, cp - 1, secondary))
+                else:
+                    desc = "prim: %s      0 cp" % (primary)
+                m = Model(desc + misc)
+                m.copies = cp
+                m.nv_1 = (primary == "nv")
+                m.cache_1 = 4 * GB
+                if secondary == "symmetric":
+                    m.symmetric = True
+                    m.cache_1 *= cp
+                    m.nv_2 = (primary == "nv")
+                    m.cache_2 = 0
+                elif cp > 1:
+                    m.nv_2 = (secondary == "nv")
+                    m.cache_2 = 40 * GB
+                mlist.append(m)
+    return mlist
+
+
+def _typed(m):
+    """ every attribute of a model, with its type (JSON strings being
+        unicode)
+    """
+    return sorted([(k, basestring if isinstance(v, basestring) else
+                    type(v), v) for (k, v) in vars(m).items()])
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_default(self):
+        swept = list(Sweep.load(Sweep.path("default.json")).models())
+        expect = _handwritten()
+        self.assertEqual(len(swept), len(expect))
+        for (a, b) in zip(swept, expect):
+            self.assertEqual(_typed(a), _typed(b))
+
+    def test_spec(self):
+        s = Sweep.Sweep({
+            "base": {"cache_1": "4 * GB", "cache_2": 0},
+            "axes": [
+                {"name": "copies", "values": [1, 2, 3]},
+                {"name": "primary", "values": OrderedDict([
+                    (" v", {"nv_1": False}),
+                    ("nv", {"nv_1": True,
+                            "cache_1": "cache_1 * copies"})])}],
+            "exclude": ["copies == 1 and primary == ' v'"],
+            "descr": "'%d copies, %s primary' % (copies, primary)"})
+        self.assertEqual(s.size(), 6)
+        models = list(s.models())
+        self.assertEqual([m.descr for m in models],
+                         ["1 copies, nv primary", "2 copies,  v primary",
+                          "2 copies, nv primary", "3 copies,  v primary",
+                          "3 copies, nv primary"])
+        self.assertEqual([m.cache_1 / GB for m in models], [4, 4, 8, 4, 12])
+        self.assertEqual(set([m.cache_2 for m in models]), set([0]))
+
+    def test_lazy(self):
+        # a million points, of which we only look at a few
+        s = Sweep.Sweep({"axes": [
+            {"name": "copies", "values": range(100)},
+            {"name": "decluster", "values": range(1, 101)},
+            {"name": "time_detect", "values": range(100)}],
+            "descr": "'%d/%d/%d' % (copies, decluster, time_detect)"})
+        self.assertEqual(s.size(), 1000000)
+        self.assertEqual([m.descr for m in islice(s.models(), 3)],
+                         ["0/1/0", "0/1/1", "0/1/2"])
+
+    def test_errors(self):
+        for spec in ({"bases": {}},
+                     {"base": {"no_such_thing": 1}},
+                     {"base": {"copies": "2 +"}},
+                     {"axes": [{"name": "no_such_thing", "values": [1]}]},
+                     {"axes": [{"name": "x", "values": {"a": {"y": 1}}}]},
+                     {"exclude": ["copies =="]}):
+            self.assertRaises(ValueError, Sweep.Sweep, spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
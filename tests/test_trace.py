@@ -0,0 +1,117 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the vectorized trace replay agrees with a block at a time simulation
+"""
+
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import Trace
+
+BSIZE = 4096
+
+
+def writeTrace(filename, requests=3000, seed=11):
+    """ a synthetic MSR format trace (with a header and some junk) """
+    rng = random.Random(seed)
+    f = gzip.open(filename, "wb") if filename.endswith(".gz") else \
+        open(filename, "wb")
+    f.write("Timestamp,Hostname,DiskNumber,Type,Offset,Size,ResponseTime\n")
+    t = 128166372000000000
+    for i in range(requests):
+        t += rng.randint(0, 20000)
+        disk = rng.choice([0, 1, 1, 3])
+        op = "Write" if rng.random() < 0.7 else "Read"
+        # mostly rewrites of a small working set
+        block = rng.randint(0, 400) if rng.random() < 0.8 else \
+            rng.randint(0, 100000)
+        offset = block * BSIZE + rng.choice([0, 0, 512, 1000])
+        size = rng.choice([0, 512, 4096, 8192, 65536])
+        f.write("%d,host,%d,%s,%d,%d,%d\n" %
+                (t, disk, op, offset, size, rng.randint(10, 900)))
+        if i == requests // 2:
+            f.write("# a comment\n128166372000000000,short,line\n")
+    f.close()
+
+
+def simulate(filename, max_dirty):
+    """ per disk (flushes, blocks flushed, dirty blocks, histogram) """
+    limit = max(1, max_dirty // BSIZE)
+    f = gzip.open(filename) if filename.endswith(".gz") else open(filename)
+    start = None
+    caches = dict()
+    for line in f:
+        p = line.strip().split(",")
+        if len(p) != 7 or not p[0].isdigit():
+            continue
+        t = int(p[0])
+        start = t if start is None else start
+        if p[3][0] != "W":
+            continue
+        t = (t - start) * 1E-7
+        c = caches.setdefault(int(p[2]), {"dirty": set(), "flushes": 0,
+                                          "flushed": 0, "last": t,
+                                          "hist": np.zeros(Trace.BINS)})
+        (offset, size) = (int(p[4]), max(int(p[5]), 1))
+        for b in range(offset // BSIZE, (offset + size - 1) // BSIZE + 1):
+            level = len(c["dirty"]) * Trace.BINS // limit
+            c["hist"][min(level, Trace.BINS - 1)] += max(t - c["last"], 0)
+            c["last"] = t
+            c["dirty"].add(b)
+            if len(c["dirty"]) >= limit:
+                c["flushes"] += 1
+                c["flushed"] += len(c["dirty"])
+                c["dirty"] = set()
+    f.close()
+    return caches
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def check(self, filename, max_dirty, chunk):
+        r = Trace.Replay(filename, max_dirty, BSIZE, "msr", chunk=chunk)
+        expect = simulate(filename, max_dirty)
+        self.assertEqual(sorted(r.caches), sorted(expect))
+        for (k, c) in r.caches.items():
+            e = expect[k]
+            self.assertEqual((c.flushes, c.flushed),
+                             (e["flushes"], e["flushed"]))
+            self.assertEqual(set(c.dirty), e["dirty"])
+            self.assertTrue(np.allclose(c.hist, e["hist"]))
+
+    def test_plain(self):
+        name = os.path.join(self.tmp, "trace.csv")
+        writeTrace(name)
+        for max_dirty in (16 * BSIZE, 100 * BSIZE, 10 ** 6):
+            self.check(name, max_dirty, 4096)
+
+    def test_compressed(self):
+        name = os.path.join(self.tmp, "trace.csv.gz")
+        writeTrace(name, seed=12)
+        self.check(name, 50 * BSIZE, 1000)
+        self.check(name, 50 * BSIZE, Trace.CHUNK)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+the samples are well stratified, and each is evaluated as the scalar
+model would
+"""
+
+import unittest
+
+import numpy as np
+
+import Sweep
+import Uncertainty
+from Model import Model, Sizes, Rates, Results
+from RelyFuncts import YEAR
+
+
+class TestUncertainty(unittest.TestCase):
+
+    def setUp(self):
+        self.spec = Uncertainty.load(Sweep.path("uncertainty.json"))
+        self.spec.samples = 256
+
+    def test_samples(self):
+        # each sample is what the scalar model gives for those inputs
+        for copies in (1, 2, 3):
+            m = Model("")
+            m.copies = copies
+            (A, B) = self.spec.design()
+            (p, nines) = self.spec.evaluate(m, A, period=2*YEAR)
+            values = self.spec.values(m, A)
+            for i in range(0, len(A), 7):
+                s = Model("")
+                s.__dict__.update(vars(m))
+                for (k, v) in values.items():
+                    setattr(s, k, float(v[i]))
+                sizes = Sizes(s)
+                rates = Rates(s)
+                r = Results(s, sizes, rates, 2*YEAR)
+                self.assertTrue(np.isclose(p[i], r.p_loss, rtol=1e-9,
+                                           atol=0))
+                self.assertEqual(nines[i], r.nines)
+
+    def test_chunks(self):
+        (A, B) = self.spec.design()
+        whole = self.spec.evaluate(Model(""), A)
+        pieces = self.spec.evaluate(Model(""), A, chunk=50)
+        self.assertTrue((whole[0] == pieces[0]).all())
+        self.assertTrue((whole[1] == pieces[1]).all())
+
+    def test_lhs(self):
+        u = Uncertainty.lhs(100, 4, np.random.RandomState(9))
+        for j in range(4):
+            strata = np.sort(np.floor(u[:, j] * 100))
+            self.assertTrue((strata == np.arange(100)).all())
+
+    def test_sobol(self):
+        # a (0, m, 2)-net: every 2^i x 2^(m-i) box holds exactly one point
+        m = 8
+        u = Uncertainty.sobol(2 ** m, 10, np.random.RandomState(10))
+        self.assertTrue(((u > 0) & (u < 1)).all())
+        for j in range(10):
+            strata = np.sort(np.floor(u[:, j] * 2 ** m))
+            self.assertTrue((strata == np.arange(2 ** m)).all())
+        for i in range(m + 1):
+            box = np.floor(u[:, 0] * 2 ** i) * 2 ** (m - i) + \
+                np.floor(u[:, 1] * 2 ** (m - i))
+            self.assertEqual(len(np.unique(box)), 2 ** m)
+
+    def test_distributions(self):
+        u = np.array([0.05, 0.5, 0.95])
+        lo = Uncertainty._lognormal(u, 100.0, 3)
+        self.assertTrue(np.allclose(lo, [100.0 / 3, 100.0, 300.0]))
+        lu = Uncertainty._loguniform(np.array([0.0, 0.5, 1.0]), 0.001, 0.1)
+        self.assertTrue(np.allclose(lu, [0.001, 0.01, 0.1]))
+        tri = Uncertainty._triangular(np.array([0.0, 0.25, 1.0]), 10, 30,
+                                      90)
+        self.assertTrue(np.allclose(tri, [10, 30, 90]))
+
+    def test_indices(self):
+        # with a single input, it is responsible for all of the variance
+        inputs = self.spec.inputs
+        self.spec.samples = 4096
+        self.spec.inputs = Uncertainty.OrderedDict(
+            [("sw_hard", inputs["sw_hard"])])
+        r = self.spec.analyze(Model(""))
+        self.assertTrue(abs(r["S1"]["sw_hard"] - 1) < 0.01)
+        self.assertTrue(abs(r["ST"]["sw_hard"] - 1) < 0.01)
+
+        # and one that Ploss does not depend on, for none of it
+        self.spec.inputs["f_dram"] = inputs["f_dram"]
+        r = self.spec.analyze(Model(""))
+        self.assertTrue(abs(r["S1"]["f_dram"]) < 0.01)
+        self.assertTrue(abs(r["ST"]["f_dram"]) < 0.01)
+
+if __name__ == "__main__":
+    unittest.main()
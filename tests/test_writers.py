@@ -0,0 +1,107 @@
+#
+# Ceph - scalable distributed file system
+#
+# Copyright (C) Inktank
+#
+# This is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License version 2.1, as published by the Free Software
+# Foundation.  See file COPYING.
+#
+"""
+every writer's output reads back as exactly what was written, with
+non-finite values as null in JSON Lines
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+
+import Writers
+from run import evaluate
+from tests.samples import randomModels
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.evaluated = list()
+        for m in randomModels(20, seed=3):
+            (sizes, rates, results) = evaluate(m)
+            self.evaluated.append((m, sizes, rates, results))
+        # (e.g. a configuration that never loses data)
+        self.evaluated[0][3].mttdl = float("inf")
+        self.rows = [Writers.fields(*e) for e in self.evaluated]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, **kwargs):
+        """ write every row to a file, returning its name """
+        filename = os.path.join(self.tmp, name)
+        if kwargs:
+            w = Writers.FORMATS[os.path.splitext(name)[1]](filename,
+                                                           **kwargs)
+        else:
+            w = Writers.writer(filename)
+        for e in self.evaluated:
+            w.write(*e)
+        w.close()
+        self.assertEqual(w.rows, len(self.rows))
+        return filename
+
+    def test_csv(self):
+        f = open(self.write("results.csv"))
+        lines = list(csv.reader(f))
+        f.close()
+        self.assertEqual(lines[0], list(self.rows[0].keys()))
+        self.assertEqual(len(lines), len(self.rows) + 1)
+        for (line, row) in zip(lines[1:], self.rows):
+            self.assertEqual(line, [Writers._text(v) for v in row.values()])
+            self.assertEqual(float(line[lines[0].index("results.p_loss")]),
+                             row["results.p_loss"])
+
+    def test_jsonl(self):
+        f = open(self.write("results.jsonl"))
+        lines = [json.loads(l, object_pairs_hook=OrderedDict) for l in f]
+        f.close()
+        self.assertEqual(len(lines), len(self.rows))
+        self.assertEqual(lines[0]["results.mttdl"], None)
+        for (line, row) in zip(lines, self.rows):
+            self.assertEqual(list(line.keys()), list(row.keys()))
+            for (k, v) in row.items():
+                self.assertEqual(line[k], Writers._finite(v), k)
+
+    def test_columns(self):
+        # (several chunks, and a partial one)
+        columns = Writers.load(self.write("results.col", chunk=7))
+        self.assertEqual(list(columns.keys()), list(self.rows[0].keys()))
+        for (k, a) in columns.items():
+            self.assertEqual(len(a), len(self.rows))
+            values = [row[k] for row in self.rows]
+            if a.dtype.kind in "SU":
+                self.assertEqual(list(a), [Writers._text(v) for v in values])
+            else:
+                self.assertTrue(np.array_equal(a, np.array(values, a.dtype)),
+                                k)
+
+    def test_formats(self):
+        self.assertRaises(ValueError, Writers.writer,
+                          os.path.join(self.tmp, "results.txt"))
+        w = Writers.writer(os.path.join(self.tmp, "results.jsonl"))
+        w.write(*self.evaluated[0])
+        (m, sizes, rates, results) = self.evaluated[1]
+        results.extra = 1
+        self.assertRaises(ValueError, w.write, m, sizes, rates, results)
+        w.close()
+
+
+if __name__ == "__main__":
+    unittest.main()